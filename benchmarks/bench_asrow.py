@@ -0,0 +1,117 @@
+"""
+Microbenchmark of `blockexp.utils.asrow` against the previous `dataclasses.asdict` implementation.
+
+    python benchmarks/bench_asrow.py [--txs 2000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockexp.blockchain.btc.types import BtcBlock  # noqa: E402
+from blockexp.utils import asrow  # noqa: E402
+
+
+def asdict_asrow(obj) -> dict:
+    data = asdict(obj)
+    data.pop('_id', None)
+    data.pop('_raw', None)
+    data.pop('chain', None)
+    data.pop('network', None)
+    return data
+
+
+def make_raw_tx(index: int) -> dict:
+    txid = f'{index:064x}'
+    return {
+        'txid': txid,
+        'hash': txid,
+        'version': 2,
+        'size': 225,
+        'vsize': 144,
+        'weight': 573,
+        'locktime': 0,
+        'vin': [{
+            'txid': f'{index + n + 1:064x}',
+            'vout': n,
+            'scriptSig': {'asm': '', 'hex': ''},
+            'txinwitness': ['30' * 71, '02' + '11' * 32],
+            'sequence': 0xffffffff,
+        } for n in range(2)],
+        'vout': [{
+            'value': 0.5,
+            'n': n,
+            'scriptPubKey': {
+                'asm': f'0 {index:040x}',
+                'hex': f'0014{index:040x}',
+                'reqSigs': 1,
+                'type': 'witness_v0_keyhash',
+                'addresses': [f'bc1q{index:038x}'],
+            },
+        } for n in range(2)],
+        'hex': '00' * 225,
+    }
+
+
+def make_raw_block(txs: int) -> BtcBlock:
+    coinbase = make_raw_tx(0)
+    coinbase['vin'] = [{'coinbase': '03aabbcc', 'sequence': 0xffffffff}]
+
+    return BtcBlock.load({
+        'hash': '00' * 32,
+        'confirmations': 1,
+        'size': 225 * txs,
+        'strippedsize': 144 * txs,
+        'weight': 573 * txs,
+        'height': 600000,
+        'version': 0x20000000,
+        'versionHex': '20000000',
+        'merkleroot': '11' * 32,
+        'tx': [coinbase] + [make_raw_tx(index) for index in range(1, txs)],
+        'time': 1500000000,
+        'mediantime': 1500000000,
+        'nonce': 42,
+        'bits': '17148edf',
+        'difficulty': 1.0,
+        'chainwork': '22' * 32,
+        'nTx': txs,
+        'previousblockhash': '33' * 32,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--txs', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    raw_block = make_raw_block(args.txs)
+    assert asrow(raw_block) == asdict_asrow(raw_block)
+    assert all(asrow(raw_tx) == asdict_asrow(raw_tx) for raw_tx in raw_block.tx)
+
+    def rows_asdict():
+        asdict_asrow(raw_block)
+        for raw_tx in raw_block.tx:
+            asdict_asrow(raw_tx)
+
+    def rows_compiled():
+        asrow(raw_block)
+        for raw_tx in raw_block.tx:
+            asrow(raw_tx)
+
+    print(f'block of {args.txs} transactions (block row + one row per transaction), best of {args.repeat}')
+
+    results = {}
+    for name, func in [('dataclasses.asdict', rows_asdict), ('compiled asrow', rows_compiled)]:
+        results[name] = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f'  {name:<20} {results[name] * 1000:9.2f} ms')
+
+    print(f'  speedup              {results["dataclasses.asdict"] / results["compiled asrow"]:9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,8 +5,9 @@ from starlette.requests import Request
 from starlette.routing import Router
 
 from starlette_typed import typed_endpoint
+from starlette_typed.endpoint import is_stream_request
 from . import ApiPath
-from ...model import Balance, Coin
+from ...model import Balance, Coin, AddressSummary, TokenTransfer
 from ...model.options import SteamingFindOptions
 from ...types import Provider
 
@@ -23,6 +24,14 @@ class AddressApiQuery:
     unspent: bool = None
     since: int = None
     limit: int = None
+    stream: str = None
+
+
+@dataclass
+class TokenTransferApiQuery:
+    token: str = None
+    since: int = None
+    limit: int = None
 
 
 @api.route('/{address}/txs', methods=['GET'])
@@ -35,6 +44,8 @@ async def stream_address_transactions(request: Request, path: AddressApiPath, qu
         find_options=SteamingFindOptions(
             since=query.since,
             limit=query.limit,
+            stream=is_stream_request(request),
+            raw=True,
         )
     )
 
@@ -49,6 +60,8 @@ async def stream_address_utxos(request: Request, path: AddressApiPath, query: Ad
         find_options=SteamingFindOptions(
             since=query.since,
             limit=query.limit,
+            stream=is_stream_request(request),
+            raw=True,
         )
     )
 
@@ -57,3 +70,25 @@ async def stream_address_utxos(request: Request, path: AddressApiPath, query: Ad
 @typed_endpoint(tags=["bitcore"])
 async def get_balance_for_address(request: Request, path: AddressApiPath, provider: Provider) -> Balance:
     return await provider.get_balance_for_address(path.address)
+
+
+@api.route('/{address}/summary', methods=['GET'])
+@typed_endpoint(tags=["bitcore-ext"])
+async def get_address_summary(request: Request, path: AddressApiPath, provider: Provider) -> AddressSummary:
+    return await provider.get_address_summary(path.address)
+
+
+@api.route('/{address}/transfers', methods=['GET'])
+@typed_endpoint(tags=["bitcore-ext"])
+async def stream_address_token_transfers(request: Request, path: AddressApiPath, query: TokenTransferApiQuery,
+                                         provider: Provider) -> List[TokenTransfer]:
+    return await provider.stream_address_token_transfers(
+        address=path.address,
+        token=query.token,
+        find_options=SteamingFindOptions(
+            since=query.since,
+            limit=query.limit,
+            stream=is_stream_request(request),
+            raw=True,
+        )
+    )
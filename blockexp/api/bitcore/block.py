@@ -1,11 +1,11 @@
 from dataclasses import dataclass
 from typing import List
 
-from aiocache import cached
 from starlette.requests import Request
 from starlette.routing import Router
 
 from starlette_typed import typed_endpoint, cache_endpoint
+from starlette_typed.endpoint import is_stream_request
 from . import ApiPath
 from ...model import Block
 from ...model.options import Direction, SteamingFindOptions
@@ -24,6 +24,7 @@ class StreamBlockApiQuery:
     since: int = None
     direction: int = None
     paging: str = None
+    stream: str = None
 
 
 @api.route('/', methods=['GET'])
@@ -39,12 +40,14 @@ async def stream_blocks(request: Request, path: ApiPath, query: StreamBlockApiQu
             since=query.since,
             direction=Direction(query.direction) if query.direction is not None else None,
             paging=query.paging,
+            stream=is_stream_request(request),
+            raw=True,
         )
     )
 
 
-@cached(ttl=30)
 async def get_cached_local_tip(provider: Provider):
+    # served from the process-wide tip cache (see blockchain.utils.tip)
     return await provider.get_local_tip()
 
 
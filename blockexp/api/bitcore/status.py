@@ -5,7 +5,11 @@ from starlette.requests import Request
 from starlette.routing import Router
 
 from starlette_typed import typed_endpoint
-from ...blockchain import iter_blockchain
+from ...blockchain import iter_blockchain, get_import_service, get_ready_service
+from ...blockchain.readiness import BlockchainStatus
+from ...blockchain.supervisor import ImporterStatus
+from ...database import DatabasePoolStats, get_pool
+from ...utils.jsonrpc import RpcMethodStats, RPC_STATS
 
 api = Router()
 
@@ -24,3 +28,33 @@ async def enabled_chains(request: Request) -> List[BlockchainSchema]:
         blockchains.append(BlockchainSchema(blockchain.chain, blockchain.network))
 
     return blockchains
+
+
+@api.route('/chains', methods=['GET'])
+@typed_endpoint(tags=["bitcore-ext"])
+async def chains(request: Request) -> List[BlockchainStatus]:
+    service = get_ready_service(request.app)
+    return service.status() if service is not None else []
+
+
+@api.route('/database-pool', methods=['GET'])
+@typed_endpoint(tags=["bitcore-ext"])
+async def database_pool(request: Request) -> DatabasePoolStats:
+    return get_pool(request.app).stats()
+
+
+@api.route('/rpc', methods=['GET'])
+@typed_endpoint(tags=["bitcore-ext"])
+async def rpc(request: Request) -> List[RpcMethodStats]:
+    return RPC_STATS.all()
+
+
+@api.route('/importers', methods=['GET'])
+@typed_endpoint(tags=["bitcore-ext"])
+async def importers(request: Request) -> List[ImporterStatus]:
+    """
+    Importers supervised by this process. Empty with several api workers (`blockexp serve --workers`),
+    the importers then run in their own process.
+    """
+    service = get_import_service(request.app)
+    return service.status() if service is not None else []
@@ -5,6 +5,7 @@ from starlette.requests import Request
 from starlette.routing import Router
 
 from starlette_typed import typed_endpoint
+from starlette_typed.endpoint import is_stream_request
 from . import ApiPath
 from ...model import Transaction, CoinListing, Authhead, TransactionId
 from ...model.options import Direction, SteamingFindOptions
@@ -26,6 +27,7 @@ class TxIndexApiQuery:
     since: str = None
     direction: Direction = None
     paging: str = None
+    stream: str = None
 
 
 @api.route('/', methods=['GET'])
@@ -42,6 +44,8 @@ async def stream_transactions(request: Request,
             since=int(query.since) if query.since is not None else None,
             direction=query.direction,
             paging=query.paging,
+            stream=is_stream_request(request),
+            raw=True,
         )
     )
 
@@ -10,7 +10,7 @@ from starlette.requests import Request
 from starlette.routing import Router
 
 from starlette_typed import typed_endpoint
-from starlette_typed.endpoint import register_handler
+from starlette_typed.endpoint import register_handler, is_stream_request
 from . import ApiPath
 from ...model import Wallet, Coin, Balance, Transaction, WalletCheckResult
 from ...model.options import SteamingFindOptions
@@ -122,6 +122,7 @@ class WalletTransactionQuery:
     startDate: str = None
     endDate: str = None
     includeMempool: bool = None
+    stream: str = None
 
 
 @api.route('/{pub_key}/transactions', methods=['GET'])
@@ -135,7 +136,7 @@ async def stream_wallet_transactions(request: Request, path: WalletApiPath, quer
         start_date=query.startDate,
         end_date=query.endDate,
         # includeMempool is ignored
-        find_options=SteamingFindOptions(),
+        find_options=SteamingFindOptions(stream=is_stream_request(request), raw=True),
     )
 
 
@@ -1,4 +1,6 @@
-from typing import Any
+import asyncio
+import multiprocessing
+from typing import Any, Optional
 
 import socketio
 import uvicorn
@@ -13,6 +15,7 @@ class Application(Starlette):
         self.config = config
         self.extensions = {}
         self.services = []
+        self.run_importers = True  # False in forked api workers, the importers run in their own process
         self.sio = socketio.AsyncServer(async_mode='asgi')
 
         self.on_event("startup")(self.on_startup)
@@ -38,14 +41,38 @@ class Application(Starlette):
     async def register_extension(self, extension: Any):
         self.extensions[extension.__name__] = await extension.init_app(self)
 
-    def serve(self):
+    def serve(self, workers: Optional[int] = None):
         server_config = self.config.get('server', {})
-
-        uvicorn.run(
-            self.ready(),
-            host=server_config.get('host', '127.0.0.1'),
-            port=server_config.get('port', 8000),
-        )
+        workers = max(1, workers or server_config.get('workers', 1))
+
+        importer_process = None
+        if workers > 1:
+            # api workers are forked from this (initialized) process, without importers
+            self.run_importers = False
+
+            # the database client opened by the initialization must not be inherited by the workers
+            from .database import get_pool
+            asyncio.run(get_pool(self).close())
+
+            if self.config.get('importer', {}).get('mode', 'inline') != 'none':
+                importer_process = multiprocessing.get_context('spawn').Process(
+                    target=run_import_process,
+                    args=(self.config,),
+                    name='blockexp-import',
+                )
+                importer_process.start()
+
+        try:
+            uvicorn.run(
+                self.ready(),
+                host=server_config.get('host', '127.0.0.1'),
+                port=server_config.get('port', 8000),
+                workers=workers,
+            )
+        finally:
+            if importer_process is not None:
+                importer_process.terminate()
+                importer_process.join()
 
 
 async def init_app(config: dict, *, debug=False) -> Application:
@@ -67,3 +94,32 @@ async def init_app(config: dict, *, debug=False) -> Application:
     await app.register_extension(swagger)
 
     return app
+
+
+async def init_importer(config: dict) -> Application:
+    """Application without the web api, for `blockexp import`."""
+    app = Application(config=config)
+
+    from . import database
+    await app.register_extension(database)
+
+    from . import blockchain
+    await app.register_extension(blockchain)
+
+    return app
+
+
+async def run_import(config: dict):
+    from .blockchain import get_import_service
+
+    app = await init_importer(config)
+    await app.on_startup()
+
+    try:
+        await get_import_service(app).run()
+    finally:
+        await app.on_shutdown()
+
+
+def run_import_process(config: dict):
+    asyncio.run(run_import(config))
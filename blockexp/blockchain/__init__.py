@@ -1,11 +1,12 @@
-import asyncio
-from typing import Iterator, Optional, List, Tuple
+from typing import Iterator, Optional, List
 
 from .btc import BtcBlockchain
 from .eth import EthBlockchain
 from .jack import JackBlockchain
 from .pch import PchBlockchain
 from .able import AbleBlockchain
+from .readiness import BlockchainReadiness, BlockchainStatus
+from .supervisor import ImporterMode, ImporterStatus, ImporterSupervisor
 from ..application import Application
 from ..types import Blockchain, Service
 
@@ -18,82 +19,113 @@ CHAINS = {
 }
 
 
-class ImportBlockchainService(Service):
+class ReadyBlockchainService(Service):
     def __init__(self, app: Application):
         self.app = app
-        self.futures: List[Tuple[Blockchain, asyncio.Future]] = []
+
+        config = app.config.get('server', {})
+        self.readiness = BlockchainReadiness(
+            timeout=config.get('ready_timeout', 10),
+            retry_delay=config.get('ready_retry_delay', 5),
+            max_retry_delay=config.get('max_ready_retry_delay', 300),
+        )
 
     async def on_startup(self):
-        for blockchain in iter_blockchain(self.app):
-            self.run_service(blockchain)
+        self.readiness.start()
 
-    def run_service(self, blockchain: Blockchain):
-        importer = blockchain.get_importer()
-        if importer is not None:
-            future: asyncio.Future = asyncio.ensure_future(importer.run())
-            self.futures.append((blockchain, future))
+    def status(self) -> List[BlockchainStatus]:
+        return self.readiness.status()
+
+    async def on_shutdown(self):
+        await self.readiness.stop()
+
+
+class ImportBlockchainService(Service):
+    def __init__(self, app: Application):
+        self.app = app
+
+        config = app.config.get('importer', {})
+        self.supervisor = ImporterSupervisor(
+            app,
+            config.get('mode', ImporterMode.inline),
+            restart_delay=config.get('restart_delay', 1),
+            max_restart_delay=config.get('max_restart_delay', 300),
+            chains=config.get('chains'),
+        )
+
+    async def on_startup(self):
+        if self.app.run_importers:
+            self.supervisor.start(list(iter_blockchain(self.app)))
 
     async def run(self):
-        while True:
-            for _, future in self.futures:
-                if future.cancelled():
-                    pass
-                elif future.done():
-                    exc = future.exception()
-                    if exc is None:
-                        pass
+        await self.supervisor.wait()
 
-            await asyncio.sleep(30)
+    def status(self) -> List[ImporterStatus]:
+        return self.supervisor.status()
 
     async def on_shutdown(self):
-        for _, task in self.futures:
-            if not task.done():
-                task.cancel()
+        await self.supervisor.stop()
+
+
+def create_blockchain(app: Application, cfg: dict) -> Optional[Blockchain]:
+    if not cfg.get('enabled', True):
+        return None
+
+    data = cfg.copy()
+    data.pop('enabled', None)
+
+    chain = data.pop('chain')
+    network = data.pop('network')
+    blockchain_type = data.pop("type", chain)
+
+    if not isinstance(blockchain_type, str) or not blockchain_type:
+        raise ValueError("Invalid blockchain config: {!r}".format(cfg))
 
-        while self.futures:
-            _, task = self.futures.pop()
+    blockchain_type = blockchain_type.upper()
 
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
+    blockchain_cls = CHAINS.get(blockchain_type)
+    if blockchain_cls is None:
+        raise NotImplementedError(blockchain_type)
+
+    return blockchain_cls(
+        chain=chain,
+        network=network,
+        app=app,
+        **data,
+    )
 
 
 async def init_app(app: Application) -> dict:
     blockchain_pool = {}
     for cfg in app.config.get("blockchain", []):
-        if not cfg.get('enabled', True):
+        blockchain = create_blockchain(app, cfg)
+        if blockchain is None:
             continue
 
-        data = cfg.copy()
-        data.pop('enabled', None)
+        blockchain_pool[blockchain.chain, blockchain.network] = blockchain
 
-        chain = data.pop('chain')
-        network = data.pop('network')
-        blockchain_type = data.pop("type", chain)
+    ready_service = ReadyBlockchainService(app)
+    await ready_service.readiness.check_all(blockchain_pool.values())
 
-        if not isinstance(blockchain_type, str) or not blockchain_type:
-            raise ValueError("Invalid blockchain config: {!r}".format(cfg))
+    app.register_service(ready_service)
+    app.register_service(ImportBlockchainService(app))
+    return blockchain_pool
 
-        blockchain_type = blockchain_type.upper()
 
-        blockchain_cls = CHAINS.get(blockchain_type)
-        if blockchain_cls is None:
-            raise NotImplementedError(blockchain_type)
+def get_ready_service(app: Application) -> Optional[ReadyBlockchainService]:
+    for service in app.services:
+        if isinstance(service, ReadyBlockchainService):
+            return service
 
-        blockchain: Blockchain = blockchain_cls(
-            chain=chain,
-            network=network,
-            app=app,
-            **data,
-        )
+    return None
 
-        await blockchain.ready()
 
-        blockchain_pool[chain, network] = blockchain
+def get_import_service(app: Application) -> Optional[ImportBlockchainService]:
+    for service in app.services:
+        if isinstance(service, ImportBlockchainService):
+            return service
 
-    app.register_service(ImportBlockchainService(app))
-    return blockchain_pool
+    return None
 
 
 def get_blockchain_pool(app: Application) -> dict:
@@ -4,4 +4,4 @@ from ..btc import BtcBlockchain
 
 class AbleBlockchain(BtcBlockchain):
     def get_accessor(self) -> AbleDaemonAccessor:
-        return AbleDaemonAccessor(self.chain, self.network, self.url)
+        return AbleDaemonAccessor(self.chain, self.network, self.url, **self.get_rpc_options())
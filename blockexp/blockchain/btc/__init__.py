@@ -1,7 +1,11 @@
+import asyncio
+from importlib.util import find_spec
+
 from .accessor import BtcDaemonAccessor
 from .importer import BtcDaemonImporter
 from .mongo import BtcMongoDatabase
 from .provider import BtcMongoProvider
+from .utils.storage import RAW_STORAGE_MODES
 from ...application import Application
 from ...database import MongoDatabase, connect_database_for
 from ...types import Blockchain
@@ -13,23 +17,72 @@ class BtcBlockchain(Blockchain):
         self.app = app
         self.url = url
         self.config = config
+        self.check_dependencies()
+
+    def check_dependencies(self):
+        # optional extras are imported lazily, report a missing one on config load instead of the first block
+        raw_storage = self.config.get('raw_storage', 'verbose')
+        if raw_storage not in RAW_STORAGE_MODES:
+            raise ValueError(f'invalid raw_storage: {raw_storage!r}')
+
+        if self.config.get('binary_blocks', False) and find_spec('bitcoin') is None:
+            raise Exception("You need install python-bitcoinlib for binary_blocks (poetry install -E binary)")
+
+        # compact raw transactions are decoded back with python-bitcoinlib when they are read
+        if raw_storage != 'verbose' and find_spec('bitcoin') is None:
+            extra = 'zstd' if raw_storage == 'zstd' else 'binary'
+            raise Exception(f"You need install python-bitcoinlib for raw_storage = {raw_storage!r} "
+                            f"(poetry install -E {extra})")
+
+        if raw_storage == 'zstd' and find_spec('zstandard') is None:
+            raise Exception("You need install zstandard for raw_storage = 'zstd' (poetry install -E zstd)")
 
     def get_db(self, database: MongoDatabase) -> BtcMongoDatabase:
         return BtcMongoDatabase(self.chain, self.network, database)
 
     async def ready(self):
+        await asyncio.gather(self.ping(), self.create_indexes())
+
+    async def ping(self):
         async with self.get_accessor() as daemon:
             await daemon.get_local_tip()
 
+    async def create_indexes(self):
         async with connect_database_for(self.app) as database:
             db = self.get_db(database)
             await db.create_indexes()
 
+    def get_rpc_options(self) -> dict:
+        return dict(
+            max_connections=self.config.get('rpc_max_connections', 100),
+            keepalive_connections=self.config.get('rpc_keepalive_connections', 10),
+            timeout=self.config.get('rpc_timeout'),
+            retries=self.config.get('rpc_retries', 4),
+            json_codec=self.config.get('rpc_json_codec', 'auto'),
+        )
+
     def get_accessor(self) -> BtcDaemonAccessor:
-        return BtcDaemonAccessor(self.chain, self.network, self.url)
+        return BtcDaemonAccessor(self.chain, self.network, self.url, **self.get_rpc_options())
 
     def get_importer(self) -> BtcDaemonImporter:
-        return BtcDaemonImporter(self.chain, self.network, self.get_accessor(), self.app)
+        return BtcDaemonImporter(
+            self.chain,
+            self.network,
+            self.get_accessor(),
+            self.app,
+            prefetch=self.config.get('prefetch', 16),
+            write_batch=self.config.get('write_batch'),
+            utxo_cache=self.config.get('utxo_cache', 256),
+            header_cache=self.config.get('header_cache', 2016),
+            binary_blocks=self.config.get('binary_blocks', False),
+            address_prefixes=self.config.get('address_prefixes'),
+            decode_workers=self.config.get('decode_workers', 0),
+            raw_storage=self.config.get('raw_storage', 'verbose'),
+            wallet_cache=self.config.get('wallet_cache', 64),
+            wallet_refresh=self.config.get('wallet_refresh', 10),
+            address_summary=self.config.get('address_summary', True),
+        )
 
     def get_provider(self, database: MongoDatabase) -> BtcMongoProvider:
-        return BtcMongoProvider(self.chain, self.network, self.get_db(database), self.get_accessor())
+        return BtcMongoProvider(self.chain, self.network, self.get_db(database), self.get_accessor(),
+                                address_prefixes=self.config.get('address_prefixes'))
@@ -1,18 +1,18 @@
 from datetime import datetime
-from typing import Union, Any
+from typing import Union, Any, List
 
 from .bitcoind import AsyncBitcoinDeamon
 from .types import BtcTransaction, BtcBlock
 from ...error import BlockNotFound, TransactionNotFound
 from ...model import Block, Transaction, EstimateFee, TransactionId
 from ...types import Accessor
-from ...utils.jsonrpc import JSONRPCError
+from ...utils.jsonrpc import JSONRPCError, JsonRpcRequest
 
 
 class BtcDaemonAccessor(Accessor):
-    def __init__(self, chain: str, network: str, url: str):
+    def __init__(self, chain: str, network: str, url: str, **rpc_options):
         super().__init__(chain, network)
-        self.rpc = AsyncBitcoinDeamon(url)
+        self.rpc = AsyncBitcoinDeamon(url, **rpc_options)
         self.is_legacy_getblock = None
 
     async def connect(self):
@@ -64,7 +64,7 @@ class BtcDaemonAccessor(Accessor):
             blockTime=datetime.utcfromtimestamp(block.time).isoformat() if block.time else None,
             blockTimeNormalized=datetime.utcfromtimestamp(block.time).isoformat() if block.time else None,
             coinbase=transaction.is_coinbase(),
-            fee=-1,  # "transaction.fee",  TODO: fee
+            fee=transaction.fee if transaction.fee is not None else -1,
             size=transaction.size,
             locktime=transaction.locktime,
             inputCount=len(transaction.vin),
@@ -99,6 +99,10 @@ class BtcDaemonAccessor(Accessor):
         else:
             block_hash = block_id
 
+        block = await self._get_block_data(block_hash, verbosity=verbosity)
+        return self.load_block_data(block)
+
+    async def _get_block_data(self, block_hash: str, *, verbosity: int) -> dict:
         if self.is_legacy_getblock is None:
             self.is_legacy_getblock = await self._detect_legacy_getblock(verbosity=verbosity)
 
@@ -107,8 +111,6 @@ class BtcDaemonAccessor(Accessor):
                 block = await self._legacy_get_block(block_hash, verbosity=verbosity)
             else:
                 block = await self.rpc.getblock(block_hash, verbosity=verbosity)
-                if 'tx' in block and block['tx'] and isinstance(block['tx'][0], dict):
-                    block['tx'] = [self._convert_raw_transaction(tx) for tx in block['tx']]
         except JSONRPCError as e:
             if e.code == -5 and e.message == "Block not found":
                 raise BlockNotFound(block_hash) from e
@@ -116,6 +118,12 @@ class BtcDaemonAccessor(Accessor):
             raise
 
         assert isinstance(block, dict)
+        return block
+
+    def load_block_data(self, block: dict) -> BtcBlock:
+        if 'tx' in block and block['tx'] and isinstance(block['tx'][0], dict):
+            block['tx'] = [self._convert_raw_transaction(tx) for tx in block['tx']]
+
         return self._convert_raw_block(block)
 
     async def _legacy_get_block(self, block_hash: str, *, verbosity: int) -> dict:
@@ -126,20 +134,24 @@ class BtcDaemonAccessor(Accessor):
         elif verbosity == 2:
             block = await self.rpc.getblock(block_hash, verbosity=True)
 
+            raw_txs = await self.rpc.batch([
+                JsonRpcRequest('getrawtransaction', [txid, True])
+                for txid in block['tx']
+            ], return_exceptions=True)
+
             txs = []
-            for txid in block['tx']:
-                try:
-                    tx = await self.rpc.getrawtransaction(txid, verbose=True)
-                    tx = self._convert_raw_transaction(tx)
-                    txs.append(tx)
-                except JSONRPCError as e:
+            for txid, tx in zip(block['tx'], raw_txs):
+                if isinstance(tx, JSONRPCError):
+                    e = tx
                     if e.message == "No such mempool or blockchain transaction. Use gettransaction for wallet transactions." and \
                        e.code == -5:
                         print("TransactionNotFound", txid)
                         if block['height'] != 0:
                             raise TransactionNotFound(txid) from e
                     else:
-                        raise
+                        raise e
+                else:
+                    txs.append(tx)
 
             block['tx'] = txs
         else:
@@ -169,9 +181,50 @@ class BtcDaemonAccessor(Accessor):
 
             raise
 
+    async def get_block_hashes(self, block_heights: List[int]) -> List[str]:
+        results = await self.rpc.batch([
+            JsonRpcRequest('getblockhash', [block_height])
+            for block_height in block_heights
+        ], return_exceptions=True)
+
+        for block_height, result in zip(block_heights, results):
+            if isinstance(result, JSONRPCError):
+                if result.code == -8 and result.message == "Block height out of range":
+                    raise BlockNotFound(repr(block_height)) from result
+
+                raise result
+
+        return results
+
     async def get_raw_block(self, block_id: Union[str, int]) -> BtcBlock:
         return await self._get_block(block_id, verbosity=2)
 
+    async def get_raw_block_data(self, block_hash: str) -> dict:
+        """Same as `get_raw_block`, but not converted yet (see `load_block_data`)."""
+        return await self._get_block_data(block_hash, verbosity=2)
+
+    async def get_serialized_block(self, block_hash: str) -> bytes:
+        try:
+            block_hex = await self.rpc.getblock(block_hash, False)
+        except JSONRPCError as e:
+            if e.code == -5 and e.message == "Block not found":
+                raise BlockNotFound(block_hash) from e
+
+            raise
+
+        return bytes.fromhex(block_hex)
+
+    def decode_serialized_block(self, data: bytes, height: int, address_encoder) -> BtcBlock:
+        # python-bitcoinlib is only required by the binary ingestion mode
+        from .utils.deserialize import decode_block
+
+        return self.load_block_data(decode_block(data, height, address_encoder))
+
+    def decode_serialized_transaction(self, data: bytes, address_encoder) -> BtcTransaction:
+        from .utils.deserialize import decode_transaction
+
+        return self._convert_raw_transaction(decode_transaction(data, address_encoder))
+
     async def get_transaction(self, tx_id: str) -> Transaction:
         raw_transaction = await self.rpc.getrawtransaction(tx_id)
         assert isinstance(raw_transaction, dict)
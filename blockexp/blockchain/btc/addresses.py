@@ -0,0 +1,198 @@
+from collections import defaultdict
+from typing import Dict, List, Iterable, Tuple, Optional, Set
+
+from pymongo import UpdateOne, ReplaceOne
+
+from .utxo import CoinKey, CoinValue
+from ...database import MongoCollection, bulk_write_for
+
+__all__ = ["AddressDeltas", "address_summary_pipeline", "get_undo_deltas", "rebuild_address_summaries"]
+
+
+class AddressDeltas:
+    """
+    Changes of the `addresses` summaries (received, sent, utxo and transaction counts) made by a
+    batch of blocks, applied as one `$inc` per address.
+    """
+
+    def __init__(self):
+        self.deltas: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0, 0])
+        self.unresolved = 0  # spent coins without a known value and address, the deltas are incomplete
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def mint(self, address: str, value: int, sign: int = 1):
+        delta = self.deltas[address]
+        delta[0] += sign * value
+        delta[2] += sign
+
+    def spend(self, address: str, value: int, sign: int = 1):
+        delta = self.deltas[address]
+        delta[1] += sign * value
+        delta[2] -= sign
+
+    def tx(self, addresses: Iterable[str], sign: int = 1):
+        for address in addresses:
+            self.deltas[address][3] += sign
+
+    def add_block(self, mint_ops: List[dict], tx_rows: List[dict], tx_inputs: List[Optional[list]],
+                  input_values: Dict[CoinKey, CoinValue]):
+        tx_addresses = defaultdict(set)
+        for mint_op in mint_ops:
+            address = mint_op['address']
+            if address is not None:
+                self.mint(address, mint_op['value'])
+                tx_addresses[mint_op['mintTxid']].add(address)
+
+        for tx_row, inputs in zip(tx_rows, tx_inputs):
+            if inputs is None:  # coinbase
+                continue
+
+            for key in inputs:
+                try:
+                    value, address = input_values[key]
+                except KeyError:
+                    self.unresolved += 1
+                    continue
+
+                if address is not None:
+                    self.spend(address, value)
+                    tx_addresses[tx_row['txid']].add(address)
+
+        for addresses in tx_addresses.values():
+            self.tx(addresses)
+
+    def update_ops(self, height: int) -> List[UpdateOne]:
+        return [
+            UpdateOne(
+                filter={'address': address},
+                update={
+                    '$inc': {
+                        'balance': received - sent,
+                        'received': received,
+                        'sent': sent,
+                        'utxoCount': utxo_count,
+                        'txCount': tx_count,
+                    },
+                    '$set': {'height': height},
+                },
+                upsert=True,
+            )
+            for address, (received, sent, utxo_count, tx_count) in self.deltas.items()
+        ]
+
+    def clear(self):
+        self.deltas.clear()
+        self.unresolved = 0
+
+
+async def get_undo_deltas(coin_collection: MongoCollection, height: int) -> AddressDeltas:
+    """Deltas reverting the mints and spends of the blocks from `height`."""
+    deltas = AddressDeltas()
+    txs: Set[Tuple[str, str]] = set()
+
+    async for coin in coin_collection.find(
+            {'$or': [{'mintHeight': {'$gte': height}}, {'spentHeight': {'$gte': height}}]},
+            projection={'_id': False, 'address': True, 'value': True, 'mintTxid': True, 'mintHeight': True,
+                        'spentTxid': True, 'spentHeight': True},
+    ):
+        address = coin.get('address')
+        if address is None:
+            continue
+
+        if coin['mintHeight'] >= height:
+            deltas.mint(address, coin['value'], -1)
+            txs.add((address, coin['mintTxid']))
+
+        if coin.get('spentHeight', -2) >= height:
+            deltas.spend(address, coin['value'], -1)
+            txs.add((address, coin['spentTxid']))
+
+    for address, _ in txs:
+        deltas.tx([address], -1)
+
+    return deltas
+
+
+def address_summary_pipeline(addresses: Optional[List[str]] = None) -> List[dict]:
+    """Aggregation computing the summaries of `addresses` (all of them by default) from the coins."""
+    if addresses is not None:
+        # `address` is one of `addresses`, which is indexed
+        match = {'addresses': {'$in': addresses}, 'address': {'$in': addresses}, 'mintHeight': {'$gte': 0}}
+    else:
+        match = {'address': {'$ne': None}, 'mintHeight': {'$gte': 0}}
+
+    is_spent = {'$gte': ['$spentHeight', 0]}
+
+    return [
+        {'$match': match},
+        # one entry per (address, transaction), to count the transactions without building txid sets
+        {'$project': {
+            '_id': False,
+            'address': True,
+            'parts': [
+                {'txid': '$mintTxid', 'received': '$value', 'sent': 0, 'utxo': {'$cond': [is_spent, 0, 1]}},
+                {'txid': {'$cond': [is_spent, '$spentTxid', None]}, 'received': 0,
+                 'sent': {'$cond': [is_spent, '$value', 0]}, 'utxo': 0},
+            ],
+        }},
+        {'$unwind': '$parts'},
+        {'$match': {'parts.txid': {'$ne': None}}},
+        {'$group': {
+            '_id': {'address': '$address', 'txid': '$parts.txid'},
+            'received': {'$sum': '$parts.received'},
+            'sent': {'$sum': '$parts.sent'},
+            'utxoCount': {'$sum': '$parts.utxo'},
+        }},
+        {'$group': {
+            '_id': '$_id.address',
+            'received': {'$sum': '$received'},
+            'sent': {'$sum': '$sent'},
+            'utxoCount': {'$sum': '$utxoCount'},
+            'txCount': {'$sum': 1},
+        }},
+    ]
+
+
+async def rebuild_address_summaries(coin_collection: MongoCollection, address_collection: MongoCollection,
+                                    height: int, addresses: Optional[List[str]] = None, *, batch_size: int = 10000):
+    """Recompute the summaries of `addresses` (all of them by default) from the coins."""
+    if addresses is None:
+        await address_collection.delete_many({})
+    elif not addresses:
+        return
+
+    found = set()
+    db_ops = []
+    async for row in coin_collection.aggregate(address_summary_pipeline(addresses), allowDiskUse=True):
+        address = row['_id']
+        found.add(address)
+        db_ops.append(ReplaceOne(
+            filter={'address': address},
+            replacement={
+                'address': address,
+                'balance': row['received'] - row['sent'],
+                'received': row['received'],
+                'sent': row['sent'],
+                'utxoCount': row['utxoCount'],
+                'txCount': row['txCount'],
+                'height': height,
+            },
+            upsert=True,
+        ))
+
+        if len(db_ops) >= batch_size:
+            async with bulk_write_for(address_collection, ordered=False) as bulk_ops:
+                bulk_ops += db_ops
+
+            db_ops = []
+
+    async with bulk_write_for(address_collection, ordered=False) as bulk_ops:
+        bulk_ops += db_ops
+
+    if addresses is not None:
+        # addresses without any coin left
+        missing = [address for address in addresses if address not in found]
+        if missing:
+            await address_collection.delete_many({'address': {'$in': missing}})
@@ -174,7 +174,7 @@ class BitcoreProvider(Provider):
     async def get_local_tip(self) -> Block:
         return await self._get(Block, f'block/tip')
 
-    async def get_locator_hashes(self):
+    async def get_locator_hashes(self) -> List[str]:
         # missing api endpoint
         raise NotImplementedError
 
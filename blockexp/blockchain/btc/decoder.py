@@ -0,0 +1,140 @@
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from .accessor import BtcDaemonAccessor
+from .types import BtcVInCoinbase, BtcScriptPubKey, BtcVOut, BtcTransaction, BtcBlock
+from .utils import value2amount
+from .utils.storage import compact_raw_tx_row
+from .utxo import CoinKey
+from ..utils.decoder import AccessorSpec, get_worker_accessor
+from ...model import Block
+from ...utils import asrow
+
+__all__ = ["BtcBlockRows", "build_block_rows", "decode_block_rows"]
+
+
+@dataclass
+class BtcBlockRows:
+    """
+    Rows of one block, ready to be written.
+
+    Only plain data, so it is cheap to pickle back from a decoding process. Fees are finished by the
+    importer once the spent coins are known.
+    """
+    height: int
+    hash: str
+    size: int
+    raw_block_row: dict
+    block_row: dict
+    raw_tx_rows: List[dict]
+    tx_rows: List[dict]
+    mint_ops: List[dict]
+    tx_inputs: List[Optional[List[CoinKey]]]  # coins spent by each transaction, None for coinbase
+    tx_output_values: List[int]
+
+
+def get_block_reward(raw_block: BtcBlock) -> Optional[float]:
+    coinbase_tx = raw_block.tx[0] if raw_block.tx else None
+    if not coinbase_tx:
+        return None
+
+    assert isinstance(coinbase_tx, BtcTransaction), coinbase_tx
+    assert len(coinbase_tx.vin) == 1 and isinstance(coinbase_tx.vin[0], BtcVInCoinbase), coinbase_tx.vin
+    return sum(vout.value for vout in coinbase_tx.vout)
+
+
+def get_mint_ops(height: int, txs: List[BtcTransaction]) -> List[dict]:
+    mint_ops = []
+
+    for tx in txs:  # type: BtcTransaction
+        is_coinbase = len(tx.vin) == 1 and isinstance(tx.vin[0], BtcVInCoinbase)
+
+        for idx, vout in enumerate(tx.vout):  # type: int, BtcVOut
+            spk: BtcScriptPubKey = vout.scriptPubKey
+            amount = value2amount(vout.value)
+
+            addresses = vout.scriptPubKey.addresses or []
+            address = addresses[0] if addresses else None
+
+            for address in addresses:
+                if address not in tx.addresses:
+                    tx.addresses.append(address)
+
+            if tx.address is None:
+                tx.address = address
+
+            mint_ops.append({
+                'mintTxid': tx.txid,
+                'mintIndex': idx,
+                'mintHeight': height,
+                'coinbase': is_coinbase,
+                'value': amount,
+                'script': spk.hex,
+                'address': address,
+                'addresses': addresses,
+                'wallets': [],
+            })
+
+    return mint_ops
+
+
+def build_block_rows(accessor: BtcDaemonAccessor, raw_block: BtcBlock, raw_storage: str = 'verbose') -> BtcBlockRows:
+    # mint ops first, they fill the transaction addresses
+    mint_ops = get_mint_ops(raw_block.height, raw_block.tx)
+
+    raw_tx_rows = []
+    tx_rows = []
+    tx_inputs = []
+    tx_output_values = []
+
+    for raw_tx in raw_block.tx:  # type: BtcTransaction
+        raw_tx_row = asrow(raw_tx)
+        raw_tx_row['_blockhash'] = raw_block.hash
+        raw_tx_row['_blockheight'] = raw_block.height
+        raw_tx_rows.append(compact_raw_tx_row(raw_tx_row, raw_storage))
+
+        tx = accessor.convert_raw_transaction(raw_tx, raw_block)
+        tx_row = asrow(tx)
+        tx_row['value'] = value2amount(tx.value)
+        tx_row['fee'] = value2amount(raw_tx.fee) if raw_tx.fee is not None else -1
+        tx_rows.append(tx_row)
+
+        tx_inputs.append(None if raw_tx.is_coinbase() else [(vin.txid, vin.vout) for vin in raw_tx.vin])
+        tx_output_values.append(sum(value2amount(vout.value) for vout in raw_tx.vout))
+
+    block: Block = accessor.convert_raw_block(raw_block)
+    block.reward = get_block_reward(raw_block) or 0
+
+    block_row = asrow(block)
+    block_row['reward'] = value2amount(block.reward) if block.reward is not None else None
+
+    raw_block_row = asrow(raw_block)
+    if raw_storage != 'verbose':
+        # transactions are only kept in the raw transactions collection
+        raw_block_row['tx'] = [raw_tx.txid for raw_tx in raw_block.tx]
+
+    return BtcBlockRows(
+        height=raw_block.height,
+        hash=raw_block.hash,
+        size=raw_block.size,
+        raw_block_row=raw_block_row,
+        block_row=block_row,
+        raw_tx_rows=raw_tx_rows,
+        tx_rows=tx_rows,
+        mint_ops=mint_ops,
+        tx_inputs=tx_inputs,
+        tx_output_values=tx_output_values,
+    )
+
+
+def decode_block_rows(spec: AccessorSpec, payload: Union[dict, bytes], height: int, address_encoder=None,
+                      raw_storage: str = 'verbose') -> BtcBlockRows:
+    """Decoding stage entry point: verbose `getblock` data or a serialized block to block rows."""
+    accessor: BtcDaemonAccessor = get_worker_accessor(spec)
+
+    if isinstance(payload, bytes):
+        raw_block = accessor.decode_serialized_block(payload, height, address_encoder)
+    else:
+        raw_block = accessor.load_block_data(payload)
+
+    return build_block_rows(accessor, raw_block, raw_storage)
@@ -1,22 +1,30 @@
 import asyncio
 import time
 import traceback
-from collections import defaultdict
+from collections import defaultdict, deque
 from contextlib import asynccontextmanager
 from enum import Enum
-from typing import Union, List, Optional
+from typing import List, Optional, Deque, AsyncIterator, Dict, Set, Tuple
 
-from pymongo import UpdateOne, DESCENDING
+from pymongo import UpdateOne, UpdateMany, DESCENDING
 
 from .accessor import BtcDaemonAccessor
+from .addresses import AddressDeltas, get_undo_deltas, rebuild_address_summaries
+from .decoder import BtcBlockRows, decode_block_rows
 from .mongo import BtcMongoDatabase
-from .types import BtcVInCoinbase, BtcVIn, BtcScriptPubKey, BtcVOut, BtcTransaction, BtcBlock
 from .utils import value2amount
+from .utils.storage import RAW_STORAGE_MODES
+from .utxo import UtxoCache, CoinKey, CoinValue
+from .wallets import WalletAddressIndex
+from ..utils.batch import BulkWriteBatch
+from ..utils.decoder import DecoderPool
+from ..utils.headers import HeaderChain
+from ..utils.sync import SyncPhase, SyncState
+from ..utils.tip import TIP_CACHE
 from ...application import Application
-from ...database import bulk_write_for, connect_database_for
+from ...database import connect_database_for, bulk_write_for
 from ...model import Block
 from ...types import Importer
-from ...utils import asrow
 from ...utils.jsonrpc import JSONRPCError, JSONRPCConnectionError
 
 
@@ -29,26 +37,165 @@ class BtcTxOutputType(str, Enum):
     nulldata = "nulldata"
     witness_v0_keyhash = "witness_v0_keyhash"
     witness_v0_scripthash = "witness_v0_scripthash"
+    witness_v1_taproot = "witness_v1_taproot"
     witness_unknown = "witness_unknown"
 
 
+class BtcImportBatch(BulkWriteBatch):
+    """
+    Write batch of consecutive blocks.
+
+    Coins minted inside the batch and block rows are kept as plain dicts until the flush, so
+    spends and `nextBlockHash` links inside the batch are applied in memory instead of racing
+    with their upserts inside an unordered bulk write.
+    """
+
+    def __init__(self, db: BtcMongoDatabase, **limits):
+        super().__init__([
+            db.coin_collection,
+            db.raw_tx_collection,
+            db.tx_collection,
+            db.raw_block_collection,
+            db.address_collection,  # after the coins, see `BtcDaemonImporter.undo_block`
+            db.block_collection,  # tip
+        ], **limits)
+        self.db = db
+        self.address_deltas = AddressDeltas()
+        self.mint_ops: List[dict] = []
+        self.mint_map: Dict[str, Dict[int, dict]] = defaultdict(dict)
+        self.raw_block_rows: Dict[str, dict] = {}
+        self.block_rows: Dict[str, dict] = {}
+
+    @property
+    def tip_row(self) -> Optional[dict]:
+        return list(self.block_rows.values())[-1] if self.block_rows else None
+
+    def add_mint_ops(self, mint_ops: List[dict]):
+        self.mint_ops += mint_ops
+        self.op_count += len(mint_ops)
+
+        for mint_op in mint_ops:
+            self.mint_map[mint_op['mintTxid']][mint_op['mintIndex']] = mint_op
+
+    def add_block_rows(self, raw_row: dict, row: dict):
+        prev_raw_row = self.raw_block_rows.get(raw_row.get('previousblockhash'))
+        if prev_raw_row is not None:
+            prev_raw_row['nextblockhash'] = raw_row['hash']
+        else:
+            self.add(self.db.raw_block_collection, UpdateOne(
+                filter={'hash': raw_row.get('previousblockhash')},
+                update={'$set': {'nextblockhash': raw_row['hash']}},
+            ))
+
+        prev_row = self.block_rows.get(row['previousBlockHash'])
+        if prev_row is not None:
+            prev_row['nextBlockHash'] = row['hash']
+        else:
+            self.add(self.db.block_collection, UpdateOne(
+                filter={'hash': row['previousBlockHash']},
+                update={'$set': {'nextBlockHash': row['hash']}},
+            ))
+
+        self.raw_block_rows[raw_row['hash']] = raw_row
+        self.block_rows[row['hash']] = row
+        self.op_count += 2
+
+    async def flush(self):
+        coin_ops = []
+        for mint_op in self.mint_ops:
+            if 'spentHeight' in mint_op:
+                update = {
+                    '$set': mint_op,
+                }
+            else:
+                update = {
+                    '$set': mint_op,
+                    '$setOnInsert': {
+                        'spentHeight': -2,
+                    }
+                }
+
+            coin_ops.append(UpdateOne(
+                filter={
+                    'mintTxid': mint_op['mintTxid'],
+                    'mintIndex': mint_op['mintIndex'],
+                },
+                update=update,
+                upsert=True,
+            ))
+
+        # mints first, spends of older coins were already added in order
+        self.ops[self.db.coin_collection][:0] = coin_ops
+
+        tip_row = self.tip_row
+        if tip_row is not None:
+            self.extend(self.db.address_collection, self.address_deltas.update_ops(tip_row['height']))
+
+        for block_hash, raw_row in self.raw_block_rows.items():
+            self.ops[self.db.raw_block_collection].append(UpdateOne(
+                filter={'hash': block_hash},
+                update={'$set': raw_row},
+                upsert=True,
+            ))
+
+        for block_hash, row in self.block_rows.items():
+            self.ops[self.db.block_collection].append(UpdateOne(
+                filter={'hash': block_hash},
+                update={'$set': row},
+                upsert=True,
+            ))
+
+        await super().flush()
+
+    def clear(self):
+        super().clear()
+        self.mint_ops.clear()
+        self.mint_map.clear()
+        self.address_deltas.clear()
+        self.raw_block_rows.clear()
+        self.block_rows.clear()
+
+
 class BtcDaemonImporter(Importer):
     db: BtcMongoDatabase
 
-    def __init__(self, chain: str, network: str, accessor: BtcDaemonAccessor, app: Application):
+    def __init__(self, chain: str, network: str, accessor: BtcDaemonAccessor, app: Application, *,
+                 prefetch: int = 16, write_batch: dict = None, utxo_cache: float = 256, header_cache: int = 2016,
+                 binary_blocks: bool = False, address_prefixes: dict = None, decode_workers: int = 0,
+                 raw_storage: str = 'verbose', wallet_cache: float = 64, wallet_refresh: float = 10,
+                 address_summary: bool = True):
         super().__init__(chain, network)
         self.accessor = accessor
         self.app = app
+        self.prefetch = max(1, prefetch)
+        self.write_batch = write_batch or {}
+        self.utxo_cache = UtxoCache(utxo_cache)
+        self.wallet_index = WalletAddressIndex(wallet_cache, wallet_refresh)
+        self.headers = HeaderChain(header_cache)
+        self.address_encoder = None
+        if binary_blocks:
+            from .utils.address import AddressEncoder
+            self.address_encoder = AddressEncoder.for_network(network, address_prefixes)
+
+        if raw_storage not in RAW_STORAGE_MODES:
+            raise ValueError(f'invalid raw_storage: {raw_storage!r}')
+
+        self.raw_storage = raw_storage
+        self.address_summary = address_summary
+        self.address_summary_ready = False  # summaries built and updated by the imported blocks
+        self.decoder = DecoderPool(decode_workers)
+        self.sync_state = SyncState()
         self._last_error = time.time()
 
     async def run(self):
         async with self.accessor:
             await self.accessor.ping()
 
-        while True:
-            async with self.error_handler():
-                async with self.accessor:
-                    await self.worker()
+        with self.decoder:
+            while True:
+                async with self.error_handler():
+                    async with self.accessor:
+                        await self.worker()
 
     @asynccontextmanager
     async def error_handler(self):
@@ -74,48 +221,99 @@ class BtcDaemonImporter(Importer):
     async def worker(self):
         async with connect_database_for(self.app) as database:
             self.db = BtcMongoDatabase(self.chain, self.network, database)
+            await self.recover_sync_state()
+            await self.ensure_address_summaries()
+            await self.headers.load(self.db.block_collection)
+            await self.refresh_wallets(force=True)
 
             await self.task_full_sync()
 
             while True:
+                if self.address_summary and not self.address_summary_ready:
+                    # dropped by the sync, see `drop_address_summaries`
+                    await self.ensure_address_summaries()
+
                 await self.task_progress_sync()
                 await asyncio.sleep(30)
 
+    async def recover_sync_state(self):
+        state = await self.db.fetch_sync_state()
+        if state is None:
+            # written before the checkpoint existed: trust the stored tip, but drop anything above it
+            db_tip = await self.get_db_tip()
+            state = SyncState.commit(db_tip.height, db_tip.hash) if db_tip is not None else SyncState()
+            state.phase = SyncPhase.importing
+
+        self.sync_state = state
+        if not state.is_committed:
+            print(self.chain, self.network, 'recover', state.phase.value, 'after', state.height)
+            await self.undo_block(state.height + 1)
+
+    async def ensure_address_summaries(self):
+        if not self.address_summary:
+            # not updated any more, built again from the coins if enabled later
+            await self.db.store_address_summary_height(None)
+            await self.db.address_collection.delete_many({})
+            return
+
+        if await self.db.fetch_address_summary_height() is None:
+            print(self.chain, self.network, 'build address summaries at', self.sync_state.height)
+            await rebuild_address_summaries(self.db.coin_collection, self.db.address_collection,
+                                            self.sync_state.height)
+            await self.db.store_address_summary_height(self.sync_state.height)
+
+        self.address_summary_ready = True
+
+    async def drop_address_summaries(self, batch: BtcImportBatch):
+        # a spent coin is missing from the database, its address too: the summaries can not follow the
+        # coins any more. Until they are built again after the sync, the provider aggregates the coins.
+        print(self.chain, self.network, batch.address_deltas.unresolved, 'unknown spent coins,',
+              'address summaries dropped')
+        self.address_summary_ready = False
+        batch.address_deltas.clear()
+        await self.db.store_address_summary_height(None)
+
+    async def set_sync_state(self, state: SyncState):
+        await self.db.store_sync_state(state)
+        self.sync_state = state
+
     async def task_full_sync(self):
-        db_tip = await self.get_db_tip()
-        if db_tip is not None:
+        if self.sync_state.height >= 0:
             return
 
         local_tip = await self.get_local_tip()
-        for height in range(local_tip.height + 1):
-            await self.import_block(height)
+        await self.import_blocks(range(local_tip.height + 1))
 
     async def task_progress_sync(self):
         db_tip = await self.get_db_tip()
-
-        # TODO: store state in mongodb (detect full sync)
         assert db_tip is not None, 'full sync missing'
 
-        height = db_tip.height
-        invalid = False
-        offset = 0
-        while True:
-            local_block_hash = await self.get_local_block_hash(height + offset)
-            db_block = await self.get_db_block(height + offset)
-            if db_block is not None and local_block_hash == db_block.hash:
-                break
+        if self.headers.tip_height != db_tip.height or self.headers.tip_hash != db_tip.hash:
+            await self.headers.load(self.db.block_collection)
 
-            invalid = True
-            offset -= 1
+        local_tip = await self.get_local_tip()
+        fork_height = await self.headers.find_fork_height(self.accessor.get_block_hashes, local_tip.height)
+        if fork_height is None:
+            # the fork is older than the blocks kept in memory
+            fork_height = await self.find_db_fork_height(self.headers.start_height - 1)
 
-        if invalid:
-            await self.undo_block(height + offset)
+        if fork_height < db_tip.height:
+            await self.undo_block(fork_height + 1)
 
-        db_tip = await self.get_db_tip()
         local_tip = await self.get_local_tip()
 
-        for height in range(db_tip.height + 1, local_tip.height + 1):
-            await self.import_block(height)
+        await self.import_blocks(range(min(fork_height, db_tip.height) + 1, local_tip.height + 1))
+
+    async def find_db_fork_height(self, height: int) -> int:
+        while height >= 0:
+            local_block_hash = await self.get_local_block_hash(height)
+            db_block = await self.get_db_block(height)
+            if db_block is not None and local_block_hash == db_block.hash:
+                break
+
+            height -= 1
+
+        return height
 
     async def get_db_block(self, block_height: int) -> Optional[Block]:
         block: Optional[dict] = await self.db.block_collection.find_one({'height': block_height})
@@ -155,6 +353,24 @@ class BtcDaemonImporter(Importer):
 
     async def undo_block(self, height: int):
         print(self.chain, self.network, 'undo block', height)
+        # after a crash the summaries may be partially updated, rebuild those of the affected coins instead
+        rebuild_addresses = not self.sync_state.is_committed
+        prev_block = await self.get_db_block(height - 1)
+        prev_hash = prev_block.hash if prev_block is not None else None
+        await self.set_sync_state(SyncState(height - 1, prev_hash, SyncPhase.undoing, height))
+
+        addresses = None
+        if self.address_summary:
+            if rebuild_addresses:
+                addresses = await self.get_undo_addresses(height)
+            else:
+                # reverted before the coins, an interrupted undo is recovered by a rebuild
+                async with bulk_write_for(self.db.address_collection, ordered=False) as db_ops:
+                    db_ops += (await get_undo_deltas(self.db.coin_collection, height)).update_ops(height - 1)
+
+        self.utxo_cache.clear()
+        self.headers.truncate(height)
+        TIP_CACHE.invalidate(self.chain, self.network)
 
         await self.db.block_collection.delete_many(
             {'height': {'$gte': height}}
@@ -186,188 +402,251 @@ class BtcDaemonImporter(Importer):
             {'_blockheight': {'$gte': height}}
         )
 
-    async def import_block(self, height: int):
-        print(self.chain, self.network, 'processing', height, 'block')
-        raw_block: BtcBlock = await self.accessor.get_raw_block(height)
+        if addresses is not None:
+            await rebuild_address_summaries(self.db.coin_collection, self.db.address_collection, height - 1,
+                                            list(addresses))
+
+        await self.set_sync_state(SyncState.commit(height - 1, prev_hash))
+
+    async def get_undo_addresses(self, height: int) -> Set[str]:
+        addresses = set()
+        async for coin in self.db.coin_collection.find(
+                {'$or': [{'mintHeight': {'$gte': height}}, {'spentHeight': {'$gte': height}}]},
+                projection={'_id': False, 'address': True},
+        ):
+            if coin.get('address') is not None:
+                addresses.add(coin['address'])
+
+        return addresses
+
+    def new_batch(self) -> BtcImportBatch:
+        return BtcImportBatch(self.db, **self.write_batch)
+
+    async def import_blocks(self, heights: range):
+        # fetch (and decode) up to `prefetch` blocks ahead, but write them strictly in height order
+        block_hashes = self.iter_block_hashes(heights)
+        pending: Deque[asyncio.Future] = deque()
+        batch = self.new_batch()
+
+        async def schedule():
+            try:
+                height, block_hash = await block_hashes.__anext__()
+            except StopAsyncIteration:
+                pass
+            else:
+                pending.append(asyncio.ensure_future(self.fetch_block(block_hash, height)))
 
-        mint_ops = self.get_mint_ops(height, raw_block.tx)
-        spend_ops = self.get_spend_ops(height, raw_block.tx, mint_ops)
-        await self.update_wallets(mint_ops)
+        try:
+            for _ in range(self.prefetch):
+                await schedule()
+
+            while pending:
+                rows: BtcBlockRows = await pending.popleft()
+                await schedule()
+                await self.write_block_rows(batch, rows)
+
+                if batch.full:
+                    await self.flush_batch(batch)
+
+            await self.flush_batch(batch)
+        finally:
+            for future in pending:
+                future.cancel()
+
+            if pending:
+                await asyncio.wait(pending)
+
+    async def iter_block_hashes(self, heights: range) -> AsyncIterator[Tuple[int, str]]:
+        for offset in range(0, len(heights), self.prefetch):
+            chunk = heights[offset:offset + self.prefetch]
+            for height, block_hash in zip(chunk, await self.accessor.get_block_hashes(list(chunk))):
+                yield height, block_hash
+
+    async def fetch_block(self, block_hash: str, height: int) -> BtcBlockRows:
+        if self.address_encoder is not None:
+            # serialized block (~3-5x smaller than verbose json), decoded here
+            payload = await self.accessor.get_serialized_block(block_hash)
+        else:
+            payload = await self.accessor.get_raw_block_data(block_hash)
+
+        accessor_spec = (type(self.accessor), self.chain, self.network, self.accessor.rpc.url)
+        return await self.decoder.run(decode_block_rows, accessor_spec, payload, height, self.address_encoder,
+                                      self.raw_storage)
 
-        await self.write_mint_ops(mint_ops)
-        await self.write_spend_ops(spend_ops)
-        await self.write_txs(raw_block, raw_block.tx)
-        await self.write_block(raw_block)
+    async def import_block(self, height: int):
+        block_hash = await self.accessor.get_block_hash(height)
+        rows = await self.fetch_block(block_hash, height)
 
-    @staticmethod
-    def get_block_reward(raw_block: BtcBlock) -> Optional[float]:
-        coinbase_tx = raw_block.tx[0] if raw_block.tx else None
-        if not coinbase_tx:
-            return None
+        batch = self.new_batch()
+        await self.write_block_rows(batch, rows)
+        await self.flush_batch(batch)
 
-        assert isinstance(coinbase_tx, BtcTransaction), coinbase_tx
-        assert len(coinbase_tx.vin) == 1 and isinstance(coinbase_tx.vin[0], BtcVInCoinbase), coinbase_tx.vin
-        return sum(vout.value for vout in coinbase_tx.vout)
+    async def flush_batch(self, batch: BtcImportBatch):
+        tip_row = batch.tip_row
+        headers = [(row['height'], row['hash']) for row in batch.block_rows.values()]
+        if tip_row is not None:
+            await self.set_sync_state(self.sync_state.begin(SyncPhase.importing, tip_row['height']))
 
-    async def write_block(self, raw_block: BtcBlock):
-        block: Block = self.accessor.convert_raw_block(raw_block)
-        block.reward = self.get_block_reward(raw_block) or 0
+        await batch.flush()
 
-        async with bulk_write_for(self.db.raw_block_collection, ordered=False) as db_ops:
-            db_ops.append(UpdateOne(
-                filter={'hash': block.hash},
-                update={'$set': asrow(raw_block)},
-                upsert=True,
-            ))
+        for height, block_hash in headers:
+            self.headers.append(height, block_hash)
 
-            db_ops.append(UpdateOne(
-                filter={'hash': block.previousBlockHash},
-                update={'$set': {'nextblockhash': block.hash}},
-            ))
+        if tip_row is not None:
+            await self.set_sync_state(SyncState.commit(tip_row['height'], tip_row['hash']))
+            TIP_CACHE.set(self.chain, self.network, self.db.convert_raw_block(tip_row))
 
-        async with bulk_write_for(self.db.block_collection, ordered=False) as db_ops:
-            row = asrow(block)
-            row['reward'] = value2amount(block.reward) if block.reward is not None else None
+    async def write_block_rows(self, batch: BtcImportBatch, rows: BtcBlockRows):
+        height = rows.height
+        print(self.chain, self.network, 'processing', height, 'block')
 
-            db_ops.append(UpdateOne(
-                filter={'hash': block.hash},
-                update={'$set': row},
-                upsert=True,
-            ))
+        await self.refresh_wallets(batch)
+        batch.add_mint_ops(rows.mint_ops)
 
-            db_ops.append(UpdateOne(
-                filter={'hash': block.previousBlockHash},
-                update={'$set': {'nextBlockHash': block.hash}},
-            ))
+        spend_ops, input_values = await self.get_spend_ops(rows, batch.mint_map)
+        await self.update_wallets(rows.mint_ops)
 
-    async def write_txs(self, raw_block: BtcBlock, txs: List[BtcTransaction]):
-        async with bulk_write_for(self.db.raw_tx_collection, ordered=False) as db_ops:
-            for raw_tx in txs:
-                row = asrow(raw_tx)
-                row['_blockhash'] = raw_block.hash
-                row['_blockheight'] = raw_block.height
-
-                db_ops.append(UpdateOne(
-                    filter={'txid': raw_tx.txid},
-                    update={'$set': row},
-                    upsert=True,
-                ))
+        if self.address_summary_ready:
+            batch.address_deltas.add_block(rows.mint_ops, rows.tx_rows, rows.tx_inputs, input_values)
+            if batch.address_deltas.unresolved:
+                await self.drop_address_summaries(batch)
 
-        async with bulk_write_for(self.db.tx_collection, ordered=False) as db_ops:
-            for raw_tx in txs:
-                tx = self.accessor.convert_raw_transaction(raw_tx, raw_block)
-                row = asrow(tx)
-                row['value'] = value2amount(tx.value)
+        for mint_op in rows.mint_ops:
+            if 'spentHeight' not in mint_op:
+                self.utxo_cache.add(mint_op['mintTxid'], mint_op['mintIndex'], mint_op['value'], mint_op['address'])
 
-                db_ops.append(UpdateOne(
-                    filter={'txid': tx.txid},
-                    update={'$set': row},
-                    upsert=True,
-                ))
+        self.write_spend_ops(batch, spend_ops)
+        self.write_txs(batch, rows)
+        batch.add_block_rows(rows.raw_block_row, rows.block_row)
+        batch.add_block(rows.size)
 
-    def get_mint_ops(self, height: int, txs: List[BtcTransaction]) -> List[dict]:
-        mint_ops = []
+    def write_txs(self, batch: BtcImportBatch, rows: BtcBlockRows):
+        for raw_tx_row in rows.raw_tx_rows:
+            batch.add(self.db.raw_tx_collection, UpdateOne(
+                filter={'txid': raw_tx_row['txid']},
+                update={'$set': raw_tx_row},
+                upsert=True,
+            ))
 
-        for tx in txs:  # type: BtcTransaction
-            is_coinbase = len(tx.vin) == 1 and isinstance(tx.vin[0], BtcVInCoinbase)
+        for tx_row in rows.tx_rows:
+            batch.add(self.db.tx_collection, UpdateOne(
+                filter={'txid': tx_row['txid']},
+                update={'$set': tx_row},
+                upsert=True,
+            ))
 
-            for idx, vout in enumerate(tx.vout):  # type: int, BtcVOut
-                spk: BtcScriptPubKey = vout.scriptPubKey
-                amount = value2amount(vout.value)
+    async def get_spend_ops(self, rows: BtcBlockRows,
+                            mint_map: Dict[str, Dict[int, dict]]) -> Tuple[List[dict], Dict[CoinKey, CoinValue]]:
+        height = rows.height
+        spend_ops = []
+        input_values: Dict[CoinKey, CoinValue] = {}
+        missing_keys: Set[CoinKey] = set()
 
-                addresses = vout.scriptPubKey.addresses or []
-                address = addresses[0] if addresses else None
+        for tx_row, inputs in zip(rows.tx_rows, rows.tx_inputs):
+            if inputs is None:  # coinbase
+                continue
 
-                for address in addresses:
-                    if address not in tx.addresses:
-                        tx.addresses.append(address)
+            txid = tx_row['txid']
+            for key in inputs:
+                mint_txid, mint_index = key
+
+                # coins minted in the same batch are not written yet, update them in place
+                same_batch_spend = mint_map.get(mint_txid, {}).get(mint_index)
+                if same_batch_spend is not None:
+                    same_batch_spend['spentTxid'] = txid
+                    same_batch_spend['spentHeight'] = height
+                    input_values[key] = (same_batch_spend['value'], same_batch_spend['address'])
+                    self.utxo_cache.discard(*key)
+                    continue
 
-                if tx.address is None:
-                    tx.address = address
+                coin = self.utxo_cache.spend(*key)
+                if coin is not None:
+                    input_values[key] = coin
+                else:
+                    missing_keys.add(key)
 
-                mint_ops.append({
-                    'mintTxid': tx.txid,
-                    'mintIndex': idx,
-                    'mintHeight': height,
-                    'coinbase': is_coinbase,
-                    'value': amount,
-                    'script': spk.hex,
-                    'address': address,
-                    'addresses': addresses,
-                    'wallets': [],
+                spend_ops.append({
+                    'mintTxid': mint_txid,
+                    'mintIndex': mint_index,
+                    'spentTxid': txid,
+                    'spentHeight': height,
                 })
 
-        return mint_ops
+        if missing_keys:
+            input_values.update(await self.get_coin_values(missing_keys))
 
-    async def write_mint_ops(self, mint_ops: List[dict]):
-        async with bulk_write_for(self.db.coin_collection, ordered=False) as db_ops:
-            for mint_op in mint_ops:
-                if 'spentHeight' in mint_op:
-                    update = {
-                        '$set': mint_op,
-                    }
-                else:
-                    update = {
-                        '$set': mint_op,
-                        '$setOnInsert': {
-                            'spentHeight': -2,
-                        }
-                    }
+        raw_block_txs = rows.raw_block_row.get('tx') or []
+        for idx, (raw_tx_row, tx_row) in enumerate(zip(rows.raw_tx_rows, rows.tx_rows)):
+            fee = self.get_fee(raw_tx_row['fee'], rows.tx_inputs[idx], rows.tx_output_values[idx], input_values)
+            raw_tx_row['fee'] = fee
+            tx_row['fee'] = value2amount(fee) if fee is not None else -1
+            if idx < len(raw_block_txs) and isinstance(raw_block_txs[idx], dict):
+                raw_block_txs[idx]['fee'] = fee
 
-                db_ops.append(UpdateOne(
-                    filter={
-                        'mintTxid': mint_op['mintTxid'],
-                        'mintIndex': mint_op['mintIndex'],
-                    },
-                    update=update,
-                    upsert=True,
-                ))
+        return spend_ops, input_values
 
-    def get_spend_ops(self, height: int, txs: List[BtcTransaction], mint_ops: List[dict]) -> List[dict]:
-        spend_ops = []
+    async def get_coin_values(self, keys: Set[CoinKey]) -> Dict[CoinKey, CoinValue]:
+        values = {}
 
-        mint_map = defaultdict(dict)
-        for mint_op in mint_ops:
-            mint_map[mint_op['mintTxid']][mint_op['mintIndex']] = mint_op
+        async for raw_coin in self.db.coin_collection.find(
+                filter={'mintTxid': {'$in': list({txid for txid, _ in keys})}},
+                projection={'_id': False, 'mintTxid': True, 'mintIndex': True, 'value': True, 'address': True},
+        ):
+            key = (raw_coin['mintTxid'], raw_coin['mintIndex'])
+            if key in keys:
+                values[key] = (raw_coin['value'], raw_coin.get('address'))
 
-        for raw_tx in txs:  # type: BtcTransaction
-            is_coinbase = len(raw_tx.vin) == 1 and isinstance(raw_tx.vin[0], BtcVInCoinbase)
-            if is_coinbase:
-                continue
+        return values
 
-            for idx, vin in enumerate(raw_tx.vin):  # type: int, Union[BtcVIn, BtcVInCoinbase]
-                if isinstance(vin, BtcVInCoinbase):
-                    continue
+    @staticmethod
+    def get_fee(node_fee: Optional[float], inputs: Optional[List[CoinKey]], output_value: int,
+                input_values: Dict[CoinKey, CoinValue]) -> Optional[float]:
+        if inputs is None:  # coinbase
+            return 0
 
-                same_block_spend = mint_map.get(vin.txid, {}).get(vin.vout)
-                if same_block_spend is not None:
-                    same_block_spend['spentTxid'] = raw_tx.txid
-                    same_block_spend['spentHeight'] = height
-                    continue
+        try:
+            input_value = sum(input_values[key][0] for key in inputs)
+        except KeyError:
+            return node_fee  # keep the fee reported by the node (if any)
+
+        return (input_value - output_value) / 1e8
+
+    def write_spend_ops(self, batch: BtcImportBatch, spend_ops: List[dict]):
+        for spend_op in spend_ops:
+            batch.add(self.db.coin_collection, UpdateOne(
+                filter={
+                    'mintTxid': spend_op['mintTxid'],
+                    'mintIndex': spend_op['mintIndex'],
+                },
+                update={
+                    '$set': {
+                        'spentTxid': spend_op['spentTxid'],
+                        'spentHeight': spend_op['spentHeight'],
+                    },
+                },
+            ))
 
-                spend_ops.append({
-                    'mintTxid': vin.txid,
-                    'mintIndex': vin.vout,
-                    'spentTxid': raw_tx.txid,
-                    'spentHeight': height,
-                })
+    async def refresh_wallets(self, batch: Optional[BtcImportBatch] = None, *, force: bool = False):
+        synced_height = self.wallet_index.synced_height
+        added = await self.wallet_index.refresh(self.db.wallet_address_collection, self.sync_state.height,
+                                                force=force)
+        if not added:
+            return
 
-        return spend_ops
+        # the provider only tags the coins that existed when the addresses were added,
+        # tag the ones imported since the previous refresh (and the ones of the pending batch)
+        if batch is not None:
+            for mint_op in batch.mint_ops:
+                for address in mint_op['addresses']:
+                    for wallet in added.get(address, ()):
+                        if wallet not in mint_op['wallets']:
+                            mint_op['wallets'].append(wallet)
 
-    async def write_spend_ops(self, spend_ops: List[dict]):
         async with bulk_write_for(self.db.coin_collection, ordered=False) as db_ops:
-            for spend_op in spend_ops:
-                db_ops.append(UpdateOne(
-                    filter={
-                        'mintTxid': spend_op['mintTxid'],
-                        'mintIndex': spend_op['mintIndex'],
-                    },
-                    update={
-                        '$set': {
-                            'spentTxid': spend_op['spentTxid'],
-                            'spentHeight': spend_op['spentHeight'],
-                        },
-                    },
+            for address, wallets in added.items():
+                db_ops.append(UpdateMany(
+                    filter={'addresses': address, 'mintHeight': {'$gt': synced_height}},
+                    update={'$addToSet': {'wallets': {'$each': wallets}}},
                 ))
 
     async def update_wallets(self, mint_ops: List[dict]):
@@ -376,11 +655,7 @@ class BtcDaemonImporter(Importer):
             for address in mint_op['addresses']:
                 mapping[address].append(mint_op)
 
-        addresses = list(mapping)
-
-        async for wallet_address in self.db.wallet_address_collection.find({'address': {'$in': addresses}}):
-            address = wallet_address['address']
-            wallet = wallet_address['wallet']
-
+        watched = await self.wallet_index.match(self.db.wallet_address_collection, mapping)
+        for address, wallets in watched.items():
             for target_op in mapping[address]:
-                target_op['wallets'].append(wallet)
+                target_op['wallets'].extend(wallets)
@@ -1,11 +1,11 @@
+import asyncio
 from typing import Optional
 
-from pymongo import DESCENDING
+from pymongo import IndexModel
 
 from ..utils.mongo import BlockchainMongoCollection, BlockchainMongoDatabase, index
 from ...database import MongoDatabase
-from ...error import BlockNotFound
-from ...model import Block, Transaction, Coin, Wallet, WalletAddress
+from ...model import Block, Transaction, Coin, Wallet, WalletAddress, AddressSummary
 
 
 class BtcMongoDatabase(BlockchainMongoDatabase):
@@ -16,64 +16,99 @@ class BtcMongoDatabase(BlockchainMongoDatabase):
     wallet_address_collection: BlockchainMongoCollection[WalletAddress]
     raw_block_collection: BlockchainMongoCollection[dict]
     raw_tx_collection: BlockchainMongoCollection[dict]
+    address_collection: BlockchainMongoCollection[AddressSummary]
+
+    ADDRESS_SUMMARY_STATE_ID = 'addresses'
 
     def __init__(self, chain: str, network: str, database: MongoDatabase):
         super().__init__(chain, network, database)
-        self.block_collection = self.new_collection('blocks', self.convert_raw_block, self.fetch_block_tip)
-        self.tx_collection = self.new_collection('transactions', self.convert_raw_transaction, self.fetch_block_tip)
-        self.coin_collection = self.new_collection('coins', self.convert_raw_coin, self.fetch_block_tip)
+        self.block_collection = self.new_collection('blocks', self.convert_raw_block, self.fetch_block_tip,
+                                                    injector=self.inject_raw_block, model=Block)
+        self.tx_collection = self.new_collection('transactions', self.convert_raw_transaction, self.fetch_block_tip,
+                                                 injector=self.inject_raw_transaction, model=Transaction)
+        self.coin_collection = self.new_collection('coins', self.convert_raw_coin, self.fetch_block_tip,
+                                                   injector=self.inject_raw_coin, model=Coin)
         self.wallet_collection = self.new_collection('wallets', self.convert_raw_wallet, self.fetch_block_tip)
         self.wallet_address_collection = self.new_collection('walletaddresses', self.convert_raw_wallet_address, None)
         self.raw_block_collection = self.new_collection('raw_blocks', dict, None)
         self.raw_tx_collection = self.new_collection('raw_transactions', dict, None)
+        self.address_collection = self.new_collection('addresses', self.convert_raw_address_summary, None)
 
     async def create_indexes(self):
-        # block
-        await self.block_collection.create_index(index(hash=1), background=True)
-        await self.block_collection.create_index(index(height=1), background=True)
-        await self.block_collection.create_index(index(processed=1, height=-1), background=True)
-        await self.block_collection.create_index(index(timeNormalized=1), background=True)
-        await self.block_collection.create_index(index(previousBlockHash=1), background=True)
-
-        # coins
-        await self.coin_collection.create_index(index(mintHeight=1), background=True)
-        await self.coin_collection.create_index(index(spentTxid=1), background=True)
-        await self.coin_collection.create_index(index(spentHeight=1), background=True)
-        await self.coin_collection.create_index(index(mintTxid=1, mintIndex=1), background=True)
-        await self.coin_collection.create_index(index(wallets=1), background=True)
-        await self.coin_collection.create_index(index(wallets=1, spentHeight=1, value=1, mintHeight=1), background=True)
-        await self.coin_collection.create_index(index(wallets=1, spentTxid=1), background=True)
-        await self.coin_collection.create_index(index(wallets=1, mintTxid=1), background=True)
-        await self.coin_collection.create_index(index(addresses=1), background=True)
-
-        # transactions
-        await self.tx_collection.create_index(index(txid=1), background=True)
-        await self.tx_collection.create_index(index(blockHeight=1), background=True)
-        await self.tx_collection.create_index(index(blockHash=1), background=True)
-        await self.tx_collection.create_index(index(blockTimeNormalized=1), background=True)
-        await self.tx_collection.create_index(index(wallets=1, blockTimeNormalized=1), background=True)
-        await self.tx_collection.create_index(index(wallets=1, blockHeight=1), background=True)
-        await self.tx_collection.create_index(index(addresses=1), background=True)
-
-        # wallets
-        await self.wallet_collection.create_index(index(pubKey=1), background=True)
-
-        # walletaddresses
-        await self.wallet_address_collection.create_index(index(address=1, wallet=1), background=True, unique=True)
-        await self.wallet_address_collection.create_index(index(wallet=1, address=1), background=True, unique=True)
+        await asyncio.gather(
+            # block
+            self.block_collection.ensure_indexes([
+                IndexModel(index(hash=1), background=True),
+                IndexModel(index(height=1), background=True),
+                IndexModel(index(processed=1, height=-1), background=True),
+                IndexModel(index(timeNormalized=1), background=True),
+                IndexModel(index(previousBlockHash=1), background=True),
+            ]),
+            # coins
+            self.coin_collection.ensure_indexes([
+                IndexModel(index(mintHeight=1), background=True),
+                IndexModel(index(spentTxid=1), background=True),
+                IndexModel(index(spentHeight=1), background=True),
+                IndexModel(index(mintTxid=1, mintIndex=1), background=True),
+                IndexModel(index(wallets=1), background=True),
+                IndexModel(index(wallets=1, spentHeight=1, value=1, mintHeight=1), background=True),
+                IndexModel(index(wallets=1, spentTxid=1), background=True),
+                IndexModel(index(wallets=1, mintTxid=1), background=True),
+                IndexModel(index(addresses=1), background=True),
+            ]),
+            # transactions
+            self.tx_collection.ensure_indexes([
+                IndexModel(index(txid=1), background=True),
+                IndexModel(index(blockHeight=1), background=True),
+                IndexModel(index(blockHash=1), background=True),
+                IndexModel(index(blockTimeNormalized=1), background=True),
+                IndexModel(index(wallets=1, blockTimeNormalized=1), background=True),
+                IndexModel(index(wallets=1, blockHeight=1), background=True),
+                IndexModel(index(addresses=1), background=True),
+            ]),
+            # wallets
+            self.wallet_collection.ensure_indexes([
+                IndexModel(index(pubKey=1), background=True),
+            ]),
+            # walletaddresses
+            self.wallet_address_collection.ensure_indexes([
+                IndexModel(index(address=1, wallet=1), background=True, unique=True),
+                IndexModel(index(wallet=1, address=1), background=True, unique=True),
+            ]),
+            # raw blocks
+            self.raw_block_collection.ensure_indexes([
+                IndexModel(index(hash=1), background=True),
+                IndexModel(index(height=1), background=True),
+            ]),
+            # raw transactions
+            self.raw_tx_collection.ensure_indexes([
+                IndexModel(index(txid=1), background=True),
+                IndexModel(index(_blockhash=1), background=True),
+                IndexModel(index(_blockheight=1), background=True),
+            ]),
+            # address summaries
+            self.address_collection.ensure_indexes([
+                IndexModel(index(address=1), background=True, unique=True),
+            ]),
+        )
 
-        # raw blocks
-        await self.raw_block_collection.create_index(index(hash=1), background=True)
-        await self.raw_block_collection.create_index(index(height=1), background=True)
+    @staticmethod
+    def convert_raw_address_summary(raw_summary: dict) -> AddressSummary:
+        raw_summary.pop('_id', None)
+        return AddressSummary(**raw_summary)
 
-        # raw transactions
-        await self.raw_tx_collection.create_index(index(txid=1), background=True)
-        await self.raw_tx_collection.create_index(index(_blockhash=1), background=True)
-        await self.raw_tx_collection.create_index(index(_blockheight=1), background=True)
+    async def fetch_address_summary_height(self) -> Optional[int]:
+        """Height the address summaries were built at, None until they are complete."""
+        row = await self.sync_state_collection.find_one({'_id': self.ADDRESS_SUMMARY_STATE_ID})
+        return row['height'] if row is not None else None
 
-    async def fetch_block_tip(self):
-        raw_block: Optional[dict] = await self.block_collection.find_one(sort=[('height', DESCENDING)])
-        if raw_block is None:
-            raise BlockNotFound(None)
+    async def store_address_summary_height(self, height: Optional[int]):
+        if height is None:
+            await self.sync_state_collection.delete_one({'_id': self.ADDRESS_SUMMARY_STATE_ID})
+            return
 
-        return self.convert_raw_block(raw_block)
+        await self.sync_state_collection.replace_one(
+            {'_id': self.ADDRESS_SUMMARY_STATE_ID},
+            {'height': height},
+            upsert=True,
+        )
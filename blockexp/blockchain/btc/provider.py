@@ -4,14 +4,17 @@ from typing import Union, List, Optional, TypeVar
 from pymongo import DESCENDING, ASCENDING, InsertOne, UpdateMany, UpdateOne
 
 from .accessor import BtcDaemonAccessor
+from .addresses import address_summary_pipeline
 from .bitcoind import AsyncBitcoinDeamon
+from .decoder import get_mint_ops
 from .mongo import BtcMongoDatabase
+from .utils.storage import is_compact_raw_tx_row, load_raw_tx_bytes
 from ..utils.mongo import get_balance
 from ...database import bulk_write_for
 from ...error import BlockNotFound, TransactionNotFound, WalletNotFound
 from ...model import Block, Transaction, EstimateFee, TransactionId, CoinListing, Authhead, Balance, Coin, Wallet, \
-    WalletAddress, WalletCheckResult, DailyTransactions
-from ...model.options import SteamingFindOptions
+    WalletAddress, WalletCheckResult, DailyTransactions, AddressSummary
+from ...model.options import SteamingFindOptions, Streaming
 from ...types import Provider
 from ...utils import asrow
 
@@ -20,10 +23,22 @@ MAX_SAFE_INTEGER = 9007199254740991  # Number.MAX_SAFE_INTEGER
 
 
 class BtcMongoProvider(Provider):
-    def __init__(self, chain: str, network: str, db: BtcMongoDatabase, accessor: BtcDaemonAccessor):
+    def __init__(self, chain: str, network: str, db: BtcMongoDatabase, accessor: BtcDaemonAccessor, *,
+                 address_prefixes: dict = None):
         super().__init__(chain, network)
         self.db = db
         self.accessor = accessor
+        self.address_prefixes = address_prefixes
+        self._address_encoder = None
+
+    @property
+    def address_encoder(self):
+        if self._address_encoder is None:
+            # python-bitcoinlib is only required to decode compact raw transactions
+            from .utils.address import AddressEncoder
+            self._address_encoder = AddressEncoder.for_network(self.network, self.address_prefixes)
+
+        return self._address_encoder
 
     @property
     def rpc(self) -> AsyncBitcoinDeamon:
@@ -32,7 +47,7 @@ class BtcMongoProvider(Provider):
     async def stream_address_transactions(self,
                                           address: str,
                                           unspent: bool,
-                                          find_options: SteamingFindOptions) -> List[Transaction]:
+                                          find_options: SteamingFindOptions) -> Streaming[Transaction]:
         query = {'addresses': address}
         if unspent is not None:
             if unspent:
@@ -42,7 +57,10 @@ class BtcMongoProvider(Provider):
 
         return await self.db.tx_collection.streaming(query, find_options)
 
-    async def stream_address_utxos(self, address: str, unspent: bool, find_options: SteamingFindOptions) -> List[Coin]:
+    async def stream_address_utxos(self,
+                                   address: str,
+                                   unspent: bool,
+                                   find_options: SteamingFindOptions) -> Streaming[Coin]:
         query = {'addresses': address}
         if unspent is not None:
             if unspent:
@@ -53,13 +71,43 @@ class BtcMongoProvider(Provider):
         return await self.db.coin_collection.streaming(query, find_options)
 
     async def get_balance_for_address(self, address: str) -> Balance:
-        raw_coins = await self.db.coin_collection.fetch_all({
-            'address': address,
-            'spentHeight': {'$lt': 0},
-            'mintHeight': {'$gt': -3},
-        })
+        summary = await self.get_address_summary(address)
+        return Balance(confirmed=summary.balance, unconfirmed=summary.unconfirmed,
+                       balance=summary.balance + summary.unconfirmed)
+
+    async def get_address_summary(self, address: str) -> AddressSummary:
+        summary = await self.get_confirmed_address_summary(address)
+        summary.unconfirmed = await self.get_unconfirmed_value(address)
+        return summary
+
+    async def get_confirmed_address_summary(self, address: str) -> AddressSummary:
+        if await self.db.fetch_address_summary_height() is not None:
+            summary: Optional[AddressSummary] = await self.db.address_collection.fetch_one({'address': address})
+            return summary if summary is not None else AddressSummary(address)
+
+        # summaries disabled or not built yet, aggregate the coins
+        async for row in self.db.coin_collection.aggregate(address_summary_pipeline([address])):
+            return AddressSummary(
+                address,
+                balance=row['received'] - row['sent'],
+                received=row['received'],
+                sent=row['sent'],
+                txCount=row['txCount'],
+                utxoCount=row['utxoCount'],
+            )
+
+        return AddressSummary(address)
+
+    async def get_unconfirmed_value(self, address: str) -> int:
+        # unspent coins not in a block yet (mintHeight -1 or -2), never part of the summaries
+        unconfirmed = 0
+        async for raw_coin in self.db.coin_collection.find(
+                {'address': address, 'mintHeight': {'$gt': -3, '$lt': 0}, 'spentHeight': {'$lt': 0}},
+                projection={'_id': False, 'value': True},
+        ):
+            unconfirmed += raw_coin['value']
 
-        return get_balance(raw_coins)
+        return unconfirmed
 
     async def stream_blocks(self,
                             since_block: Union[str, int] = None,
@@ -67,7 +115,7 @@ class BtcMongoProvider(Provider):
                             end_date: str = None,
                             date: str = None,
                             *,
-                            find_options: SteamingFindOptions) -> List[Block]:
+                            find_options: SteamingFindOptions) -> Streaming[Block]:
         query = {}
 
         if since_block is None:
@@ -124,13 +172,45 @@ class BtcMongoProvider(Provider):
         if raw_block is None:
             raise BlockNotFound(block_id)
 
+        if any(isinstance(item, str) for item in raw_block.get('tx') or []):
+            raw_block['tx'] = await self.load_raw_transactions(raw_block)
+
         return raw_block
 
+    async def load_raw_transactions(self, raw_block: dict) -> List[Union[str, dict]]:
+        """Verbose transactions of a raw block stored with a compact `raw_storage`."""
+        raw_tx_rows = {}
+        async for raw_tx_row in self.db.raw_tx_collection.find({'_blockhash': raw_block['hash']}):
+            raw_tx_rows[raw_tx_row['txid']] = raw_tx_row
+
+        txs = []
+        for txid in raw_block['tx']:
+            raw_tx_row = raw_tx_rows.get(txid)
+            if raw_tx_row is None:
+                txs.append(txid)
+            elif is_compact_raw_tx_row(raw_tx_row):
+                txs.append(self.expand_raw_tx_row(raw_tx_row))
+            else:
+                raw_tx_row.pop('_id', None)
+                txs.append(raw_tx_row)
+
+        return txs
+
+    def expand_raw_tx_row(self, raw_tx_row: dict) -> dict:
+        raw_tx = self.accessor.decode_serialized_transaction(load_raw_tx_bytes(raw_tx_row), self.address_encoder)
+        raw_tx.fee = raw_tx_row.get('fee')
+        get_mint_ops(raw_tx_row['_blockheight'], [raw_tx])  # fills address and addresses
+
+        row = asrow(raw_tx)
+        row['_blockhash'] = raw_tx_row['_blockhash']
+        row['_blockheight'] = raw_tx_row['_blockheight']
+        return row
+
     async def stream_transactions(self,
                                   block_height: Optional[int] = None,
                                   block_hash: Optional[str] = None,
                                   *,
-                                  find_options: SteamingFindOptions) -> List[Transaction]:
+                                  find_options: SteamingFindOptions) -> Streaming[Transaction]:
         query = {}
 
         if block_height is not None:
@@ -292,7 +372,7 @@ class BtcMongoProvider(Provider):
                                          start_date: str = None,
                                          end_date: str = None,
                                          *,
-                                         find_options: SteamingFindOptions) -> List[Transaction]:
+                                         find_options: SteamingFindOptions) -> Streaming[Transaction]:
         assert wallet._id is not None
 
         query = {'wallets': wallet._id}
@@ -394,5 +474,5 @@ class BtcMongoProvider(Provider):
     async def get_local_tip(self) -> Block:
         return await self.db.fetch_block_tip()
 
-    async def get_locator_hashes(self):
-        raise NotImplementedError
+    async def get_locator_hashes(self) -> List[str]:
+        return await self.db.fetch_locator_hashes()
@@ -6,6 +6,7 @@ from typing import List, Union, Optional
 class BtcVInCoinbase:
     coinbase: str
     sequence: int
+    txinwitness: List[str] = None  # witness reserved value of segwit blocks
 
 
 @dataclass
@@ -60,6 +61,7 @@ class BtcTransaction:
     confirmations: int = None
     time: int = None
     blocktime: int = None
+    fee: float = None
     address: str = None
     addresses: List[str] = field(default_factory=list)
     wallets: List[str] = field(default_factory=list)
@@ -0,0 +1,229 @@
+import hashlib
+from typing import List, Optional, Tuple, Union
+
+from .cscript import AdvancedCScript, _valid_pubkey_buf
+
+try:
+    import bitcoin
+except ImportError as e:
+    raise Exception("You need install python-bitcoinlib")
+else:
+    from bitcoin.base58 import encode as b58encode
+    from bitcoin.core.script import OP_RETURN, CScript, CScriptOp, CScriptInvalidError
+    from bitcoin.core.serialize import Hash160 as sha256ripemd160
+
+__all__ = ["AddressEncoder", "DEFAULT_ADDRESS_PREFIXES"]
+
+# (pubkey hash prefix, script hash prefix, bech32 hrp) used by bitcoind for each network
+DEFAULT_ADDRESS_PREFIXES = {
+    'mainnet': {'pubkey_hash': 0, 'script_hash': 5, 'bech32': 'bc'},
+    'testnet': {'pubkey_hash': 111, 'script_hash': 196, 'bech32': 'tb'},
+    'regtest': {'pubkey_hash': 111, 'script_hash': 196, 'bech32': 'bcrt'},
+}
+
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BECH32_CONST = 1
+BECH32M_CONST = 0x2bc830a3
+
+MAX_SCRIPT_SIZE = 10000
+SIGHASH_TYPES = {
+    0x01: 'ALL',
+    0x02: 'NONE',
+    0x03: 'SINGLE',
+    0x81: 'ALL|ANYONECANPAY',
+    0x82: 'NONE|ANYONECANPAY',
+    0x83: 'SINGLE|ANYONECANPAY',
+}
+
+ScriptInfo = Tuple[str, Optional[int], Optional[List[str]]]  # (type, reqSigs, addresses)
+
+
+def _as_prefix(prefix: Union[int, List[int], bytes]) -> bytes:
+    if isinstance(prefix, int):
+        return bytes([prefix])
+
+    return bytes(prefix)
+
+
+def _bech32_polymod(values: List[int]) -> int:
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if ((top >> i) & 1) else 0
+
+    return chk
+
+
+def _convert_bits(data: bytes, from_bits: int, to_bits: int) -> List[int]:
+    acc = 0
+    bits = 0
+    ret = []
+    max_value = (1 << to_bits) - 1
+    for value in data:
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            ret.append((acc >> bits) & max_value)
+
+    if bits:
+        ret.append((acc << (to_bits - bits)) & max_value)
+
+    return ret
+
+
+def bech32_encode(hrp: str, version: int, program: bytes) -> str:
+    """BIP 173 (version 0) / BIP 350 (version 1+) segwit address."""
+    data = [version] + _convert_bits(program, 8, 5)
+    const = BECH32_CONST if version == 0 else BECH32M_CONST
+    values = [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp] + data
+    polymod = _bech32_polymod(values + [0, 0, 0, 0, 0, 0]) ^ const
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + '1' + ''.join(BECH32_CHARSET[d] for d in data + checksum)
+
+
+class AddressEncoder:
+    """
+    Derive the scriptPubKey type and addresses the same way `getblock` verbosity 2 reports them.
+
+    The common templates are matched on the raw bytes; everything else is classified with
+    `AdvancedCScript`.
+    """
+
+    def __init__(self, pubkey_hash: Union[int, List[int]] = 0, script_hash: Union[int, List[int]] = 5,
+                 bech32: Optional[str] = 'bc'):
+        self.pubkey_hash_prefix = _as_prefix(pubkey_hash)
+        self.script_hash_prefix = _as_prefix(script_hash)
+        self.bech32_hrp = bech32
+
+    @classmethod
+    def for_network(cls, network: str, prefixes: dict = None) -> 'AddressEncoder':
+        return cls(**{**DEFAULT_ADDRESS_PREFIXES.get(network, DEFAULT_ADDRESS_PREFIXES['mainnet']), **(prefixes or {})})
+
+    @staticmethod
+    def _base58check(payload: bytes) -> str:
+        checksum = hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+        return b58encode(payload + checksum)
+
+    def pubkey_hash_address(self, pubkey_hash: bytes) -> str:
+        return self._base58check(self.pubkey_hash_prefix + pubkey_hash)
+
+    def script_hash_address(self, script_hash: bytes) -> str:
+        return self._base58check(self.script_hash_prefix + script_hash)
+
+    def witness_address(self, version: int, program: bytes) -> Optional[str]:
+        if self.bech32_hrp is None:
+            return None
+
+        return bech32_encode(self.bech32_hrp, version, program)
+
+    def classify(self, script: bytes) -> ScriptInfo:
+        size = len(script)
+
+        # fast paths
+        if size == 25 and script[:3] == b'\x76\xa9\x14' and script[23:] == b'\x88\xac':
+            return 'pubkeyhash', 1, [self.pubkey_hash_address(script[3:23])]
+        elif size == 23 and script[:2] == b'\xa9\x14' and script[22] == 0x87:
+            return 'scripthash', 1, [self.script_hash_address(script[2:22])]
+        elif size == 22 and script[:2] == b'\x00\x14':
+            return 'witness_v0_keyhash', 1, self._witness_addresses(0, script[2:])
+        elif size == 34 and script[:2] == b'\x00\x20':
+            return 'witness_v0_scripthash', 1, self._witness_addresses(0, script[2:])
+        elif size and script[0] == OP_RETURN:
+            return 'nulldata', None, None
+        elif 4 <= size <= 42 and 0x51 <= script[0] <= 0x60 and script[1] + 2 == size:
+            version = script[0] - 0x50
+            if version == 1 and size == 34:
+                return 'witness_v1_taproot', 1, self._witness_addresses(version, script[2:])
+
+            return 'witness_unknown', 1, self._witness_addresses(version, script[2:])
+
+        try:
+            cscript = AdvancedCScript(script)
+        except CScriptInvalidError:
+            return 'nonstandard', None, None
+
+        if cscript.is_public_key_out():
+            return 'pubkey', 1, [self.pubkey_hash_address(sha256ripemd160(cscript.get_public_key_out()))]
+        elif cscript.is_multisig_out():
+            required, *pubkeys, total, _ = cscript.chunks
+            # same as bitcoind's MatchMultisig, keys with an invalid size make the script nonstandard
+            if 1 <= required <= total == len(pubkeys) and all(_valid_pubkey_buf(pubkey) for pubkey in pubkeys):
+                return 'multisig', required, [self.pubkey_hash_address(sha256ripemd160(pubkey)) for pubkey in pubkeys]
+
+        return 'nonstandard', None, None
+
+    def _witness_addresses(self, version: int, program: bytes) -> Optional[List[str]]:
+        address = self.witness_address(version, program)
+        return [address] if address is not None else None
+
+
+def _script_num(data: bytes) -> int:
+    if not data:
+        return 0
+
+    value = int.from_bytes(data, 'little')
+    if data[-1] & 0x80:
+        return -(value & ~(0x80 << (8 * (len(data) - 1))))
+
+    return value
+
+
+def _is_der_signature(sig: bytes) -> bool:
+    # bitcoind's IsValidSignatureEncoding (BIP 66), the trailing sighash byte included
+    size = len(sig)
+    if size < 9 or size > 73 or sig[0] != 0x30 or sig[1] != size - 3:
+        return False
+
+    r_size = sig[3]
+    if 5 + r_size >= size:
+        return False
+
+    s_size = sig[5 + r_size]
+    if r_size + s_size + 7 != size:
+        return False
+
+    if sig[2] != 0x02 or r_size == 0 or sig[4] & 0x80 or (r_size > 1 and sig[4] == 0 and not sig[5] & 0x80):
+        return False
+
+    if sig[r_size + 4] != 0x02 or s_size == 0 or sig[r_size + 6] & 0x80:
+        return False
+
+    return not (s_size > 1 and sig[r_size + 6] == 0 and not sig[r_size + 7] & 0x80)
+
+
+def script_to_asm(script: bytes, attempt_sighash_decode: bool = False) -> str:
+    """
+    Same format as bitcoind's ScriptToAsmStr.
+
+    `attempt_sighash_decode` is used for scriptSigs: signatures get their sighash type
+    appended (ex. `3044...[ALL]`) instead of the trailing sighash byte.
+    """
+    parts = []
+
+    # OP_RETURN data may look like a signature
+    if script[:1] == b'\x6a' or len(script) > MAX_SCRIPT_SIZE:
+        attempt_sighash_decode = False
+
+    try:
+        for opcode, data, _ in CScript(script).raw_iter():
+            if data is not None and len(data) <= 4:
+                parts.append(str(_script_num(data)))
+            elif data is not None and attempt_sighash_decode and data[-1] in SIGHASH_TYPES and _is_der_signature(data):
+                parts.append(f'{data[:-1].hex()}[{SIGHASH_TYPES[data[-1]]}]')
+            elif data is not None:
+                parts.append(data.hex())
+            elif opcode == 0x4f:
+                parts.append('-1')
+            elif 0x51 <= opcode <= 0x60:
+                parts.append(str(opcode - 0x50))
+            else:
+                name = repr(CScriptOp(opcode))
+                parts.append(name if name.startswith('OP_') else 'OP_UNKNOWN')
+    except CScriptInvalidError:
+        parts.append('[error]')
+
+    return ' '.join(parts)
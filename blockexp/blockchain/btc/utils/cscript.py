@@ -15,7 +15,8 @@ __all__ = ["AdvancedCScript"]
 
 
 def _is_small_int_op(op: int) -> bool:
-    return op == OP_0 or (OP_1 <= op <= OP_16)
+    # CScript iteration yields small int ops as plain ints (0-16), other ops as CScriptOp
+    return type(op) is int and 0 <= op <= 16
 
 
 def _is_buffer(obj, size: int = None):
@@ -0,0 +1,195 @@
+import hashlib
+from struct import Struct
+from typing import Tuple, List, Optional
+
+from .address import AddressEncoder, script_to_asm
+
+__all__ = ["decode_block", "decode_transaction", "bits_to_difficulty"]
+
+_UINT32 = Struct('<I')
+_INT32 = Struct('<i')
+_INT64 = Struct('<q')
+_HEADER = Struct('<i32s32sIII')  # version, prev block, merkle root, time, bits, nonce
+
+NULL_HASH = bytes(32)
+COINBASE_INDEX = 0xffffffff
+
+
+def _sha256d(data) -> bytes:
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+
+def _hash_hex(data) -> str:
+    return bytes(data)[::-1].hex()
+
+
+def bits_to_difficulty(bits: int) -> float:
+    # same as bitcoind's GetDifficulty
+    shift = (bits >> 24) & 0xff
+    difficulty = 0x0000ffff / (bits & 0x00ffffff)
+
+    while shift < 29:
+        difficulty *= 256.0
+        shift += 1
+
+    while shift > 29:
+        difficulty /= 256.0
+        shift -= 1
+
+    return difficulty
+
+
+def _read_varint(view: memoryview, pos: int) -> Tuple[int, int]:
+    prefix = view[pos]
+    if prefix < 0xfd:
+        return prefix, pos + 1
+    elif prefix == 0xfd:
+        return int.from_bytes(view[pos + 1:pos + 3], 'little'), pos + 3
+    elif prefix == 0xfe:
+        return int.from_bytes(view[pos + 1:pos + 5], 'little'), pos + 5
+    else:
+        return int.from_bytes(view[pos + 1:pos + 9], 'little'), pos + 9
+
+
+def _decode_tx(view: memoryview, pos: int, encoder: AddressEncoder) -> Tuple[dict, int]:
+    start = pos
+    version, = _INT32.unpack_from(view, pos)
+    pos += 4
+
+    is_segwit = view[pos] == 0 and view[pos + 1] != 0
+    if is_segwit:
+        pos += 2  # marker, flag
+
+    body_start = pos
+
+    vin = []
+    count, pos = _read_varint(view, pos)
+    for _ in range(count):
+        prev_hash = view[pos:pos + 32]
+        prev_index, = _UINT32.unpack_from(view, pos + 32)
+        size, pos = _read_varint(view, pos + 36)
+        script = view[pos:pos + size]
+        pos += size
+        sequence, = _UINT32.unpack_from(view, pos)
+        pos += 4
+
+        if prev_index == COINBASE_INDEX and prev_hash == NULL_HASH:
+            vin.append({'coinbase': script.hex(), 'sequence': sequence})
+        else:
+            script_sig = bytes(script)
+            vin.append({
+                'txid': _hash_hex(prev_hash),
+                'vout': prev_index,
+                'scriptSig': {'asm': script_to_asm(script_sig, True), 'hex': script_sig.hex()},
+                'sequence': sequence,
+            })
+
+    vout = []
+    count, pos = _read_varint(view, pos)
+    for n in range(count):
+        value, = _INT64.unpack_from(view, pos)
+        size, pos = _read_varint(view, pos + 8)
+        script = bytes(view[pos:pos + size])
+        pos += size
+
+        script_type, req_sigs, addresses = encoder.classify(script)
+        script_pub_key = {'asm': script_to_asm(script), 'hex': script.hex(), 'type': script_type}
+        if req_sigs is not None:
+            script_pub_key['reqSigs'] = req_sigs
+        if addresses is not None:
+            script_pub_key['addresses'] = addresses
+
+        vout.append({'value': value / 1e8, 'n': n, 'scriptPubKey': script_pub_key})
+
+    body_end = pos
+
+    if is_segwit:
+        for item in vin:
+            count, pos = _read_varint(view, pos)
+            witness = []
+            for _ in range(count):
+                size, pos = _read_varint(view, pos)
+                witness.append(view[pos:pos + size].hex())
+                pos += size
+
+            if witness:
+                item['txinwitness'] = witness
+
+    locktime, = _UINT32.unpack_from(view, pos)
+    pos += 4
+
+    raw = view[start:pos]
+    size = pos - start
+    if is_segwit:
+        stripped = b''.join((view[start:start + 4], view[body_start:body_end], view[pos - 4:pos]))
+        txid = _hash_hex(_sha256d(stripped))
+        stripped_size = len(stripped)
+    else:
+        txid = _hash_hex(_sha256d(raw))
+        stripped_size = size
+
+    weight = stripped_size * 3 + size
+
+    return {
+        'txid': txid,
+        'hash': _hash_hex(_sha256d(raw)) if is_segwit else txid,
+        'version': version,
+        'size': size,
+        'vsize': (weight + 3) // 4,
+        'weight': weight,
+        'locktime': locktime,
+        'vin': vin,
+        'vout': vout,
+        'hex': raw.hex(),
+    }, pos
+
+
+def decode_transaction(data: bytes, encoder: AddressEncoder) -> dict:
+    """Decode a serialized transaction into the same shape as a `getblock <hash> 2` transaction."""
+    tx, _ = _decode_tx(memoryview(data), 0, encoder)
+    return tx
+
+
+def decode_block(data: bytes, height: int, encoder: AddressEncoder) -> dict:
+    """
+    Decode a serialized block (`getblock <hash> 0`) into the same shape as `getblock <hash> 2`.
+
+    Fields that are not part of the serialized block (confirmations, mediantime, chainwork,
+    nextblockhash) are left as None.
+    """
+    view = memoryview(data)
+    version, prev_hash, merkle_root, time, bits, nonce = _HEADER.unpack_from(view, 0)
+    block_hash = _hash_hex(_sha256d(view[:80]))
+
+    txs: List[dict] = []
+    count, pos = _read_varint(view, 80)
+    for _ in range(count):
+        tx, pos = _decode_tx(view, pos, encoder)
+        txs.append(tx)
+
+    size = len(data)
+    stripped_size = size - sum(tx['size'] for tx in txs) + sum((tx['weight'] - tx['size']) // 3 for tx in txs)
+
+    previous_block_hash: Optional[str] = _hash_hex(prev_hash) if prev_hash != NULL_HASH else None
+
+    return {
+        'hash': block_hash,
+        'confirmations': None,
+        'size': size,
+        'strippedsize': stripped_size,
+        'weight': stripped_size * 3 + size,
+        'height': height,
+        'version': version,
+        'versionHex': f'{version & 0xffffffff:08x}',
+        'merkleroot': _hash_hex(merkle_root),
+        'tx': txs,
+        'time': time,
+        'mediantime': None,
+        'nonce': nonce,
+        'bits': f'{bits:08x}',
+        'difficulty': bits_to_difficulty(bits),
+        'chainwork': None,
+        'nTx': count,
+        'previousblockhash': previous_block_hash,
+        'nextblockhash': None,
+    }
@@ -0,0 +1,60 @@
+import zlib
+from typing import Optional
+
+from bson import Binary
+
+__all__ = ["RAW_STORAGE_MODES", "compact_raw_tx_row", "load_raw_tx_bytes", "is_compact_raw_tx_row"]
+
+# verbose: the whole `getblock <hash> 2` transaction (default)
+# hex, zlib, zstd: only the serialized transaction (the verbose form is decoded when requested)
+RAW_STORAGE_MODES = ('verbose', 'hex', 'zlib', 'zstd')
+
+# kept on compact rows, the rest is decoded from the serialized transaction
+COMPACT_KEYS = ('txid', 'fee', '_blockhash', '_blockheight')
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception("You need install zstandard (raw_storage = 'zstd')")
+
+    return zstandard
+
+
+def compact_raw_tx_row(raw_tx_row: dict, mode: str) -> dict:
+    if mode not in RAW_STORAGE_MODES:
+        raise ValueError(f'invalid raw_storage: {mode!r}')
+    elif mode == 'verbose':
+        return raw_tx_row
+
+    row = {key: raw_tx_row.get(key) for key in COMPACT_KEYS}
+    row['_encoding'] = mode
+
+    if mode == 'hex':
+        row['hex'] = raw_tx_row['hex']
+    else:
+        data = bytes.fromhex(raw_tx_row['hex'])
+        if mode == 'zlib':
+            row['_data'] = Binary(zlib.compress(data))
+        else:
+            row['_data'] = Binary(_zstd().ZstdCompressor().compress(data))
+
+    return row
+
+
+def is_compact_raw_tx_row(raw_tx_row: dict) -> bool:
+    return '_encoding' in raw_tx_row
+
+
+def load_raw_tx_bytes(raw_tx_row: dict) -> Optional[bytes]:
+    encoding = raw_tx_row.get('_encoding')
+    if encoding is None or encoding == 'hex':
+        raw_tx_hex = raw_tx_row.get('hex')
+        return bytes.fromhex(raw_tx_hex) if raw_tx_hex is not None else None
+    elif encoding == 'zlib':
+        return zlib.decompress(raw_tx_row['_data'])
+    elif encoding == 'zstd':
+        return _zstd().ZstdDecompressor().decompress(raw_tx_row['_data'])
+
+    raise ValueError(f'invalid raw transaction encoding: {encoding!r}')
@@ -0,0 +1,56 @@
+from collections import OrderedDict
+from typing import Tuple, Optional
+
+__all__ = ["UtxoCache"]
+
+CoinKey = Tuple[str, int]
+CoinValue = Tuple[int, Optional[str]]  # value, address
+
+
+class UtxoCache:
+    """
+    Bounded in-memory cache of recently minted coin values and addresses, keyed by (mintTxid, mintIndex).
+
+    It works like bitcoind's dbcache: coins are removed once they are spent and the oldest
+    coins are evicted when the cache grows over `max_size` MiB.
+    """
+
+    ENTRY_SIZE = 440  # approximate bytes used by one cached coin (key tuple, txid str, value tuple, dict slot)
+
+    def __init__(self, max_size: float = 256):
+        self.max_entries = max(0, int(max_size * 1024 * 1024 / self.ENTRY_SIZE))
+        self.coins: 'OrderedDict[CoinKey, CoinValue]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.coins)
+
+    def __contains__(self, key: CoinKey):
+        return key in self.coins
+
+    def add(self, txid: str, index: int, value: int, address: Optional[str] = None):
+        if not self.max_entries:
+            return
+
+        self.coins[txid, index] = (value, address)
+
+        while len(self.coins) > self.max_entries:
+            self.coins.popitem(last=False)
+            self.evictions += 1
+
+    def spend(self, txid: str, index: int) -> Optional[CoinValue]:
+        coin = self.coins.pop((txid, index), None)
+        if coin is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return coin
+
+    def discard(self, txid: str, index: int):
+        self.coins.pop((txid, index), None)
+
+    def clear(self):
+        self.coins.clear()
@@ -0,0 +1,170 @@
+import hashlib
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional, Iterable, Any, Set
+
+from bson import ObjectId
+
+from ...database import MongoCollection
+
+__all__ = ["AddressFilter", "WalletAddressIndex"]
+
+
+class AddressFilter:
+    """Bloom filter over addresses: no false negatives, about `error_rate` false positives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(1, capacity)
+        self.size = max(64, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, address: str) -> List[int]:
+        digest = hashlib.blake2b(address.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, address: str):
+        for position in self._positions(address):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, address: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(address))
+
+
+class WalletAddressIndex:
+    """
+    In-memory copy of the watched addresses (`walletaddresses`), so tagging the coins of a block with
+    their wallets needs no query in the common case.
+
+    Up to `max_size` MiB the addresses are kept in an exact dict (address to wallet ids). Past that,
+    only a bloom filter is kept and the positive matches are looked up in the database. New addresses
+    are polled every `refresh_interval` seconds.
+    """
+
+    ENTRY_SIZE = 240  # approximate bytes used by one address (str, dict slot, list of one ObjectId)
+    REFRESH_OVERLAP = timedelta(seconds=60)  # ObjectIds of concurrent writers are not strictly ordered
+
+    def __init__(self, max_size: float = 64, refresh_interval: float = 10):
+        self.max_entries = max(0, int(max_size * 1024 * 1024 / self.ENTRY_SIZE))
+        self.refresh_interval = refresh_interval
+        self.wallets: Optional[Dict[str, List[Any]]] = {}  # None once over max_entries
+        self.filter: Optional[AddressFilter] = None
+        self.count = 0
+        self.last_id: Optional[ObjectId] = None
+        self.recent_ids: Set[ObjectId] = set()  # ids inside the overlap window, already added
+        self.last_refresh: Optional[float] = None
+        self.synced_height = -1  # committed height at the last refresh
+        self.hits = 0
+        self.queries = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def loaded(self) -> bool:
+        return self.last_refresh is not None
+
+    def clear(self):
+        self.wallets = {}
+        self.filter = None
+        self.count = 0
+        self.last_id = None
+        self.recent_ids.clear()
+        self.last_refresh = None
+
+    def _add(self, address: str, wallet) -> bool:
+        if self.wallets is not None:
+            wallets = self.wallets.setdefault(address, [])
+            if wallet in wallets:
+                return False
+
+            wallets.append(wallet)
+            self.count += 1
+
+            if self.count > self.max_entries:
+                self.filter = AddressFilter(self.count * 2)
+                for known_address in self.wallets:
+                    self.filter.add(known_address)
+
+                self.wallets = None
+
+            return True
+
+        self.filter.add(address)
+        self.count += 1
+        return True
+
+    async def refresh(self, collection: MongoCollection, height: int, *, force: bool = False) -> Dict[str, List[Any]]:
+        """
+        Poll addresses added since the last refresh.
+
+        Return them (address to wallet ids), except on the first load, where every address is new.
+        """
+        now = time.monotonic()
+        if not force and self.loaded and now - self.last_refresh < self.refresh_interval:
+            return {}
+
+        first_load = not self.loaded
+        query = {}
+        if self.last_id is not None:
+            query['_id'] = {'$gte': ObjectId.from_datetime(self.last_id.generation_time - self.REFRESH_OVERLAP)}
+
+        added = defaultdict(list)
+        row_ids = []
+        async for row in collection.find(query, projection={'address': True, 'wallet': True}):
+            row_id = row['_id']
+            if row_id in self.recent_ids:
+                continue
+
+            address = row['address']
+            wallet = row['wallet']
+            if self._add(address, wallet):
+                added[address].append(wallet)
+
+            if isinstance(row_id, ObjectId):
+                row_ids.append(row_id)
+                if self.last_id is None or row_id > self.last_id:
+                    self.last_id = row_id
+
+        if self.last_id is not None:
+            window_start = ObjectId.from_datetime(self.last_id.generation_time - self.REFRESH_OVERLAP)
+            self.recent_ids = {row_id for row_id in self.recent_ids | set(row_ids) if row_id >= window_start}
+
+        if self.filter is not None and self.count > self.filter.capacity:
+            # the filter is saturated, rebuild a larger one
+            address_filter = AddressFilter(self.count * 2)
+            self.count = 0
+            async for row in collection.find({}, projection={'address': True}):
+                address_filter.add(row['address'])
+                self.count += 1
+
+            self.filter = address_filter
+
+        self.last_refresh = now
+        self.synced_height = height
+        return {} if first_load else dict(added)
+
+    async def match(self, collection: MongoCollection, addresses: Iterable[str]) -> Dict[str, List[Any]]:
+        """Wallet ids of the watched addresses among `addresses`."""
+        if self.wallets is not None:
+            wallets = self.wallets
+            found = {address: wallets[address] for address in addresses if address in wallets}
+            self.hits += len(found)
+            return found
+
+        candidates = [address for address in addresses if address in self.filter]
+        if not candidates:
+            return {}
+
+        self.queries += 1
+        found = defaultdict(list)
+        async for row in collection.find({'address': {'$in': candidates}}, projection={'address': True, 'wallet': True}):
+            found[row['address']].append(row['wallet'])
+
+        self.hits += len(found)
+        return found
@@ -1,4 +1,7 @@
+import asyncio
+
 from .accessor import EthDaemonAccessor
+from .balance import BalanceCache
 from .importer import EthDaemonImporter
 from .mongo import EthMongoDatabase
 from .provider import EthMongoProvider
@@ -13,23 +16,49 @@ class EthBlockchain(Blockchain):
         self.app = app
         self.url = url
         self.config = config
+        self.balance_cache = BalanceCache(config.get('balance_cache_ttl', 30), config.get('balance_cache_size', 100000))
 
     def get_db(self, database: MongoDatabase) -> EthMongoDatabase:
         return EthMongoDatabase(self.chain, self.network, database)
 
     async def ready(self):
+        await asyncio.gather(self.ping(), self.create_indexes())
+
+    async def ping(self):
         async with self.get_accessor() as daemon:
             await daemon.get_local_tip()
 
+    async def create_indexes(self):
         async with connect_database_for(self.app) as database:
             db = self.get_db(database)
             await db.create_indexes()
 
+    def get_rpc_options(self) -> dict:
+        return dict(
+            max_connections=self.config.get('rpc_max_connections', 100),
+            keepalive_connections=self.config.get('rpc_keepalive_connections', 10),
+            timeout=self.config.get('rpc_timeout'),
+            retries=self.config.get('rpc_retries', 4),
+            json_codec=self.config.get('rpc_json_codec', 'auto'),
+        )
+
     def get_accessor(self) -> EthDaemonAccessor:
-        return EthDaemonAccessor(self.chain, self.network, self.url)
+        return EthDaemonAccessor(self.chain, self.network, self.url, **self.get_rpc_options())
 
     def get_importer(self) -> EthDaemonImporter:
-        return EthDaemonImporter(self.chain, self.network, self.get_accessor(), self.app)
+        return EthDaemonImporter(
+            self.chain,
+            self.network,
+            self.get_accessor(),
+            self.app,
+            header_cache=self.config.get('header_cache', 256),
+            decode_workers=self.config.get('decode_workers', 0),
+            import_workers=self.config.get('import_workers', 4),
+            fetch_batch=self.config.get('fetch_batch', 16),
+            start_height=self.config.get('start_height'),
+            receipts=self.config.get('receipts', False),
+        )
 
     def get_provider(self, database: MongoDatabase) -> EthMongoProvider:
-        return EthMongoProvider(self.chain, self.network, self.get_db(database), self.get_accessor())
+        return EthMongoProvider(self.chain, self.network, self.get_db(database), self.get_accessor(),
+                                balance_cache=self.balance_cache)
@@ -1,4 +1,4 @@
-from typing import Any, Union, Optional
+from typing import Any, Union, Optional, List, Tuple
 
 from hexbytes import HexBytes
 
@@ -6,6 +6,9 @@ from .types import EthBlock, EthTransaction
 from .web3 import AsyncWeb3
 from ...model import Block, Transaction, EstimateFee
 from ...types import Accessor
+from ...utils.jsonrpc import JsonRpcRequest, JSONRPCError
+
+METHOD_NOT_FOUND = -32601
 
 
 def as_hex(s: Optional[HexBytes]) -> Optional[str]:
@@ -13,10 +16,11 @@ def as_hex(s: Optional[HexBytes]) -> Optional[str]:
 
 
 class EthDaemonAccessor(Accessor):
-    def __init__(self, chain: str, network: str, url: str):
+    def __init__(self, chain: str, network: str, url: str, **rpc_options):
         super().__init__(chain, network)
-        self.rpc = AsyncWeb3(url)
+        self.rpc = AsyncWeb3(url, **rpc_options)
         self.is_legacy_getblock = None
+        self.has_block_receipts = None  # eth_getBlockReceipts support, detected on first use
 
     async def connect(self):
         await self.rpc.connect()
@@ -88,22 +92,85 @@ class EthDaemonAccessor(Accessor):
         return self._cast_transaction(raw_transaction, raw_block)
 
     async def _get_block(self, block_id: Union[str, int], *, with_transactions: bool) -> EthBlock:
+        raw_block = await self._get_block_data(block_id, with_transactions=with_transactions)
+        return self._convert_raw_block(raw_block)
+
+    async def _get_block_data(self, block_id: Union[str, int], *, with_transactions: bool) -> dict:
         if isinstance(block_id, str):
-            raw_block = await self.rpc.eth_getBlockByHash(block_id, with_transactions)
+            return await self.rpc.eth_getBlockByHash(block_id, with_transactions)
         elif isinstance(block_id, int):
-            raw_block = await self.rpc.eth_getBlockByNumber(block_id, with_transactions)
+            return await self.rpc.eth_getBlockByNumber(block_id, with_transactions)
         else:
             raise TypeError
 
+    def load_block_data(self, raw_block: dict) -> EthBlock:
         return self._convert_raw_block(raw_block)
 
     async def get_block(self, block_id: Union[str, int]) -> Block:
         raw_block = await self.get_raw_block(block_id)
         return self._cast_block(raw_block)
 
+    async def get_block_hashes(self, block_heights: List[int]) -> List[Optional[str]]:
+        raw_blocks = await self.rpc.batch([
+            JsonRpcRequest('eth_getBlockByNumber', [hex(block_height), False])
+            for block_height in block_heights
+        ])
+
+        return [raw_block['hash'] if raw_block is not None else None for raw_block in raw_blocks]
+
     async def get_raw_block(self, block_id: Union[str, int]) -> EthBlock:
         return await self._get_block(block_id, with_transactions=True)
 
+    async def get_raw_block_data(self, block_id: Union[str, int]) -> dict:
+        """Same as `get_raw_block`, but not converted yet (see `load_block_data`)."""
+        return await self._get_block_data(block_id, with_transactions=True)
+
+    async def get_raw_blocks_data(self, block_heights: List[int]) -> List[Optional[dict]]:
+        """`get_raw_block_data` of several heights, as one batch request."""
+        return await self.rpc.batch([
+            JsonRpcRequest('eth_getBlockByNumber', [hex(block_height), True])
+            for block_height in block_heights
+        ])
+
+    async def get_blocks_receipts(self, blocks: List[Tuple[int, List[str]]]) -> List[List[dict]]:
+        """
+        Receipts of the transactions of each (height, transaction hashes), as one batch request.
+
+        `eth_getBlockReceipts` (one call per block) is used when the node has it, otherwise one
+        `eth_getTransactionReceipt` per transaction.
+        """
+        if self.has_block_receipts is not False:
+            results = await self.rpc.batch([
+                JsonRpcRequest('eth_getBlockReceipts', [hex(height)])
+                for height, _ in blocks
+            ], return_exceptions=True)
+
+            if self.has_block_receipts is None:
+                self.has_block_receipts = not any(
+                    isinstance(result, JSONRPCError) and result.code == METHOD_NOT_FOUND for result in results
+                )
+
+            if self.has_block_receipts:
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
+
+                return results
+
+        receipts = await self.rpc.batch([
+            JsonRpcRequest('eth_getTransactionReceipt', [tx_hash])
+            for _, tx_hashes in blocks
+            for tx_hash in tx_hashes
+        ])
+
+        blocks_receipts = []
+        offset = 0
+        for _, tx_hashes in blocks:
+            blocks_receipts.append(receipts[offset:offset + len(tx_hashes)])
+            offset += len(tx_hashes)
+
+        return blocks_receipts
+
     async def get_transaction(self, tx_id: str) -> Transaction:
         raw_transaction = await self.rpc.eth_getTransactionByHash(tx_id)
         assert isinstance(raw_transaction, dict)
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple, Callable, Awaitable
+
+__all__ = ["BalanceCache"]
+
+BalanceKey = Tuple[str, int, str]  # address, tip height, tip hash
+
+
+class BalanceCache:
+    """
+    Balances at the stored tip (`eth_getBalance` at its height), keyed by (address, tip height, tip hash),
+    shared by the requests of a process.
+
+    Concurrent lookups of the same key wait for a single `eth_getBalance` call. Entries are dropped
+    when the tip moves, after `ttl` seconds, or when more than `max_size` addresses are cached (least
+    recently used first).
+    """
+
+    def __init__(self, ttl: float = 30, max_size: int = 100000):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._balances: 'OrderedDict[str, Tuple[BalanceKey, int, float]]' = OrderedDict()
+        self._pending: Dict[BalanceKey, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._balances.clear()
+
+    async def get(self, key: BalanceKey, fetch: Callable[[], Awaitable[int]]) -> int:
+        address = key[0]
+        item = self._balances.get(address)
+        if item is not None:
+            cached_key, balance, updated_at = item
+            if cached_key == key and time.monotonic() - updated_at <= self.ttl:
+                self._balances.move_to_end(address)
+                self.hits += 1
+                return balance
+
+        future = self._pending.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = self._pending[key] = asyncio.get_event_loop().create_future()
+        try:
+            balance = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved, waiters (if any) get it too
+            raise
+        else:
+            future.set_result(balance)
+            self._set(address, key, balance)
+            return balance
+        finally:
+            del self._pending[key]
+
+    def _set(self, address: str, key: BalanceKey, balance: int):
+        self._balances[address] = key, balance, time.monotonic()
+        self._balances.move_to_end(address)
+
+        while len(self._balances) > self.max_size:
+            self._balances.popitem(last=False)
@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .accessor import EthDaemonAccessor
+from .types import EthBlock, EthTransaction, as_int
+from ..utils.decoder import AccessorSpec, get_worker_accessor
+from ...model import Block
+from ...utils import asrow
+
+__all__ = ["EthBlockRows", "build_block_rows", "decode_block_rows", "get_token_transfer_rows"]
+
+# keccak256('Transfer(address,address,uint256)'), ERC-20 (3 topics) and ERC-721 (4 topics, indexed token id)
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+
+RECEIPT_KEYS = ('status', 'gasUsed', 'cumulativeGasUsed', 'effectiveGasPrice', 'contractAddress')
+
+
+@dataclass
+class EthBlockRows:
+    """Rows of one block, ready to be written (plain data, cheap to pickle from a decoding process)."""
+    height: int
+    hash: str
+    previous_hash: str
+    raw_block_row: dict
+    block_row: dict
+    raw_tx_rows: List[dict]
+    tx_rows: List[dict]
+    token_transfer_rows: List[dict] = field(default_factory=list)
+
+
+def topic_address(topic: str) -> str:
+    return '0x' + topic[-40:]
+
+
+def get_token_transfer_rows(receipt: dict, tx_row: dict) -> List[dict]:
+    rows = []
+    for log in receipt.get('logs') or []:
+        topics = log.get('topics') or []
+        if log.get('removed') or len(topics) not in (3, 4) or topics[0] != TRANSFER_TOPIC:
+            continue
+
+        from_address = topic_address(topics[1])
+        to_address = topic_address(topics[2])
+        row = {
+            'txid': tx_row['txid'],
+            'logIndex': int(log['logIndex'], 16),
+            'blockHeight': tx_row['blockHeight'],
+            'blockHash': tx_row['blockHash'],
+            'blockTime': tx_row['blockTime'],
+            'token': log['address'].lower(),
+            'fromAddress': from_address,
+            'toAddress': to_address,
+            'addresses': [from_address] if from_address == to_address else [from_address, to_address],
+            'value': None,
+            'tokenId': None,
+        }
+
+        if len(topics) == 4:
+            row['tokenId'] = str(int(topics[3], 16))
+        else:
+            data = log.get('data') or '0x'
+            row['value'] = str(int(data, 16)) if len(data) > 2 else '0'
+
+        rows.append(row)
+
+    return rows
+
+
+def build_block_rows(accessor: EthDaemonAccessor, raw_block: EthBlock,
+                     receipts: Optional[List[dict]] = None) -> EthBlockRows:
+    block: Block = accessor.convert_raw_block(raw_block)
+    assert isinstance(block.nonce, int)
+    block_row = asrow(block)
+    block_row['nonce'] = repr(block_row['nonce'])
+
+    receipt_map = {receipt['transactionHash']: receipt for receipt in receipts or [] if receipt is not None}
+
+    raw_tx_rows = []
+    tx_rows = []
+    token_transfer_rows = []
+    for raw_tx in raw_block.transactions:  # type: EthTransaction
+        # noinspection PyProtectedMember
+        raw_tx_row = raw_tx._raw
+        raw_tx_rows.append(raw_tx_row)
+
+        tx = accessor.convert_raw_transaction(raw_tx, raw_block)
+        assert isinstance(tx.value, int)
+        tx_row = asrow(tx)
+        tx_row['value'] = repr(tx_row['value'])
+        tx_rows.append(tx_row)
+
+        receipt = receipt_map.get(raw_tx_row['hash'])
+        if receipt is not None:
+            raw_tx_row['receipt'] = {key: receipt[key] for key in RECEIPT_KEYS if key in receipt}
+            gas_price = as_int(receipt.get('effectiveGasPrice') or raw_tx_row['gasPrice'])
+            tx_row['fee'] = repr(as_int(receipt['gasUsed']) * gas_price)
+            token_transfer_rows += get_token_transfer_rows(receipt, tx_row)
+
+    # noinspection PyProtectedMember
+    return EthBlockRows(
+        height=block.height,
+        hash=block.hash,
+        previous_hash=block.previousBlockHash,
+        raw_block_row=raw_block._raw,
+        block_row=block_row,
+        raw_tx_rows=raw_tx_rows,
+        tx_rows=tx_rows,
+        token_transfer_rows=token_transfer_rows,
+    )
+
+
+def decode_block_rows(spec: AccessorSpec, payload: dict, receipts: Optional[List[dict]] = None) -> EthBlockRows:
+    """Decoding stage entry point: `eth_getBlockByNumber` data (with transactions) to block rows."""
+    accessor: EthDaemonAccessor = get_worker_accessor(spec)
+    return build_block_rows(accessor, accessor.load_block_data(payload), receipts)
@@ -1,42 +1,57 @@
 import asyncio
 import traceback
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Optional, List, Dict, Tuple
 
 from pymongo import UpdateOne, DESCENDING
 
 from .accessor import EthDaemonAccessor
+from .decoder import EthBlockRows, decode_block_rows
 from .mongo import EthMongoDatabase
-from .types import EthBlock, EthTransaction
+from ..utils.batch import BulkWriteBatch
+from ..utils.decoder import DecoderPool
+from ..utils.headers import HeaderChain
+from ..utils.sync import SyncPhase, SyncState
+from ..utils.tip import TIP_CACHE
 from ...application import Application
-from ...database import bulk_write_for, connect_database_for
+from ...database import connect_database_for, bulk_write_for
 from ...model import Block
 from ...types import Importer
-from ...utils import asrow
-from ...utils.jsonrpc import JSONRPCError
 
 
 class EthDaemonImporter(Importer):
     db: EthMongoDatabase
 
-    def __init__(self, chain: str, network: str, accessor: EthDaemonAccessor, app: Application):
+    def __init__(self, chain: str, network: str, accessor: EthDaemonAccessor, app: Application, *,
+                 header_cache: int = 256, decode_workers: int = 0, import_workers: int = 4, fetch_batch: int = 16,
+                 start_height: Optional[int] = None, receipts: bool = False):
         super().__init__(chain, network)
         self.accessor = accessor
         self.app = app
+        self.import_workers = max(1, import_workers)
+        self.fetch_batch = max(1, fetch_batch)
+        self.start_height = start_height
+        self.receipts = receipts
+        self.headers = HeaderChain(header_cache)
+        self.decoder = DecoderPool(decode_workers)
+        self.sync_state = SyncState()
 
     async def run(self):
-        while True:
-            try:
-                await self.worker()
-            except Exception:
-                traceback.print_exc()
-                raise
-            else:
-                break
+        with self.decoder:
+            while True:
+                try:
+                    await self.worker()
+                except Exception:
+                    traceback.print_exc()
+                    raise
+                else:
+                    break
 
     async def worker(self):
         async with connect_database_for(self.app) as database:
             self.db = EthMongoDatabase(self.chain, self.network, database)
+            await self.recover_sync_state()
+            await self.headers.load(self.db.block_collection)
 
             await self.task_full_sync()
 
@@ -44,14 +59,43 @@ class EthDaemonImporter(Importer):
                 await self.task_progress_sync()
                 await asyncio.sleep(5)
 
+    async def recover_sync_state(self):
+        state = await self.db.fetch_sync_state()
+        if state is None:
+            # written before the checkpoint existed: trust the stored tip, but drop anything above it
+            db_tip = await self.get_db_tip()
+            state = SyncState.commit(db_tip.height, db_tip.hash) if db_tip is not None else SyncState()
+            state.phase = SyncPhase.importing
+
+        self.sync_state = state
+        if not state.is_committed:
+            print(self.chain, self.network, 'recover', state.phase.value, 'after', state.height)
+            await self.undo_block(state.height + 1)
+
+    async def set_sync_state(self, state: SyncState):
+        await self.db.store_sync_state(state)
+        self.sync_state = state
+
     async def task_full_sync(self):
-        db_tip = await self.get_db_tip()
-        if db_tip is not None:
+        # not the checkpoint height: an interrupted first chunk commits `start_height - 1` over no block
+        if await self.get_db_tip() is not None:
             return
 
-        base_dt = datetime.utcnow() - timedelta(days=1)
-
         local_tip = await self.get_local_tip()
+        start_height = await self.get_start_height(local_tip)
+        print(self.chain, self.network, 'full sync from', start_height)
+
+        await self.import_blocks(range(start_height, local_tip.height + 1))
+
+    async def get_start_height(self, local_tip: Block) -> int:
+        if self.start_height is not None:
+            if self.start_height < 0:  # relative to the tip
+                return max(0, local_tip.height + 1 + self.start_height)
+
+            return min(self.start_height, local_tip.height)
+
+        # about one day ago
+        base_dt = datetime.utcnow() - timedelta(days=1)
         height = local_tip.height
 
         for height in range(local_tip.height, 0, -1000):
@@ -60,17 +104,36 @@ class EthDaemonImporter(Importer):
             if block.time < base_dt:
                 break
 
-        for height in range(height, local_tip.height):
-            await self.import_block(height)
+        return max(0, height)
 
     async def task_progress_sync(self):
         db_tip: Optional[Block] = await self.get_db_tip()
         assert db_tip is not None, 'full sync missing'
 
+        if self.headers.tip_height != db_tip.height or self.headers.tip_hash != db_tip.hash:
+            await self.headers.load(self.db.block_collection)
+
         local_tip = await self.get_local_tip()
+        fork_height = await self.headers.find_fork_height(self.accessor.get_block_hashes, local_tip.height)
+        if fork_height is None:
+            # the fork is older than the blocks kept in memory
+            fork_height = await self.find_db_fork_height(self.headers.start_height - 1)
 
-        for height in range(db_tip.height + 1, local_tip.height + 1):
-            await self.import_block(height)
+        if fork_height < db_tip.height:
+            await self.undo_block(fork_height + 1)
+
+        await self.import_blocks(range(min(fork_height, db_tip.height) + 1, local_tip.height + 1))
+
+    async def find_db_fork_height(self, height: int) -> int:
+        while height >= 0:
+            local_block_hash, = await self.accessor.get_block_hashes([height])
+            db_block = await self.get_db_block(height)
+            if db_block is not None and local_block_hash == db_block.hash:
+                break
+
+            height -= 1
+
+        return height
 
     async def get_db_block(self, block_height: int) -> Optional[Block]:
         block: Optional[dict] = await self.db.block_collection.find_one({'height': block_height})
@@ -87,16 +150,19 @@ class EthDaemonImporter(Importer):
         return Block(**block, chain=self.chain, network=self.network)
 
     async def get_local_block(self, block_height: int) -> Optional[Block]:
-        try:
-            return await self.accessor.get_block(block_height)
-        except JSONRPCError as e:
-            raise
+        return await self.accessor.get_block(block_height)
 
     async def get_local_tip(self) -> Block:
         return await self.accessor.get_local_tip()
 
     async def undo_block(self, height: int):
         print(self.chain, self.network, 'undo block', height)
+        prev_block = await self.get_db_block(height - 1)
+        prev_hash = prev_block.hash if prev_block is not None else None
+        await self.set_sync_state(SyncState(height - 1, prev_hash, SyncPhase.undoing, height))
+
+        self.headers.truncate(height)
+        TIP_CACHE.invalidate(self.chain, self.network)
 
         await self.db.block_collection.delete_many(
             {'height': {'$gte': height}}
@@ -114,58 +180,198 @@ class EthDaemonImporter(Importer):
             {'blockNumber': {'$gte': height}}
         )
 
-    async def import_block(self, height: int):
-        print(self.chain, self.network, 'processing', height, 'block')
-        raw_block: EthBlock = await self.accessor.get_raw_block(height)
+        await self.db.token_transfer_collection.delete_many(
+            {'blockHeight': {'$gte': height}}
+        )
 
-        await self.write_txs(raw_block, raw_block.transactions)
-        await self.write_block(raw_block)
+        await self.set_sync_state(SyncState.commit(height - 1, prev_hash))
 
-    async def write_block(self, raw_block: EthBlock):
-        block: Block = self.accessor.convert_raw_block(raw_block)
+    async def import_blocks(self, heights: range):
+        """
+        Import `heights` with `import_workers` concurrent workers.
 
-        # noinspection PyProtectedMember
-        await self.db.raw_block_collection.update_one(
-            filter={'hash': block.hash},
-            update={'$set': raw_block._raw},
-            upsert=True,
-        )
+        Each worker takes the next `fetch_batch` heights, fetches them with one batched
+        `eth_getBlockByNumber` call and writes them with one bulk write per collection, in whatever
+        order the chunks complete. The sync state height is the watermark: every block up to it is
+        written and linked to its parent, anything above it is undone after a crash. The blocks
+        collection (the tip) is only written up to the watermark, once the parents are checked.
+        """
+        if not heights:
+            return
+
+        chunks = [heights[offset:offset + self.fetch_batch] for offset in range(0, len(heights), self.fetch_batch)]
+        max_ahead = self.import_workers * 4  # chunks written past the watermark
+        next_chunk = 0
+        committed_chunks = 0
+        done: Dict[int, List[Tuple[str, dict]]] = {}  # chunk index to (previous hash, block row)
+        progress = asyncio.Condition()
+        forked = False
+
+        watermark = heights[0] - 1
+        watermark_hash = await self.get_block_hash(watermark)
+        await self.set_sync_state(SyncState(watermark, watermark_hash, SyncPhase.importing, heights[-1]))
 
-        async with bulk_write_for(self.db.block_collection, ordered=False) as db_ops:
-            assert isinstance(block.nonce, int)
-            row = asrow(block)
-            row['nonce'] = repr(row['nonce'])
+        async def advance():
+            nonlocal committed_chunks, watermark, watermark_hash, forked
 
-            db_ops.append(UpdateOne(
-                filter={'hash': block.hash},
-                update={'$set': row},
+            while committed_chunks in done:
+                headers = done[committed_chunks]
+                expected_hash = watermark_hash
+                for previous_hash, block_row in headers:
+                    if expected_hash is not None and previous_hash != expected_hash:
+                        print(self.chain, self.network, 'parent mismatch at', block_row['height'])
+                        forked = True
+                        return
+
+                    expected_hash = block_row['hash']
+
+                block_rows = [block_row for _, block_row in headers]
+                await self.write_block_rows(watermark_hash, block_rows)
+
+                for block_row in block_rows:
+                    self.headers.append(block_row['height'], block_row['hash'])
+
+                del done[committed_chunks]
+                committed_chunks += 1
+                watermark, watermark_hash = block_rows[-1]['height'], block_rows[-1]['hash']
+                TIP_CACHE.set(self.chain, self.network, self.db.convert_raw_block(block_rows[-1]))
+                await self.set_sync_state(SyncState(watermark, watermark_hash, SyncPhase.importing, heights[-1]))
+
+        async def worker():
+            nonlocal next_chunk
+
+            while True:
+                async with progress:
+                    await progress.wait_for(lambda: (forked or next_chunk >= len(chunks) or
+                                                     next_chunk < committed_chunks + max_ahead))
+                    if forked or next_chunk >= len(chunks):
+                        return
+
+                    index = next_chunk
+                    next_chunk += 1
+
+                chunk = chunks[index]
+                print(self.chain, self.network, 'processing', chunk[0], '-', chunk[-1], 'blocks')
+                rows_list = await self.fetch_blocks(chunk)
+                await self.write_blocks(rows_list)
+
+                async with progress:
+                    done[index] = [(rows.previous_hash, rows.block_row) for rows in rows_list]
+                    await advance()
+                    progress.notify_all()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.import_workers, len(chunks)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for future in workers:
+                future.cancel()
+
+            await asyncio.wait(workers)
+
+        if forked:
+            await self.undo_fork(watermark)
+        else:
+            await self.set_sync_state(SyncState.commit(watermark, watermark_hash))
+
+    async def get_block_hash(self, height: int) -> Optional[str]:
+        """Hash of an imported block, from the recent headers when possible."""
+        block_hash = self.headers.get(height)
+        if block_hash is None and height >= 0:
+            block = await self.get_db_block(height)
+            block_hash = block.hash if block is not None else None
+
+        return block_hash
+
+    async def undo_fork(self, height: int):
+        """Undo back to the fork point, found at or below `height` (the last block with a valid child)."""
+        local_tip = await self.get_local_tip()
+        fork_height = await self.headers.find_fork_height(self.accessor.get_block_hashes, local_tip.height)
+        if fork_height is None:
+            # the fork is older than the blocks kept in memory
+            fork_height = await self.find_db_fork_height(self.headers.start_height - 1)
+
+        # blocks written past `height` are not validated yet, they go too
+        await self.undo_block(min(fork_height, height) + 1)
+
+    async def fetch_blocks(self, heights: range) -> List[EthBlockRows]:
+        payloads = await self.accessor.get_raw_blocks_data(list(heights))
+        for height, payload in zip(heights, payloads):
+            assert payload is not None, f'block {height} not found'
+
+        if self.receipts:
+            # fees and token transfers
+            blocks_receipts = await self.accessor.get_blocks_receipts([
+                (height, [raw_tx['hash'] for raw_tx in payload['transactions']])
+                for height, payload in zip(heights, payloads)
+            ])
+        else:
+            blocks_receipts = [None] * len(payloads)
+
+        accessor_spec = (type(self.accessor), self.chain, self.network, self.accessor.rpc.url)
+        return await asyncio.gather(*(
+            self.decoder.run(decode_block_rows, accessor_spec, payload, receipts)
+            for payload, receipts in zip(payloads, blocks_receipts)
+        ))
+
+    async def write_blocks(self, rows_list: List[EthBlockRows]):
+        # everything but the blocks, see `write_block_rows`
+        batch = BulkWriteBatch([
+            self.db.raw_tx_collection,
+            self.db.tx_collection,
+            self.db.token_transfer_collection,
+            self.db.raw_block_collection,
+        ])
+
+        for rows in rows_list:
+            self.write_txs(batch, rows)
+
+        for rows in rows_list:
+            batch.add(self.db.raw_block_collection, UpdateOne(
+                filter={'hash': rows.hash},
+                update={'$set': rows.raw_block_row},
                 upsert=True,
             ))
 
-            db_ops.append(UpdateOne(
-                filter={'hash': block.previousBlockHash},
-                update={'$set': {'nextBlockHash': block.hash}},
-            ))
+        await batch.flush()
 
-    async def write_txs(self, raw_block: EthBlock, txs: List[EthTransaction]):
-        async with bulk_write_for(self.db.raw_tx_collection, ordered=False) as db_ops:
-            for raw_tx in txs:
-                # noinspection PyProtectedMember
+    async def write_block_rows(self, previous_hash: Optional[str], block_rows: List[dict]):
+        """Write the blocks of a chunk once it is linked to the watermark, so readers never see a block above it."""
+        async with bulk_write_for(self.db.block_collection, ordered=True) as db_ops:
+            if previous_hash is not None:
                 db_ops.append(UpdateOne(
-                    filter={'hash': raw_tx.hash},
-                    update={'$set': raw_tx._raw},
-                    upsert=True,
+                    filter={'hash': previous_hash},
+                    update={'$set': {'nextBlockHash': block_rows[0]['hash']}},
                 ))
 
-        async with bulk_write_for(self.db.tx_collection, ordered=False) as db_ops:
-            for raw_tx in txs:
-                tx = self.accessor.convert_raw_transaction(raw_tx, raw_block)
-                assert isinstance(tx.value, int)
-                row = asrow(tx)
-                row['value'] = repr(row['value'])
+            for block_row, next_row in zip(block_rows, block_rows[1:] + [None]):
+                if next_row is not None:
+                    block_row['nextBlockHash'] = next_row['hash']
 
                 db_ops.append(UpdateOne(
-                    filter={'txid': tx.txid},
-                    update={'$set': row},
+                    filter={'hash': block_row['hash']},
+                    update={'$set': block_row},
                     upsert=True,
                 ))
+
+    def write_txs(self, batch: BulkWriteBatch, rows: EthBlockRows):
+        for raw_tx_row in rows.raw_tx_rows:
+            batch.add(self.db.raw_tx_collection, UpdateOne(
+                filter={'hash': raw_tx_row['hash']},
+                update={'$set': raw_tx_row},
+                upsert=True,
+            ))
+
+        for tx_row in rows.tx_rows:
+            batch.add(self.db.tx_collection, UpdateOne(
+                filter={'txid': tx_row['txid']},
+                update={'$set': tx_row},
+                upsert=True,
+            ))
+
+        for transfer_row in rows.token_transfer_rows:
+            batch.add(self.db.token_transfer_collection, UpdateOne(
+                filter={'txid': transfer_row['txid'], 'logIndex': transfer_row['logIndex']},
+                update={'$set': transfer_row},
+                upsert=True,
+            ))
@@ -4,20 +4,24 @@ from typing import List, Optional, Union
 from pymongo import DESCENDING
 
 from .accessor import EthDaemonAccessor
+from .balance import BalanceCache
 from .mongo import EthMongoDatabase
 from .web3 import AsyncWeb3
 from ...error import BlockNotFound, TransactionNotFound
 from ...model import Block, Transaction, DailyTransactions, CoinListing, TransactionId, EstimateFee, Wallet, Coin, \
-    Balance, WalletAddress, Authhead, WalletCheckResult
-from ...model.options import SteamingFindOptions
+    Balance, WalletAddress, Authhead, WalletCheckResult, AddressSummary, TokenTransfer
+from ...model.options import SteamingFindOptions, Streaming, Direction
 from ...types import Provider
+from ...utils.jsonrpc import JSONRPCError
 
 
 class EthMongoProvider(Provider):
-    def __init__(self, chain: str, network: str, db: EthMongoDatabase, accessor: EthDaemonAccessor):
+    def __init__(self, chain: str, network: str, db: EthMongoDatabase, accessor: EthDaemonAccessor, *,
+                 balance_cache: Optional[BalanceCache] = None):
         super().__init__(chain, network)
         self.db = db
         self.accessor = accessor
+        self.balance_cache = balance_cache
 
     @property
     def rpc(self) -> AsyncWeb3:
@@ -26,7 +30,7 @@ class EthMongoProvider(Provider):
     async def stream_address_transactions(self,
                                           address: str,
                                           unspent: bool,
-                                          find_options: SteamingFindOptions) -> List[Transaction]:
+                                          find_options: SteamingFindOptions) -> Streaming[Transaction]:
         query = {'addresses': address}
         if unspent is not None:
             if unspent:
@@ -36,20 +40,58 @@ class EthMongoProvider(Provider):
 
         return await self.db.tx_collection.streaming(query, find_options)
 
-    async def stream_address_utxos(self, address: str, unspent: bool, find_options: SteamingFindOptions) -> List[Coin]:
+    async def stream_address_utxos(self,
+                                   address: str,
+                                   unspent: bool,
+                                   find_options: SteamingFindOptions) -> Streaming[Coin]:
         raise NotImplementedError
 
+    async def get_balance(self, address: str) -> int:
+        """Balance at the stored tip, consistent with the transactions served (node head without blocks)."""
+        try:
+            tip = await self.db.fetch_block_tip()
+        except BlockNotFound:
+            return await self.rpc.eth_getBalance(address, 'latest')
+
+        block_number = hex(tip.height)
+        try:
+            if self.balance_cache is None or self.balance_cache.ttl <= 0:
+                return await self.rpc.eth_getBalance(address, block_number)
+
+            key = address.lower(), tip.height, tip.hash
+            return await self.balance_cache.get(key, lambda: self.rpc.eth_getBalance(address, block_number))
+        except JSONRPCError:
+            # state of the stored tip already pruned by the node (database far behind it), not cached
+            return await self.rpc.eth_getBalance(address, 'latest')
+
     async def get_balance_for_address(self, address: str) -> Balance:
-        value = await self.rpc.eth_getBalance(address, 'latest')
+        value = await self.get_balance(address)
         return Balance(confirmed=value, unconfirmed=0, balance=value)
 
+    async def get_address_summary(self, address: str) -> AddressSummary:
+        value = await self.get_balance(address)
+        return AddressSummary(address, balance=value)
+
+    async def stream_address_token_transfers(self,
+                                             address: str,
+                                             token: Optional[str],
+                                             find_options: SteamingFindOptions) -> Streaming[TokenTransfer]:
+        query = {'addresses': address.lower()}
+        if token is not None:
+            query['token'] = token.lower()
+
+        find_options.paging = 'blockHeight'
+        find_options.direction = Direction.DESCENDING
+        find_options.sort = [('blockHeight', DESCENDING)]
+        return await self.db.token_transfer_collection.streaming(query, find_options)
+
     async def stream_blocks(self,
                             since_block: Union[str, int] = None,
                             start_date: str = None,
                             end_date: str = None,
                             date: str = None,
                             *,
-                            find_options: SteamingFindOptions) -> List[Block]:
+                            find_options: SteamingFindOptions) -> Streaming[Block]:
         query = {}
 
         if since_block is None:
@@ -112,7 +154,7 @@ class EthMongoProvider(Provider):
                                   block_height: Optional[int] = None,
                                   block_hash: Optional[str] = None,
                                   *,
-                                  find_options: SteamingFindOptions) -> List[Transaction]:
+                                  find_options: SteamingFindOptions) -> Streaming[Transaction]:
         query = {}
 
         if block_height is not None:
@@ -159,7 +201,7 @@ class EthMongoProvider(Provider):
                                          start_date: str = None,
                                          end_date: str = None,
                                          *,
-                                         find_options: SteamingFindOptions) -> List[Transaction]:
+                                         find_options: SteamingFindOptions) -> Streaming[Transaction]:
         raise NotImplementedError
 
     async def get_wallet_balance(self, wallet: Wallet) -> Balance:
@@ -250,5 +292,5 @@ class EthMongoProvider(Provider):
     async def get_local_tip(self) -> Block:
         return await self.db.fetch_block_tip()
 
-    async def get_locator_hashes(self):
-        raise NotImplementedError
+    async def get_locator_hashes(self) -> List[str]:
+        return await self.db.fetch_locator_hashes()
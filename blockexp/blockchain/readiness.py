@@ -0,0 +1,112 @@
+import asyncio
+import traceback
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional, Dict, Tuple, Iterable
+
+from ..types import Blockchain
+
+__all__ = ["BlockchainState", "BlockchainStatus", "BlockchainReadiness"]
+
+
+class BlockchainState(str, Enum):
+    pending = "pending"
+    ready = "ready"
+    degraded = "degraded"  # node or database not ready yet, retried in background
+
+
+@dataclass
+class BlockchainStatus:
+    chain: str
+    network: str
+    state: BlockchainState = BlockchainState.pending
+    attempts: int = 0
+    lastCheck: Optional[datetime] = None
+    lastError: Optional[str] = None
+    readySince: Optional[datetime] = None
+
+
+class BlockchainReadiness:
+    """
+    Run `Blockchain.ready` of every blockchain concurrently, each bounded by `timeout` seconds.
+
+    A blockchain which is not ready in time stays enabled in a degraded state (the api serves what is
+    already in the database) and is retried in background every `retry_delay` seconds, doubled after
+    each failure up to `max_retry_delay`.
+    """
+
+    def __init__(self, *, timeout: float = 10, retry_delay: float = 5, max_retry_delay: float = 300):
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.statuses: Dict[Tuple[str, str], BlockchainStatus] = {}
+        self.blockchains: Dict[Tuple[str, str], Blockchain] = {}
+        self.futures: List[asyncio.Future] = []
+
+    async def check_all(self, blockchains: Iterable[Blockchain]):
+        blockchains = list(blockchains)
+        for blockchain in blockchains:
+            key = blockchain.chain, blockchain.network
+            self.blockchains[key] = blockchain
+            self.statuses[key] = BlockchainStatus(blockchain.chain, blockchain.network)
+
+        await asyncio.gather(*(self.check(blockchain) for blockchain in blockchains))
+
+    async def check(self, blockchain: Blockchain) -> bool:
+        status = self.statuses[blockchain.chain, blockchain.network]
+        status.attempts += 1
+
+        # noinspection PyBroadException
+        try:
+            await asyncio.wait_for(blockchain.ready(), self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            error = f'not ready after {self.timeout:g}s'
+        except Exception as e:
+            if status.attempts == 1:
+                traceback.print_exc()
+            error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        else:
+            status.state = BlockchainState.ready
+            status.lastCheck = status.readySince = datetime.utcnow()
+            status.lastError = None
+            return True
+
+        status.state = BlockchainState.degraded
+        status.lastCheck = datetime.utcnow()
+        status.lastError = error
+        print(blockchain.chain, blockchain.network, 'degraded:', error)
+        return False
+
+    def status(self) -> List[BlockchainStatus]:
+        return list(self.statuses.values())
+
+    def start(self):
+        for key, status in self.statuses.items():
+            if status.state != BlockchainState.ready:
+                self.futures.append(asyncio.ensure_future(self.retry(self.blockchains[key])))
+
+    async def retry(self, blockchain: Blockchain):
+        failures = 0
+        while True:
+            await asyncio.sleep(min(self.max_retry_delay, self.retry_delay * 2 ** failures))
+            if await self.check(blockchain):
+                print(blockchain.chain, blockchain.network, 'ready')
+                return
+
+            failures += 1
+
+    async def stop(self):
+        for future in self.futures:
+            if not future.done():
+                future.cancel()
+
+        while self.futures:
+            future = self.futures.pop()
+
+            try:
+                await future
+            except asyncio.CancelledError:
+                pass
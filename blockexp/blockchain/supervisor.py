@@ -0,0 +1,206 @@
+import asyncio
+import multiprocessing
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import List, Optional, Dict, Tuple
+
+from ..application import Application
+from ..types import Blockchain
+
+__all__ = ["ImporterMode", "ImporterState", "ImporterStatus", "ImporterSupervisor", "run_importer_process"]
+
+
+class ImporterMode(str, Enum):
+    inline = "inline"  # importers run as tasks of the current process (default)
+    process = "process"  # one process per importer
+    none = "none"  # no importer (ex. API only, with `blockexp import` running elsewhere)
+
+
+class ImporterState(str, Enum):
+    starting = "starting"
+    running = "running"
+    backoff = "backoff"
+    stopped = "stopped"
+
+
+@dataclass
+class ImporterStatus:
+    chain: str
+    network: str
+    mode: ImporterMode
+    state: ImporterState = ImporterState.starting
+    pid: Optional[int] = None
+    restarts: int = 0
+    started: Optional[datetime] = None
+    lastExit: Optional[datetime] = None
+    lastError: Optional[str] = None
+    nextRestart: Optional[datetime] = None
+
+
+class ImporterSupervisor:
+    """
+    Run the importer of every blockchain, inline or in its own process, and restart it when it fails.
+
+    Restarts wait `restart_delay` seconds, doubled after each consecutive failure up to
+    `max_restart_delay`. An importer that ran longer than `max_restart_delay` starts over from
+    `restart_delay`.
+    """
+
+    def __init__(self, app: Application, mode: ImporterMode = ImporterMode.inline, *,
+                 restart_delay: float = 1, max_restart_delay: float = 300, chains: List[str] = None):
+        self.app = app
+        self.mode = ImporterMode(mode)
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.chains = set(chains) if chains else None
+        self.statuses: Dict[Tuple[str, str], ImporterStatus] = {}
+        self.futures: List[asyncio.Future] = []
+        self.stopping = False
+
+    def start(self, blockchains: List[Blockchain]):
+        if self.mode == ImporterMode.none:
+            return
+
+        for blockchain in blockchains:
+            if self.chains is not None and blockchain.chain not in self.chains:
+                continue
+
+            if not blockchain.has_importer:
+                continue
+
+            status = ImporterStatus(blockchain.chain, blockchain.network, self.mode)
+            self.statuses[blockchain.chain, blockchain.network] = status
+            self.futures.append(asyncio.ensure_future(self.supervise(blockchain, status)))
+
+    def status(self) -> List[ImporterStatus]:
+        return list(self.statuses.values())
+
+    async def wait(self):
+        if self.futures:
+            await asyncio.gather(*self.futures)
+
+    async def stop(self):
+        self.stopping = True
+        for future in self.futures:
+            if not future.done():
+                future.cancel()
+
+        while self.futures:
+            future = self.futures.pop()
+
+            try:
+                await future
+            except asyncio.CancelledError:
+                pass
+
+    async def supervise(self, blockchain: Blockchain, status: ImporterStatus):
+        failures = 0
+
+        try:
+            while True:
+                status.state = ImporterState.running
+                status.started = datetime.utcnow()
+                status.nextRestart = None
+                started = time.monotonic()
+
+                if self.mode == ImporterMode.process:
+                    error = await self.run_process(blockchain, status)
+                else:
+                    error = await self.run_inline(blockchain)
+
+                if error is None:
+                    print(blockchain.chain, blockchain.network, 'importer stopped')
+                    break
+
+                if time.monotonic() - started >= self.max_restart_delay:
+                    failures = 0
+
+                delay = min(self.max_restart_delay, self.restart_delay * 2 ** failures)
+                failures += 1
+
+                status.state = ImporterState.backoff
+                status.pid = None
+                status.lastExit = datetime.utcnow()
+                status.lastError = error
+                status.nextRestart = status.lastExit + timedelta(seconds=delay)
+                print(blockchain.chain, blockchain.network, 'importer exited:', error, f'(restart in {delay:g}s)')
+
+                await asyncio.sleep(delay)
+                status.restarts += 1
+        finally:
+            status.state = ImporterState.stopped
+            status.pid = None
+            status.nextRestart = None
+
+    @staticmethod
+    async def run_inline(blockchain: Blockchain) -> Optional[str]:
+        # noinspection PyBroadException
+        try:
+            await blockchain.get_importer().run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            traceback.print_exc()
+            return ''.join(traceback.format_exception_only(type(e), e)).strip()
+
+        return None
+
+    async def run_process(self, blockchain: Blockchain, status: ImporterStatus) -> Optional[str]:
+        # spawn: the child starts from a clean interpreter instead of a copy of the server's event loop
+        # not a daemon process, importers may start their own decoding processes
+        context = multiprocessing.get_context('spawn')
+        process = context.Process(
+            target=run_importer_process,
+            args=(self.app.config, blockchain.chain, blockchain.network),
+            name=f'blockexp-import-{blockchain.chain}-{blockchain.network}',
+        )
+        process.start()
+        status.pid = process.pid
+
+        loop = asyncio.get_event_loop()
+        try:
+            while process.is_alive():
+                await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            process.terminate()
+            await loop.run_in_executor(None, process.join, 10)
+            if process.is_alive():
+                process.kill()
+
+            raise
+
+        process.join()
+        if process.exitcode == 0 or self.stopping:
+            # the child also gets the signals sent to the server (ex. Ctrl-C), it may exit before we terminate it
+            return None
+
+        return f'exit code {process.exitcode}'
+
+
+def run_importer_process(config: dict, chain: str, network: str):
+    asyncio.run(_run_importer(config, chain, network))
+
+
+async def _run_importer(config: dict, chain: str, network: str):
+    from . import create_blockchain
+    from .. import database
+
+    app = Application(config=config)
+    await app.register_extension(database)
+
+    blockchain = None
+    for cfg in config.get("blockchain", []):
+        if cfg.get('chain') == chain and cfg.get('network') == network:
+            blockchain = create_blockchain(app, cfg)
+
+    if blockchain is None:
+        raise LookupError((chain, network))
+
+    await app.on_startup()
+    try:
+        await blockchain.get_importer().run()
+    finally:
+        await app.on_shutdown()
@@ -0,0 +1,61 @@
+from typing import List, Dict
+
+from ...database import MongoCollection, bulk_write_for
+
+
+class BulkWriteBatch:
+    """
+    Buffer bulk write operations of several blocks and flush them as one bulk write per collection.
+
+    Collections are flushed in the given order and the last one is treated as the tip collection:
+    it is written ordered and only after every other collection was flushed, so the stored tip
+    never points past data that is not written yet.
+    """
+
+    def __init__(self, collections: List[MongoCollection], *,
+                 max_blocks: int = 100, max_ops: int = 20000, max_bytes: int = 16 * 1024 * 1024):
+        self.ops: Dict[MongoCollection, List] = {collection: [] for collection in collections}
+        self.max_blocks = max_blocks
+        self.max_ops = max_ops
+        self.max_bytes = max_bytes
+        self.block_count = 0
+        self.op_count = 0
+        self.byte_count = 0
+
+    def add(self, collection: MongoCollection, db_op):
+        self.ops[collection].append(db_op)
+        self.op_count += 1
+
+    def extend(self, collection: MongoCollection, db_ops: List):
+        self.ops[collection].extend(db_ops)
+        self.op_count += len(db_ops)
+
+    def add_block(self, size: int):
+        self.block_count += 1
+        self.byte_count += size
+
+    @property
+    def full(self) -> bool:
+        return (self.block_count >= self.max_blocks or
+                self.op_count >= self.max_ops or
+                self.byte_count >= self.max_bytes)
+
+    async def flush(self):
+        *collections, tip_collection = self.ops
+
+        for collection in collections:
+            async with bulk_write_for(collection, ordered=False) as db_ops:
+                db_ops += self.ops[collection]
+
+        async with bulk_write_for(tip_collection, ordered=True) as db_ops:
+            db_ops += self.ops[tip_collection]
+
+        self.clear()
+
+    def clear(self):
+        for db_ops in self.ops.values():
+            db_ops.clear()
+
+        self.block_count = 0
+        self.op_count = 0
+        self.byte_count = 0
@@ -0,0 +1,56 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Executor
+from functools import partial
+from typing import Tuple, Type, Dict, Optional, Callable, TypeVar
+
+from ...types import Accessor
+
+__all__ = ["AccessorSpec", "DecoderPool", "get_worker_accessor"]
+
+T = TypeVar('T')
+
+AccessorSpec = Tuple[Type[Accessor], str, str, str]  # (accessor class, chain, network, url)
+
+_WORKER_ACCESSORS: Dict[AccessorSpec, Accessor] = {}
+
+
+def get_worker_accessor(spec: AccessorSpec) -> Accessor:
+    """Accessor used for conversions inside a decoding process (it never connects)."""
+    accessor = _WORKER_ACCESSORS.get(spec)
+    if accessor is None:
+        accessor_cls, chain, network, url = spec
+        accessor = _WORKER_ACCESSORS[spec] = accessor_cls(chain, network, url)
+
+    return accessor
+
+
+class DecoderPool:
+    """
+    Optional process pool for the CPU-bound part of an importer (parsing blocks and building rows).
+
+    With `workers == 0` jobs run inline on the event loop, like before.
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = max(0, workers)
+        self.executor: Optional[Executor] = None
+
+    def __enter__(self):
+        if self.workers:
+            # spawn: do not fork the event loop, motor threads and sockets of the importer
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self.executor is None:
+            return func(*args)
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args))
@@ -0,0 +1,153 @@
+from typing import List, Optional, Callable, Awaitable, Dict
+
+from pymongo import DESCENDING
+
+from ...database import MongoCollection
+
+__all__ = ["HeaderChain", "locator_heights"]
+
+GetBlockHashes = Callable[[List[int]], Awaitable[List[Optional[str]]]]
+
+
+def locator_heights(tip_height: int, *, start_height: int = 0) -> List[int]:
+    """Heights of a block locator: the last 10 blocks, then exponentially spaced back to `start_height`."""
+    heights = []
+    step = 1
+    height = tip_height
+
+    while height > start_height:
+        heights.append(height)
+        if len(heights) >= 10:
+            step *= 2
+
+        height -= step
+
+    heights.append(start_height)
+    return heights
+
+
+class HeaderChain:
+    """
+    Hashes of the last `size` imported blocks, kept in memory in height order.
+
+    It mirrors the blocks collection: load it once at startup, then `append` imported blocks and
+    `truncate` on undo. `find_fork_height` compares it against the node to detect reorgs without
+    probing the database one height at a time.
+    """
+
+    def __init__(self, size: int = 2016):
+        self.size = max(1, size)
+        self.start_height = 0
+        self.hashes: List[str] = []  # hashes[i] is the hash at start_height + i
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @property
+    def tip_height(self) -> Optional[int]:
+        return self.start_height + len(self.hashes) - 1 if self.hashes else None
+
+    @property
+    def tip_hash(self) -> Optional[str]:
+        return self.hashes[-1] if self.hashes else None
+
+    def get(self, height: int) -> Optional[str]:
+        index = height - self.start_height
+        if 0 <= index < len(self.hashes):
+            return self.hashes[index]
+
+        return None
+
+    def append(self, height: int, block_hash: str):
+        if self.hashes and height != self.tip_height + 1:
+            # not contiguous (ex. importer restarted from another height), start over from this block
+            self.hashes.clear()
+
+        if not self.hashes:
+            self.start_height = height
+
+        self.hashes.append(block_hash)
+
+        # trim in chunks, so appending stays amortized O(1)
+        if len(self.hashes) >= self.size * 2:
+            excess = len(self.hashes) - self.size
+            del self.hashes[:excess]
+            self.start_height += excess
+
+    def truncate(self, height: int):
+        """Forget every block at `height` and above."""
+        if height <= self.start_height:
+            self.clear()
+        else:
+            del self.hashes[height - self.start_height:]
+
+    def clear(self):
+        self.hashes.clear()
+        self.start_height = 0
+
+    async def load(self, block_collection: MongoCollection, *, height_key: str = 'height', hash_key: str = 'hash'):
+        self.clear()
+
+        cursor = block_collection.find(
+            {},
+            projection={height_key: True, hash_key: True, '_id': False},
+            sort=[(height_key, DESCENDING)],
+            limit=self.size,
+        )
+
+        rows: Dict[int, str] = {row[height_key]: row[hash_key] async for row in cursor}
+        if not rows:
+            return
+
+        # keep the contiguous run below the tip only
+        tip_height = max(rows)
+        start_height = tip_height
+        while start_height - 1 in rows:
+            start_height -= 1
+
+        self.start_height = start_height
+        self.hashes = [rows[height] for height in range(start_height, tip_height + 1)]
+
+    async def find_fork_height(self, get_block_hashes: GetBlockHashes, node_height: int) -> Optional[int]:
+        """
+        Return the highest height whose hash matches the node, or None if no block kept in memory matches.
+
+        The locator heights are checked with one batch call, then the gap between the highest matching
+        and the lowest mismatching height is bisected.
+        """
+        tip_height = self.tip_height
+        if tip_height is None:
+            return None
+
+        async def matches(heights: List[int]) -> List[bool]:
+            known_heights = [height for height in heights if height <= node_height]
+            remote_hashes = dict(zip(known_heights, await get_block_hashes(known_heights))) if known_heights else {}
+            return [remote_hashes.get(height) == self.get(height) for height in heights]
+
+        probe_heights = locator_heights(tip_height, start_height=self.start_height)
+        results = await matches(probe_heights)
+
+        if results[0]:
+            return tip_height
+
+        good = None
+        bad = tip_height
+        for height, result in zip(probe_heights, results):
+            if result:
+                good = height
+                break
+
+            bad = height
+
+        if good is None:
+            return None
+
+        while bad - good > 1:
+            middle = (good + bad) // 2
+            result, = await matches([middle])
+            if result:
+                good = middle
+            else:
+                bad = middle
+
+        return good
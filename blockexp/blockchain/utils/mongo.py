@@ -1,9 +1,17 @@
 from collections import Callable
-from typing import Optional, List, TypeVar, Generic
+from dataclasses import fields, is_dataclass
+from typing import Optional, List, TypeVar, Generic, AsyncIterator, Union, Type
 
+import bson
+from pymongo import DESCENDING, IndexModel
+
+from .headers import locator_heights
+from .sync import SyncState
+from .tip import TIP_CACHE
 from ...database import MongoDatabase, MongoCollection
+from ...error import BlockNotFound
 from ...model import Block, Transaction, Coin, Wallet, WalletAddress, Balance
-from ...model.options import SteamingFindOptions, Direction
+from ...model.options import SteamingFindOptions, Streaming, Direction
 from ...types import Base
 
 T = TypeVar('T')
@@ -14,10 +22,17 @@ def index(**data):
 
 
 class BlockchainMongoCollection(MongoCollection, Generic[T]):
-    def __init__(self, collection: MongoCollection, converter: Callable, fetch_tip: Optional[Callable]):
+    def __init__(self, collection: MongoCollection, converter: Callable, fetch_tip: Optional[Callable], *,
+                 injector: Optional[Callable] = None, model: Optional[Type] = None):
         super().__init__(collection._collection, database=collection._database)
         self.converter = converter
         self.fetch_tip = fetch_tip
+        self.injector = injector
+        self.projection = get_projection(model)
+
+    @property
+    def supports_raw(self) -> bool:
+        return self.injector is not None
 
     async def _convert_all(self, cursor) -> List[T]:
         converter = self.converter
@@ -28,10 +43,34 @@ class BlockchainMongoCollection(MongoCollection, Generic[T]):
         else:
             return [converter(item) async for item in cursor]
 
+    async def _iter_convert(self, cursor) -> AsyncIterator[T]:
+        converter = self.converter
+        tip = await self.fetch_tip() if self.fetch_tip is not None else None
+
+        async for item in cursor:
+            yield converter(item, tip) if tip is not None else converter(item)
+
+    async def _iter_raw(self, cursor) -> AsyncIterator[dict]:
+        injector = self.injector
+        tip = await self.fetch_tip() if self.fetch_tip is not None else None
+
+        async for batch in cursor:
+            for item in bson.decode_all(batch):
+                yield injector(item, tip)
+
+    async def _raw_all(self, cursor) -> List[dict]:
+        return [item async for item in self._iter_raw(cursor)]
+
     async def streaming(
             self,
             query: dict,
-            find_options: SteamingFindOptions) -> List[T]:
+            find_options: SteamingFindOptions) -> Streaming[T]:
+        """
+        Return a list, or an async iterator over the cursor when `find_options.stream` is set.
+
+        With `find_options.raw` the projected documents are returned as dicts (with chain, network and
+        confirmations injected) instead of model instances, for responses that are only serialized.
+        """
         if find_options.limit is None:
             find_options.limit = 0
 
@@ -46,15 +85,37 @@ class BlockchainMongoCollection(MongoCollection, Generic[T]):
                 elif find_options.direction == Direction.DESCENDING:
                     query[paging] = {'$lt': find_options.since}
 
-        cursor = self.find(query, limit=find_options.limit)
+        raw = find_options.raw and self.supports_raw
+        if raw:
+            cursor = self.find_raw_batches(query, self.projection, limit=find_options.limit)
+        else:
+            cursor = self.find(query, limit=find_options.limit)
 
         if find_options.sort is not None:
             cursor = cursor.sort(find_options.sort)
 
+        if raw:
+            return self._iter_raw(cursor) if find_options.stream else await self._raw_all(cursor)
+        elif find_options.stream:
+            return self._iter_convert(cursor)
+
         return await self._convert_all(cursor)
 
+    async def ensure_indexes(self, indexes: List[IndexModel]) -> List[str]:
+        """Create the indexes whose keys are missing, in a single command. Return the created names."""
+        existing = {tuple(map(tuple, info['key'])) for info in (await self.index_information()).values()}
+        missing = [model for model in indexes if tuple(model.document['key'].items()) not in existing]
+        if not missing:
+            return []
+
+        return await self.create_indexes(missing)
+
     # noinspection PyShadowingBuiltins
-    async def fetch_all(self, filter=None, projection=None, **kwargs) -> List[T]:
+    async def fetch_all(self, filter=None, projection=None, *, raw: bool = False, **kwargs) -> Union[List[T], List[dict]]:
+        if raw and self.supports_raw:
+            items = self.find_raw_batches(filter, projection or self.projection, **kwargs)
+            return await self._raw_all(items)
+
         items = self.find(filter, projection=projection, **kwargs)
         return await self._convert_all(items)
 
@@ -68,21 +129,67 @@ class BlockchainMongoCollection(MongoCollection, Generic[T]):
 
 
 class BlockchainMongoDatabase(Base):
+    block_collection: BlockchainMongoCollection[Block]
+    sync_state_collection: BlockchainMongoCollection[dict]
+
+    SYNC_STATE_ID = 'sync'
+
     def __init__(self, chain: str, network: str, database: MongoDatabase):
         super().__init__(chain, network)
         self.database = database
+        self.sync_state_collection = self.new_collection('sync_state', dict, None)
 
     @property
     def _collection_key(self) -> str:
         return f'{self.chain}:{self.network}'
 
-    def new_collection(self, name: str, converter: Callable,
-                       fetch_tip: Optional[Callable]) -> BlockchainMongoCollection:
-        return BlockchainMongoCollection(self.database[f'{self._collection_key}:{name}'], converter, fetch_tip)
+    def new_collection(self, name: str, converter: Callable, fetch_tip: Optional[Callable], *,
+                       injector: Optional[Callable] = None, model: Optional[Type] = None) -> BlockchainMongoCollection:
+        return BlockchainMongoCollection(self.database[f'{self._collection_key}:{name}'], converter, fetch_tip,
+                                         injector=injector, model=model)
 
     async def create_indexes(self):
         raise NotImplementedError
 
+    async def fetch_block_tip(self) -> Block:
+        tip = TIP_CACHE.get(self.chain, self.network)
+        if tip is not None:
+            return tip
+
+        raw_block: Optional[dict] = await self.block_collection.find_one(sort=[('height', DESCENDING)])
+        if raw_block is None:
+            raise BlockNotFound(None)
+
+        tip = self.convert_raw_block(raw_block)
+        TIP_CACHE.set(self.chain, self.network, tip)
+        return tip
+
+    async def fetch_sync_state(self) -> Optional[SyncState]:
+        row: Optional[dict] = await self.sync_state_collection.find_one({'_id': self.SYNC_STATE_ID})
+        if row is None:
+            return None
+
+        return SyncState.load(row)
+
+    async def store_sync_state(self, state: SyncState):
+        await self.sync_state_collection.replace_one(
+            {'_id': self.SYNC_STATE_ID},
+            state.asrow(),
+            upsert=True,
+        )
+
+    async def fetch_locator_hashes(self) -> List[str]:
+        tip = await self.fetch_block_tip()
+        heights = locator_heights(tip.height)
+
+        cursor = self.block_collection.find(
+            {'height': {'$in': heights}},
+            projection={'height': True, 'hash': True, '_id': False},
+        )
+
+        hashes = {row['height']: row['hash'] async for row in cursor}
+        return [hashes[height] for height in heights if height in hashes]
+
     def convert_raw_block(self, raw_block: dict, tip: Block = None) -> Block:
         block = Block(**raw_block, chain=self.chain, network=self.network)
         if tip is not None:
@@ -104,6 +211,30 @@ class BlockchainMongoDatabase(Base):
 
         return coin
 
+    def inject_raw_block(self, raw_block: dict, tip: Block = None) -> dict:
+        raw_block['chain'] = self.chain
+        raw_block['network'] = self.network
+        if tip is not None:
+            raw_block['confirmations'] = tip.height - raw_block['height'] + 1
+
+        return raw_block
+
+    def inject_raw_transaction(self, raw_transaction: dict, tip: Block = None) -> dict:
+        raw_transaction['chain'] = self.chain
+        raw_transaction['network'] = self.network
+        if tip is not None:
+            raw_transaction['confirmations'] = tip.height - raw_transaction['blockHeight'] + 1
+
+        return raw_transaction
+
+    def inject_raw_coin(self, raw_coin: dict, tip: Block = None) -> dict:
+        raw_coin['chain'] = self.chain
+        raw_coin['network'] = self.network
+        if tip is not None:
+            raw_coin['confirmations'] = tip.height - raw_coin['mintHeight'] + 1
+
+        return raw_coin
+
     def convert_raw_wallet(self, raw_wallet: dict) -> Wallet:
         return Wallet(**raw_wallet, chain=self.chain, network=self.network)
 
@@ -111,6 +242,15 @@ class BlockchainMongoDatabase(Base):
         return WalletAddress(**raw_wallet_address, chain=self.chain, network=self.network)
 
 
+def get_projection(model: Optional[Type]) -> Optional[dict]:
+    if model is None:
+        return None
+
+    assert is_dataclass(model), model
+    # noinspection PyDataclass
+    return {dc_field.name: True for dc_field in fields(model)}
+
+
 def get_balance(raw_coins: List[Coin]) -> Balance:
     confirmed = 0
     unconfirmed = 0
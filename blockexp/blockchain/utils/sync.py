@@ -0,0 +1,57 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+__all__ = ["SyncPhase", "SyncState"]
+
+
+class SyncPhase(str, Enum):
+    committed = "committed"  # every write up to `height` succeeded
+    importing = "importing"  # blocks `height + 1 .. target_height` are being written
+    undoing = "undoing"  # blocks from `target_height` (`height + 1`) are being removed
+
+
+@dataclass
+class SyncState:
+    """
+    Import checkpoint of one chain, stored as a single document.
+
+    It is written before a batch (or an undo) starts and marked committed only after all of its
+    bulk writes succeeded. After a crash, everything above `height` is cleaned and imported again.
+    """
+    height: int = -1
+    hash: Optional[str] = None
+    phase: SyncPhase = SyncPhase.committed
+    target_height: Optional[int] = None
+    updated: datetime = field(default_factory=datetime.utcnow)
+
+    @property
+    def is_committed(self) -> bool:
+        return self.phase == SyncPhase.committed
+
+    def begin(self, phase: SyncPhase, target_height: int) -> 'SyncState':
+        return SyncState(self.height, self.hash, phase, target_height)
+
+    @staticmethod
+    def commit(height: int, block_hash: Optional[str]) -> 'SyncState':
+        return SyncState(height, block_hash, SyncPhase.committed)
+
+    def asrow(self) -> dict:
+        return {
+            'height': self.height,
+            'hash': self.hash,
+            'phase': self.phase.value,
+            'targetHeight': self.target_height,
+            'updated': self.updated,
+        }
+
+    @classmethod
+    def load(cls, row: dict) -> 'SyncState':
+        return cls(
+            height=row['height'],
+            hash=row.get('hash'),
+            phase=SyncPhase(row['phase']),
+            target_height=row.get('targetHeight'),
+            updated=row.get('updated') or datetime.utcnow(),
+        )
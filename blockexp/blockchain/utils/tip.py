@@ -0,0 +1,48 @@
+import os
+import time
+from dataclasses import replace
+from typing import Dict, Tuple, Optional
+
+from ...model import Block
+
+__all__ = ["TipCache", "TIP_CACHE"]
+
+
+class TipCache:
+    """
+    Process-wide chain tip per (chain, network).
+
+    Importers update it whenever they write or undo blocks; processes without an importer fall
+    back to re-reading the tip from the database once an entry is older than `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float = 5):
+        self.ttl = ttl
+        self._tips: Dict[Tuple[str, str], Tuple[Block, float]] = {}
+
+    def get(self, chain: str, network: str) -> Optional[Block]:
+        item = self._tips.get((chain, network))
+        if item is None:
+            return None
+
+        tip, updated_at = item
+        if time.monotonic() - updated_at > self.ttl:
+            return None
+
+        return replace(tip)
+
+    def set(self, chain: str, network: str, tip: Block):
+        self._tips[chain, network] = replace(tip), time.monotonic()
+
+    def invalidate(self, chain: str, network: str):
+        self._tips.pop((chain, network), None)
+
+    def clear(self):
+        self._tips.clear()
+
+
+TIP_CACHE = TipCache()
+
+if hasattr(os, 'register_at_fork'):
+    # forked api workers start with an empty cache instead of the tips seen by the parent
+    os.register_at_fork(after_in_child=TIP_CACHE.clear)
@@ -1,12 +1,12 @@
 import asyncio
 import logging
-from typing import TextIO
+from typing import TextIO, Tuple
 
 import click
 import toml
 
 from blockexp import init_app
-from blockexp.application import Application
+from blockexp.application import Application, run_import
 
 
 @click.group()
@@ -14,19 +14,52 @@ def cli():
     pass
 
 
-@cli.command()
-@click.argument('config', type=click.File('r'), default="blockexp.toml")
-def start(config: TextIO = None):
+def load_config(config: TextIO = None) -> dict:
     if config is not None:
         with config:
-            cfg = toml.load(config)
-    else:
-        cfg = {}
+            return toml.load(config)
+
+    return {}
+
+
+@cli.command()
+@click.argument('config', type=click.File('r'), default="blockexp.toml")
+@click.option('--workers', type=int, default=None,
+              help="number of api worker processes ([server] workers), importers then run in their own process")
+def serve(config: TextIO = None, workers: int = None):
+    cfg = load_config(config)
 
     logging.basicConfig(level=logging.INFO)
 
+    # one-time initialization (blockchain.ready: node ping, indexes), before the workers are forked
     app: Application = asyncio.run(init_app(cfg))
-    app.serve()
+    app.serve(workers=workers)
+
+
+cli.add_command(serve, 'start')
+
+
+@cli.command('import')
+@click.argument('config', type=click.File('r'), default="blockexp.toml")
+@click.option('--mode', type=click.Choice(['inline', 'process']), default=None,
+              help="run the importers in this process or one process per chain ([importer] mode)")
+@click.option('--chain', 'chains', multiple=True, help="only import this chain (can be repeated)")
+def import_(config: TextIO = None, mode: str = None, chains: Tuple[str, ...] = ()):
+    """Run the importers without the web server."""
+    cfg = load_config(config)
+
+    importer_cfg = cfg.setdefault('importer', {})
+    if mode is not None:
+        importer_cfg['mode'] = mode
+    elif importer_cfg.get('mode') in (None, 'none'):
+        importer_cfg['mode'] = 'inline'
+
+    if chains:
+        importer_cfg['chains'] = list(chains)
+
+    logging.basicConfig(level=logging.INFO)
+
+    asyncio.run(run_import(cfg))
 
 
 if __name__ == '__main__':
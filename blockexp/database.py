@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-import random
+import asyncio
+import os
 from contextlib import asynccontextmanager
-from typing import TYPE_CHECKING, Union, List, cast, Optional, AsyncIterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Union, List, cast, Optional, AsyncIterable, Dict, Tuple
 
 from databases import DatabaseURL
 from motor.motor_asyncio import (
@@ -20,6 +22,7 @@ from starlette.requests import Request
 
 from starlette_typed.endpoint import register_handler
 from .application import Application
+from .types import Service
 
 if TYPE_CHECKING:
     from motor.core import (
@@ -240,36 +243,136 @@ if TYPE_CHECKING:
         pass
 
 
+@dataclass
+class DatabasePoolStats:
+    database: str
+    maxPoolSize: int
+    minPoolSize: int
+    maxIdleTimeMS: Optional[int]
+    clientsCreated: int
+    acquired: int
+    inUse: int
+
+
 class DatabasePool:
-    def __init__(self, url: DatabaseURL, *, max_size=-1):
+    """
+    One long-lived motor client per process and event loop.
+
+    The client keeps its own socket pool (sized by `max_pool_size`/`min_pool_size`), so acquiring
+    a database does not pay client construction and server discovery on every request.
+    """
+
+    def __init__(self, url: DatabaseURL, *, max_pool_size: int = 100, min_pool_size: int = 0,
+                 max_idle_time_ms: int = None):
         self.url = url
-        self.max_size = max_size
-        self.pool = []
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.max_idle_time_ms = max_idle_time_ms
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._owner = None
+        self._users = 0  # acquisitions of the current client not released yet
+        self._retired: Dict[int, Tuple[AsyncIOMotorClient, int]] = {}  # replaced clients still acquired
+        self.clients_created = 0
+        self.acquired = 0
+        self.in_use = 0
 
     async def connect(self) -> AsyncIOMotorClient:
+        self.clients_created += 1
         return AsyncIOMotorClient(
             host=self.url.hostname,
             port=self.url.port,
+            maxPoolSize=self.max_pool_size,
+            minPoolSize=self.min_pool_size,
+            maxIdleTimeMS=self.max_idle_time_ms,
         )
 
     async def acquire(self) -> AsyncIOMotorClient:
-        if self.pool:
-            client = random.choice(self.pool)
-            self.pool.remove(client)
-            return client
+        # a client is bound to the event loop that created it and must not be shared across fork()
+        owner = os.getpid(), asyncio.get_event_loop()
+        if self._client is None or self._owner != owner:
+            self._retire(owner[0])
+            self._client = await self.connect()
+            self._owner = owner
+            self._users = 0
+
+        self.acquired += 1
+        self.in_use += 1
+        self._users += 1
+        return self._client
+
+    def _retire(self, pid: int):
+        client = self._client
+        if client is None or self._owner[0] != pid:
+            # inherited through fork(): its sockets belong to the parent, only forget it
+            self._retired.clear()
+            return
+
+        # ex. the client of `asyncio.run(init_app(...))` once the server loop takes over
+        if self._users:
+            self._retired[id(client)] = client, self._users
         else:
-            return await self.connect()
+            client.close()
 
     async def release(self, client: AsyncIOMotorClient):
-        if len(self.pool) < self.max_size:
-            self.pool.append(client)
+        self.in_use -= 1
+
+        if client is self._client:
+            self._users -= 1
+            return
+
+        retired_client, users = self._retired.pop(id(client), (client, 1))
+        if users > 1:
+            self._retired[id(client)] = retired_client, users - 1
         else:
             client.close()
 
+    async def close(self):
+        for client, _ in self._retired.values():
+            client.close()
+
+        self._retired.clear()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+            self._owner = None
+            self._users = 0
+
+    def stats(self) -> DatabasePoolStats:
+        return DatabasePoolStats(
+            database=self.url.database,
+            maxPoolSize=self.max_pool_size,
+            minPoolSize=self.min_pool_size,
+            maxIdleTimeMS=self.max_idle_time_ms,
+            clientsCreated=self.clients_created,
+            acquired=self.acquired,
+            inUse=self.in_use,
+        )
+
+
+class DatabasePoolService(Service):
+    def __init__(self, pool: DatabasePool):
+        self.pool = pool
+
+    async def on_startup(self):
+        pass
+
+    async def on_shutdown(self):
+        await self.pool.close()
+
 
 async def init_app(app: Application) -> DatabasePool:
-    url = DatabaseURL(app.config.get('DATABASE_URL', 'mongodb:///default'))
-    return DatabasePool(url, max_size=32)
+    config = app.config.get('database', {})
+    url = DatabaseURL(config.get('url', app.config.get('DATABASE_URL', 'mongodb:///default')))
+
+    pool = DatabasePool(
+        url,
+        max_pool_size=config.get('max_pool_size', 100),
+        min_pool_size=config.get('min_pool_size', 0),
+        max_idle_time_ms=config.get('max_idle_time_ms'),
+    )
+
+    app.register_service(DatabasePoolService(pool))
+    return pool
 
 
 def get_pool(app: Application) -> DatabasePool:
@@ -279,7 +382,7 @@ def get_pool(app: Application) -> DatabasePool:
 @asynccontextmanager
 async def connect_database_for(app: Application) -> MongoDatabase:
     pool = get_pool(app)
-    client = await pool.connect()
+    client = await pool.acquire()
 
     raw_database = client.get_database(pool.url.database)
     database = MongoDatabase(raw_database)
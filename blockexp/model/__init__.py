@@ -106,6 +106,18 @@ class Balance:
     balance: int = 0
 
 
+@dataclass
+class AddressSummary:
+    address: str
+    balance: int = 0
+    received: int = 0
+    sent: int = 0
+    unconfirmed: int = 0
+    txCount: int = 0
+    utxoCount: int = 0
+    height: int = -1
+
+
 @dataclass
 class EstimateFee:
     feerate: float
@@ -139,6 +151,25 @@ class WalletCheckResult:
     sum: int
 
 
+@dataclass
+class TokenTransfer:
+    chain: str
+    network: str
+    txid: str
+    logIndex: int
+    blockHeight: int
+    blockHash: str
+    blockTime: str
+    token: str
+    fromAddress: str
+    toAddress: str
+    addresses: List[str] = field(default_factory=list)
+    value: Optional[str] = None  # ERC-20 amount, as a decimal string
+    tokenId: Optional[str] = None  # ERC-721 token id, as a decimal string
+    confirmations: Optional[int] = None
+    _id: str = None
+
+
 @dataclass
 class DailyTransactions:
     chain: str
@@ -1,9 +1,15 @@
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Any
+from typing import Any, AsyncIterator, List, TypeVar, Union
 
 from ..utils import check_schemas
 
+T = TypeVar('T')
+
+# result of a find with `SteamingFindOptions`: a list, or an async iterator with `stream`, of models or of
+# dicts with `raw`
+Streaming = Union[List[T], AsyncIterator[T], List[dict], AsyncIterator[dict]]
+
 
 class Direction(IntEnum):
     ASCENDING = 1
@@ -17,6 +23,8 @@ class SteamingFindOptions:
     sort: Any = None
     direction: Direction = None
     limit: int = None
+    stream: bool = False
+    raw: bool = False
 
 
 check_schemas(globals())
@@ -11,6 +11,11 @@ class Blockchain(Base, ABC):
     async def ready(self):
         pass
 
+    @property
+    def has_importer(self) -> bool:
+        # without building one: importers open accessors, caches and decoding processes
+        return type(self).get_importer is not Blockchain.get_importer
+
     def get_importer(self) -> Optional[Importer]:
         return None
 
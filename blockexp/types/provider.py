@@ -3,9 +3,9 @@ from typing import Union, Any, TypeVar, List, Optional
 
 from ._base import Base
 from ..model import Block, Transaction, CoinListing, Authhead, TransactionId, Balance, EstimateFee, Wallet, Coin, \
-    WalletAddress
+    WalletAddress, AddressSummary, TokenTransfer
 from ..model import DailyTransactions
-from ..model.options import SteamingFindOptions
+from ..model.options import SteamingFindOptions, Streaming
 
 T = TypeVar('T')
 
@@ -21,17 +21,29 @@ class Provider(Base, ABC):
     async def stream_address_transactions(self,
                                           address: str,
                                           unspent: bool,
-                                          find_options: SteamingFindOptions) -> List[Transaction]:
+                                          find_options: SteamingFindOptions) -> Streaming[Transaction]:
         raise NotImplementedError
 
     @abstractmethod
-    async def stream_address_utxos(self, address: str, unspent: bool, find_options: SteamingFindOptions) -> List[Any]:
+    async def stream_address_utxos(self,
+                                   address: str,
+                                   unspent: bool,
+                                   find_options: SteamingFindOptions) -> Streaming[Any]:
         raise NotImplementedError
 
     @abstractmethod
     async def get_balance_for_address(self, address: str) -> Balance:
         raise NotImplementedError
 
+    async def get_address_summary(self, address: str) -> AddressSummary:
+        raise NotImplementedError
+
+    async def stream_address_token_transfers(self,
+                                             address: str,
+                                             token: Optional[str],
+                                             find_options: SteamingFindOptions) -> Streaming[TokenTransfer]:
+        raise NotImplementedError
+
     @abstractmethod
     async def stream_blocks(self,
                             since_block: Union[str, int] = None,
@@ -39,7 +51,7 @@ class Provider(Base, ABC):
                             end_date: str = None,
                             date: str = None,
                             *,
-                            find_options: SteamingFindOptions) -> List[Block]:
+                            find_options: SteamingFindOptions) -> Streaming[Block]:
         raise NotImplementedError
 
     @abstractmethod
@@ -54,7 +66,7 @@ class Provider(Base, ABC):
     async def stream_transactions(self,
                                   block_height: int,
                                   block_hash: str,
-                                  find_options: SteamingFindOptions) -> List[Transaction]:
+                                  find_options: SteamingFindOptions) -> Streaming[Transaction]:
         raise NotImplementedError
 
     @abstractmethod
@@ -97,7 +109,7 @@ class Provider(Base, ABC):
                                          start_date: str = None,
                                          end_date: str = None,
                                          *,
-                                         find_options: SteamingFindOptions) -> List[Transaction]:
+                                         find_options: SteamingFindOptions) -> Streaming[Transaction]:
         raise NotImplementedError
 
     @abstractmethod
@@ -132,5 +144,5 @@ class Provider(Base, ABC):
         raise NotImplementedError
 
     @abstractmethod
-    async def get_locator_hashes(self):
+    async def get_locator_hashes(self) -> List[str]:
         raise NotImplementedError
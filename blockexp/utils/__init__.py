@@ -1,16 +1,12 @@
-from dataclasses import asdict, is_dataclass
+from dataclasses import is_dataclass
 from typing import Any
 
 from starlette_typed.marshmallow import check_schema
+from .rows import get_row_builder
 
 
 def asrow(obj: Any) -> dict:
-    data = asdict(obj)
-    data.pop('_id', None)
-    data.pop('_raw', None)
-    data.pop('chain', None)
-    data.pop('network', None)
-    return data
+    return get_row_builder(type(obj))(obj)
 
 
 def check_schemas(ctx: dict):
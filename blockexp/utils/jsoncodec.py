@@ -0,0 +1,99 @@
+import json
+import re
+from typing import Any, Union
+
+__all__ = ["JsonCodec", "UJsonCodec", "OrJsonCodec", "JSON_CODECS", "get_json_codec"]
+
+
+class JsonCodec:
+    """Standard library codec, also the fallback of the faster ones for values they reject."""
+
+    name = 'json'
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class UJsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self.ujson = ujson
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return self.ujson.dumps(obj, ensure_ascii=False).encode()
+        except OverflowError:  # integers beyond 64 bits
+            return super().dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            # precise_float: amounts are floats (ex. bitcoind), the default parser rounds them
+            return self.ujson.loads(data, precise_float=True)
+        except (ValueError, OverflowError):
+            return super().loads(data)
+
+
+# a number of 20+ digits (19+ if negative), it may not fit in 64 bits
+BIG_INT_PATTERN = rb'(?:^|[\[:,])\s*(?:-\d{19}|\d{20})'
+
+
+class OrJsonCodec(JsonCodec):
+    """
+    Fastest codec. It decodes integers beyond 64 bits as floats without any error, documents which may
+    contain one are decoded by the standard library instead.
+    """
+
+    name = 'orjson'
+    big_int_bytes = re.compile(BIG_INT_PATTERN)
+    big_int_str = re.compile(BIG_INT_PATTERN.decode())
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return self.orjson.dumps(obj)
+        except TypeError:  # integers beyond 64 bits
+            return super().dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        big_int = self.big_int_str if isinstance(data, str) else self.big_int_bytes
+        if big_int.search(data) is not None:
+            return super().loads(data)
+
+        try:
+            return self.orjson.loads(data)
+        except ValueError:
+            return super().loads(data)
+
+
+JSON_CODECS = {
+    JsonCodec.name: JsonCodec,
+    UJsonCodec.name: UJsonCodec,
+    OrJsonCodec.name: OrJsonCodec,
+}
+
+
+def get_json_codec(name: str = 'auto') -> JsonCodec:
+    """Codec by name, `auto` picks the fastest one installed (orjson, ujson, then json)."""
+    if name == 'auto':
+        for codec_cls in (OrJsonCodec, UJsonCodec):
+            try:
+                return codec_cls()
+            except ImportError:
+                pass
+
+        return JsonCodec()
+
+    try:
+        codec_cls = JSON_CODECS[name]
+    except KeyError:
+        raise ValueError(f'unknown json codec {name!r}, expected auto or one of {", ".join(JSON_CODECS)}') from None
+
+    return codec_cls()
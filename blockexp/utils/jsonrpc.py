@@ -1,18 +1,21 @@
 from __future__ import annotations
 
 import asyncio
+import json
+import os
+import random
+import time
 from dataclasses import dataclass
 from http import HTTPStatus
-from json import JSONDecodeError
-from typing import Any, Optional, Union, List, Callable
+from typing import Any, Optional, Union, List, Callable, Dict, Tuple
 
-import requests_async as requests
+import http3
 import websockets
 from h11 import RemoteProtocolError
+from http3.exceptions import NotConnected
 from requests.auth import HTTPBasicAuth
-from requests.exceptions import ConnectionError as RequestsConnectionError
-from requests_async import Response
 
+from .jsoncodec import JsonCodec, get_json_codec
 from .url import get_scheme, parse_url
 
 
@@ -30,9 +33,9 @@ class JSONRPCUnauthorized(JSONRPCException):
 
 class JSONRPCInvalidResponse(JSONRPCException):
     message: str
-    response: Response
+    response: http3.AsyncResponse
 
-    def __init__(self, message: str, response: Response):
+    def __init__(self, message: str, response: http3.AsyncResponse):
         super().__init__(message)
         self.message = message
         self.response = response
@@ -86,6 +89,10 @@ class JsonRpcRequest:
         }
 
 
+def jsonrpc20_batch(reqs: List[JsonRpcRequest], *, start_id: int = 0) -> List[dict]:
+    return [req.build(start_id + idx) for idx, req in enumerate(reqs)]
+
+
 @dataclass(init=False)
 class JsonRpcResponse:
     id: Optional[int] = None
@@ -126,7 +133,49 @@ def parse_data(data: dict) -> Union[JsonRpcRequest, JsonRpcResponse]:
         raise ValueError
 
 
+def parse_batch_data(data: Any, ids: List[int]) -> List[JsonRpcResponse]:
+    if isinstance(data, dict):
+        # the whole batch was rejected (ex. parse error or unsupported batch)
+        resp = parse_data(data)
+        if isinstance(resp, JsonRpcResponse) and resp.error is not None:
+            raise resp.error
+
+        raise ValueError
+
+    if not isinstance(data, list):
+        raise TypeError
+
+    responses = {}
+    for item in data:
+        resp = parse_data(item)
+        if not isinstance(resp, JsonRpcResponse):
+            raise ValueError
+
+        responses[resp.id] = resp
+
+    missing_ids = [id for id in ids if id not in responses]
+    if missing_ids:
+        raise KeyError(missing_ids)
+
+    return [responses[id] for id in ids]
+
+
+def unwrap_batch_results(responses: List[JsonRpcResponse], *, return_exceptions: bool) -> List[Any]:
+    results = []
+    for resp in responses:
+        if resp.error is None:
+            results.append(resp.result)
+        elif return_exceptions:
+            results.append(resp.error)
+        else:
+            raise resp.error
+
+    return results
+
+
 class AsyncTunnel:
+    max_batch_size: int = 1000
+
     async def connect(self):
         raise NotImplementedError
 
@@ -158,62 +207,173 @@ class AsyncTunnel:
     async def call(self, method: str, *args, **kwargs) -> Any:
         raise NotImplementedError
 
-    async def batch(self, reqs: List[JsonRpcRequest]) -> List[Any]:
+    async def batch(self, reqs: List[JsonRpcRequest], *, return_exceptions: bool = False) -> List[Any]:
+        """
+        Send requests as JSON-RPC 2.0 batches of at most `max_batch_size` items.
+
+        Results are returned in the order of `reqs`. When `return_exceptions` is true,
+        failed items are returned as JSONRPCError instead of raising the first one.
+        """
+        responses = []
+        for offset in range(0, len(reqs), self.max_batch_size):
+            responses += await self.batch_call(reqs[offset:offset + self.max_batch_size])
+
+        return unwrap_batch_results(responses, return_exceptions=return_exceptions)
+
+    async def batch_call(self, reqs: List[JsonRpcRequest]) -> List[JsonRpcResponse]:
         raise NotImplementedError
 
     async def event(self, method: str, callback: Callable):
         raise NotImplementedError
 
 
-class AsyncRequestsTunnel(AsyncTunnel):
-    session: Optional[requests.Session]
+@dataclass
+class RpcMethodStats:
+    url: str
+    method: str  # `batch:<method>` for batches of one method, `batch` for mixed ones
+    requests: int = 0
+    calls: int = 0  # JSON-RPC calls, the items of batches
+    errors: int = 0
+    retries: int = 0
+    seconds: float = 0
+    maxSeconds: float = 0
+    sentBytes: int = 0
+    receivedBytes: int = 0
+
+
+class RpcStats:
+    """Process-wide latency and byte counters of the HTTP tunnels, per (url, method)."""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], RpcMethodStats] = {}
+
+    def get(self, url: str, method: str) -> RpcMethodStats:
+        stats = self._stats.get((url, method))
+        if stats is None:
+            stats = self._stats[url, method] = RpcMethodStats(url, method)
+
+        return stats
+
+    def all(self) -> List[RpcMethodStats]:
+        return list(self._stats.values())
+
+    def clear(self):
+        self._stats.clear()
+
+
+RPC_STATS = RpcStats()
 
-    def __init__(self, url: str):
-        self.url, self.auth = parse_url(url)
-        self.session = None
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=RPC_STATS.clear)
+
+
+def batch_method(reqs: List[JsonRpcRequest]) -> str:
+    methods = {req.method for req in reqs}
+    return f'batch:{methods.pop()}' if len(methods) == 1 else 'batch'
+
+
+class AsyncRequestsTunnel(AsyncTunnel):
+    """
+    JSON-RPC over HTTP(S) with a persistent connection pool.
+
+    At most `max_connections` requests are in flight, `keepalive_connections` idle connections stay
+    open between calls. HTTP/2 is negotiated on https when the node supports it; plain http is
+    HTTP/1.1, one request per connection at a time (no pipelining).
+
+    Connection failures are retried `retries` times, after a random delay of up to `retry_delay`
+    seconds, doubled after each failure up to `max_retry_delay`. `timeout` bounds reading a
+    response (no limit by default, `getblock` of large blocks can be slow).
+    """
+
+    client: Optional[http3.AsyncClient]
+
+    RETRY_ERRORS = (RemoteProtocolError, NotConnected, http3.ProtocolError, http3.ConnectTimeout,
+                    http3.PoolTimeout, OSError)
+
+    def __init__(self, url: str, *, max_connections: int = 100, keepalive_connections: int = 10,
+                 connect_timeout: Optional[float] = 10, timeout: Optional[float] = None, retries: int = 4,
+                 retry_delay: float = 0.5, max_retry_delay: float = 10, json_codec: Union[str, JsonCodec] = 'auto'):
+        self.url, auth = parse_url(url)
+        self.auth = (auth.username, auth.password) if auth is not None else None
+        # idle connections hold a slot of `max_connections`, requests waiting for a slot never reuse them
+        keepalive_connections = min(keepalive_connections, max_connections - 1)
+        self.pool_limits = http3.PoolLimits(soft_limit=keepalive_connections, hard_limit=max_connections)
+        self.timeout = http3.TimeoutConfig(connect_timeout=connect_timeout, read_timeout=timeout,
+                                           write_timeout=timeout)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.codec = get_json_codec(json_codec) if isinstance(json_codec, str) else json_codec
+        self.client = None
 
     async def connect(self):
-        self.session = requests.Session()
+        self.client = http3.AsyncClient(auth=self.auth, timeout=self.timeout, pool_limits=self.pool_limits)
 
     async def close(self):
-        await self.session.close()
-        self.session = None
+        await self.client.close()
+        self.client = None
 
     @property
     def closed(self) -> bool:
-        return self.session is None
+        return self.client is None
 
-    async def call(self, method, *args, **kwargs) -> Any:
+    def get_retry_delay(self, failures: int) -> float:
+        return random.uniform(0, min(self.max_retry_delay, self.retry_delay * 2 ** failures))
+
+    async def post(self, method: str, data: Union[dict, list], calls: int = 1) -> http3.AsyncResponse:
         assert not self.closed
 
-        data = jsonrpc20_call(0, method, args, kwargs)
-        response: Optional[Response] = None
-
-        for repeat in range(5):
-            try:
-                response = await self.session.post(
-                    self.url,
-                    json=data,
-                    auth=self.auth,
-                )
-            except (RemoteProtocolError, RequestsConnectionError) as e:
-                if repeat >= 4:
-                    raise JSONRPCConnectionError from e
-
-                await asyncio.sleep(0.5)
-                continue
-            else:
-                break
+        body = self.codec.dumps(data)
+        stats = RPC_STATS.get(self.url, method)
+        stats.requests += 1
+        stats.calls += calls
+        started = time.monotonic()
+
+        try:
+            for failures in range(self.retries + 1):
+                stats.sentBytes += len(body)
+                try:
+                    response = await self.client.post(
+                        self.url,
+                        data=body,
+                        headers={'Content-Type': 'application/json'},
+                    )
+                except self.RETRY_ERRORS as e:
+                    if failures >= self.retries:
+                        raise JSONRPCConnectionError from e
+
+                    stats.retries += 1
+                    await asyncio.sleep(self.get_retry_delay(failures))
+                else:
+                    break
+        except BaseException:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            stats.seconds += elapsed
+            stats.maxSeconds = max(stats.maxSeconds, elapsed)
+
+        stats.receivedBytes += len(response.content)
 
         # 401 error code
         if response.status_code == HTTPStatus.UNAUTHORIZED:
+            stats.errors += 1
             raise JSONRPCUnauthorized('Unauthorized error')
 
+        return response
+
+    def decode(self, response: http3.AsyncResponse) -> Any:
         try:
-            data = response.json()
-        except JSONDecodeError as e:
+            return self.codec.loads(response.content)
+        except ValueError as e:
             raise JSONRPCInvalidResponse('invalid json', response=response) from e
 
+    async def call(self, method, *args, **kwargs) -> Any:
+        data = jsonrpc20_call(0, method, args, kwargs)
+        response = await self.post(method, data)
+        data = self.decode(response)
+
         resp = parse_data(data)
         if not isinstance(resp, JsonRpcResponse):
             raise JSONRPCInvalidResponse('invalid jsonrpc response', response=response)
@@ -226,8 +386,18 @@ class AsyncRequestsTunnel(AsyncTunnel):
 
         return resp.result
 
-    async def batch(self, reqs: List[JsonRpcRequest]) -> List[Any]:
-        raise NotImplementedError
+    async def batch_call(self, reqs: List[JsonRpcRequest]) -> List[JsonRpcResponse]:
+        if not reqs:
+            return []
+
+        payload = jsonrpc20_batch(reqs)
+        response = await self.post(batch_method(reqs), payload, len(reqs))
+        data = self.decode(response)
+
+        try:
+            return parse_batch_data(data, [item['id'] for item in payload])
+        except (TypeError, ValueError, KeyError) as e:
+            raise JSONRPCInvalidResponse('invalid jsonrpc batch response', response=response) from e
 
     async def event(self, method: str, callback: Callable):
         raise NotImplementedError
@@ -299,6 +469,15 @@ class AsyncWebsocketTunnel(AsyncTunnel):
             raise
 
     async def process_data(self, data):
+        if isinstance(data, (str, bytes)):
+            data = json.loads(data)
+
+        if isinstance(data, list):
+            for item in data:
+                await self.process_data(item)
+
+            return
+
         resp = parse_data(data)
         if isinstance(resp, JsonRpcRequest):
             func = self._events.get(resp.method)
@@ -309,11 +488,9 @@ class AsyncWebsocketTunnel(AsyncTunnel):
             else:
                 pass  # TODO: error
         elif isinstance(resp, JsonRpcResponse):
-            future: Optional[asyncio.Future] = self._results.get(resp.id)
-            if resp.error is not None:
-                future.set_exception(resp.error)
-            else:
-                future.set_result(resp.result)
+            future: Optional[asyncio.Future] = self._results.pop(resp.id, None)
+            if future is not None and not future.done():
+                future.set_result(resp)
         else:
             assert False
 
@@ -326,12 +503,25 @@ class AsyncWebsocketTunnel(AsyncTunnel):
         data = jsonrpc20_call(result_id, method, args, kwargs)
 
         future = self.on_result(result_id)
-        await self.socket.send(data)
+        await self.socket.send(json.dumps(data))
 
-        return await future
+        resp: JsonRpcResponse = await future
+        if resp.error is not None:
+            raise resp.error
 
-    async def batch(self, reqs: List[JsonRpcRequest]) -> List[Any]:
-        raise NotImplementedError
+        return resp.result
+
+    async def batch_call(self, reqs: List[JsonRpcRequest]) -> List[JsonRpcResponse]:
+        if not reqs:
+            return []
+
+        payload = jsonrpc20_batch(reqs, start_id=self._id + 1)
+        self._id += len(payload)
+
+        futures = [self.on_result(item['id']) for item in payload]
+        await self.socket.send(json.dumps(payload))
+
+        return list(await asyncio.gather(*futures))
 
     async def event(self, method: str, callback: Callable):
         self._events[method] = callback
@@ -348,14 +538,18 @@ class AsyncJsonRPC(AsyncTunnel):
         "wss": AsyncWebsocketTunnel,
     }
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, **options):
         self.url = url
-        self.tunnel = self.build_tunnel(url)
+        self.tunnel = self.build_tunnel(url, **options)
 
     @classmethod
-    def build_tunnel(cls, url: str):
+    def build_tunnel(cls, url: str, **options):
+        """`options` (connection pool, retries, json codec) apply to the HTTP tunnel only."""
         scheme = get_scheme(url)
         tunnel_cls = cls.SCHEME_TUNNELS[scheme]
+        if issubclass(tunnel_cls, AsyncRequestsTunnel):
+            return tunnel_cls(url, **options)
+
         return tunnel_cls(url)
 
     async def connect(self):
@@ -371,8 +565,8 @@ class AsyncJsonRPC(AsyncTunnel):
     async def call(self, method: str, *args, **kwargs) -> Any:
         return await self.tunnel.call(method, *args, **kwargs)
 
-    async def batch(self, reqs: List[JsonRpcRequest]) -> List[Any]:
-        return await self.tunnel.batch(reqs)
+    async def batch(self, reqs: List[JsonRpcRequest], *, return_exceptions: bool = False) -> List[Any]:
+        return await self.tunnel.batch(reqs, return_exceptions=return_exceptions)
 
     async def event(self, method: str, callback: Callable):
         return self.tunnel.event(method, callback)
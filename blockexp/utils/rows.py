@@ -0,0 +1,108 @@
+"""
+Compiled row builders.
+
+`dataclasses.asdict` deep-copies every value. A row builder is generated once per dataclass from its
+fields instead: it reads the attributes directly, converts nested dataclasses to dicts (like `asdict`)
+and shares every other value (strings, numbers, lists of scalars, JSON dicts) with the object.
+"""
+
+import dataclasses
+import typing
+from typing import Any, Callable, Dict, FrozenSet, Type
+
+__all__ = ["RowBuilder", "ROW_EXCLUDED_FIELDS", "get_row_builder", "get_dict_builder", "compile_row_builder"]
+
+RowBuilder = Callable[[Any], dict]
+
+ROW_EXCLUDED_FIELDS = frozenset(('_id', '_raw', 'chain', 'network'))
+
+SCALAR_TYPES = frozenset((str, int, float, bool, bytes, type(None)))
+
+CONTAINER_TYPES = (list, tuple, set, frozenset, object)
+
+_ROW_BUILDERS: Dict[type, RowBuilder] = {}
+_DICT_BUILDERS: Dict[type, RowBuilder] = {}
+
+
+def get_row_builder(cls: Type) -> RowBuilder:
+    """Builder of the Mongo document of `cls` (without `ROW_EXCLUDED_FIELDS`)."""
+    builder = _ROW_BUILDERS.get(cls)
+    if builder is None:
+        builder = _ROW_BUILDERS[cls] = compile_row_builder(cls, ROW_EXCLUDED_FIELDS)
+
+    return builder
+
+
+def get_dict_builder(cls: Type) -> RowBuilder:
+    """Builder used for nested dataclasses, it keeps every field like `asdict`."""
+    builder = _DICT_BUILDERS.get(cls)
+    if builder is None:
+        builder = _DICT_BUILDERS[cls] = compile_row_builder(cls)
+
+    return builder
+
+
+def convert_value(value):
+    cls = type(value)
+    if cls in SCALAR_TYPES:
+        return value
+
+    builder = _DICT_BUILDERS.get(cls)
+    if builder is not None:
+        return builder(value)
+    elif dataclasses.is_dataclass(cls):
+        return get_dict_builder(cls)(value)
+    elif cls is list:
+        return [convert_value(item) for item in value]
+    elif isinstance(value, (list, tuple)) and not hasattr(value, '_fields'):
+        return cls(convert_value(item) for item in value)
+    elif isinstance(value, dict):
+        return cls((convert_value(key), convert_value(item)) for key, item in value.items())
+
+    return value
+
+
+def _may_hold_dataclass(hint) -> bool:
+    if hint is Any or isinstance(hint, typing.TypeVar):
+        return True
+
+    origin = getattr(hint, '__origin__', None)
+    if origin is not None:  # List[...], Union[...], Dict[...]
+        return any(_may_hold_dataclass(arg) for arg in getattr(hint, '__args__', None) or (Any,))
+    elif not isinstance(hint, type):
+        return True
+
+    # bare `dict` fields hold decoded JSON (ex. `_raw`), they are shared as is
+    return dataclasses.is_dataclass(hint) or hint in CONTAINER_TYPES
+
+
+def compile_row_builder(cls: Type, exclude: FrozenSet[str] = frozenset()) -> RowBuilder:
+    if not dataclasses.is_dataclass(cls) or not isinstance(cls, type):
+        raise TypeError(f'dataclass type expected: {cls!r}')
+
+    try:
+        hints = typing.get_type_hints(cls)
+    except Exception:
+        hints = {}
+
+    items = []
+    # noinspection PyDataclass
+    for field in dataclasses.fields(cls):
+        name = field.name
+        if name in exclude:
+            continue
+
+        if _may_hold_dataclass(hints.get(name, Any)):
+            items.append(f'{name!r}: convert_value(obj.{name})')
+        else:
+            items.append(f'{name!r}: obj.{name}')
+
+    func_name = f'build_{cls.__name__}'
+    source = f'def {func_name}(obj):\n    return {{{", ".join(items)}}}\n'
+
+    namespace = {'convert_value': convert_value}
+    exec(compile(source, f'<row builder {cls.__qualname__}>', 'exec'), namespace)
+
+    builder = namespace[func_name]
+    builder.__qualname__ = func_name
+    return builder
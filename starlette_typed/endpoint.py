@@ -1,24 +1,27 @@
 import functools
 import inspect
+import json
 import sys
 import typing
 from asyncio import iscoroutinefunction
 from collections import defaultdict
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, AsyncExitStack
 from dataclasses import dataclass, field, is_dataclass
 from http import HTTPStatus
 from inspect import Parameter
 from traceback import TracebackException
-from typing import Any, Tuple, Optional, Callable, Type, Dict, TypeVar, Set, List, get_type_hints, cast
+from typing import Any, Tuple, Optional, Callable, Type, Dict, TypeVar, Set, List, get_type_hints, cast, \
+    AsyncIterable, AsyncIterator, Iterable, Union
 
 import typing_inspect
 from datetime import datetime, timedelta
 from requests import Request
 from starlette.exceptions import HTTPException
 from starlette.requests import Request
-from starlette.responses import Response, JSONResponse, PlainTextResponse
+from starlette.responses import Response, JSONResponse, PlainTextResponse, StreamingResponse
 
 from .marshmallow import build_schema, Schema
+from .serializer import Serializer, get_serializer
 
 ExtraHandler = Callable[[Request], Any]
 
@@ -26,6 +29,14 @@ EXTRA_HANDLERS: Dict[str, Dict[str, Callable]] = defaultdict(dict)
 
 T = TypeVar('T')
 
+CONTENT_NDJSON = "application/x-ndjson"
+
+STREAM_NDJSON = "ndjson"
+STREAM_JSON = "json"
+STREAM_FORMATS = {STREAM_NDJSON, STREAM_JSON}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 @dataclass
 class Description:
@@ -39,6 +50,8 @@ class Description:
     input_body: Optional[Schema] = None
     output: Optional[Type[Response]] = None
     output_body: Optional[Schema] = None
+    output_item_body: Optional[Schema] = None
+    output_serializer: Optional[Serializer] = None
     output_body_cls: Optional[Type] = None
     output_body_many: Optional[bool] = None
     output_type: Optional[Type] = None
@@ -166,6 +179,9 @@ def fill_description(view_func: Callable, description: Description):
             if is_dataclass(return_annotation):
                 return_schema = build_schema(return_annotation, is_nested=True, many=many)
                 description.output_body = return_schema
+                if many:
+                    description.output_item_body = build_schema(return_annotation, is_nested=True, many=False)
+                description.output_serializer = get_serializer(return_annotation)
                 description.output_body_cls = return_annotation
                 description.output_body_many = many
             else:
@@ -201,11 +217,18 @@ def build_new_view_func(view_func: Callable, description: Description):
     async def view_func(request: Request):
         try:
             kwargs = await parse_request(request, description)
-            async with with_fixtures(request, description) as fixtures:
+            async with AsyncExitStack() as stack:
+                fixtures = await stack.enter_async_context(with_fixtures(request, description))
                 kwargs.update(fixtures)
 
                 raw_response = await func(request, **kwargs)
-                response = build_response(raw_response, description)
+
+                stream_format = get_stream_format(request)
+                if stream_format is not None and description.output_item_body is not None:
+                    # fixtures (ex. database session) are released once the stream is finished
+                    response = build_stream_response(raw_response, description, stream_format, stack.pop_all())
+                else:
+                    response = build_response(raw_response, description)
         except HTTPException:
             raise
         except Exception as exc:
@@ -267,6 +290,10 @@ def build_response(result: Any, description: Description) -> Response:
         else:
             assert isinstance(result, description.output)
             return result
+    elif description.output_serializer is not None:
+        serialize = description.output_serializer
+        content = [serialize(item) for item in result] if description.output_body_many else serialize(result)
+        return Response(render_json(content), media_type=JSONResponse.media_type)
     elif description.output_body is not None:
         return JSONResponse(description.output_body.dump(result))
     elif description.output_type is not None:
@@ -276,6 +303,90 @@ def build_response(result: Any, description: Description) -> Response:
     return result
 
 
+def get_stream_format(request: Request) -> Optional[str]:
+    """Streaming is opt-in with `?stream=ndjson|json` or `Accept: application/x-ndjson`."""
+    stream_format = request.query_params.get('stream')
+    if stream_format in STREAM_FORMATS:
+        return stream_format
+
+    if CONTENT_NDJSON in request.headers.get('accept', ''):
+        return STREAM_NDJSON
+
+    return None
+
+
+def is_stream_request(request: Request) -> bool:
+    return get_stream_format(request) is not None
+
+
+def render_json(content: Any) -> bytes:
+    # same encoding as starlette.responses.JSONResponse.render
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+async def iter_items(result: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if isinstance(result, AsyncIterable):
+        async for item in result:
+            yield item
+    else:
+        for item in result:
+            yield item
+
+
+async def iter_stream_chunks(result: Union[Iterable, AsyncIterable],
+                             description: Description,
+                             stream_format: str,
+                             stack: AsyncExitStack) -> AsyncIterator[bytes]:
+    serialize = description.output_serializer
+    is_ndjson = stream_format == STREAM_NDJSON
+
+    async with stack:
+        chunks = [] if is_ndjson else [b"["]
+        size = 0
+        first = True
+
+        async for item in iter_items(result):
+            chunk = render_json(serialize(item))
+            if is_ndjson:
+                chunks.append(chunk)
+                chunks.append(b"\n")
+            else:
+                if not first:
+                    chunks.append(b",")
+
+                chunks.append(chunk)
+
+            first = False
+            size += len(chunk) + 1
+            if size >= STREAM_CHUNK_SIZE:
+                yield b"".join(chunks)
+                chunks.clear()
+                size = 0
+
+        if not is_ndjson:
+            chunks.append(b"]")
+
+        if chunks:
+            yield b"".join(chunks)
+
+
+def build_stream_response(result: Union[Iterable, AsyncIterable],
+                          description: Description,
+                          stream_format: str,
+                          stack: AsyncExitStack) -> Response:
+    media_type = CONTENT_NDJSON if stream_format == STREAM_NDJSON else JSONResponse.media_type
+    return StreamingResponse(
+        iter_stream_chunks(result, description, stream_format, stack),
+        media_type=media_type,
+    )
+
+
 def build_error(request: Request, exc: Exception) -> Response:
     tbe = TracebackException.from_exception(exc)
 
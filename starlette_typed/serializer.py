@@ -0,0 +1,193 @@
+"""
+Compiled dump functions for dataclasses.
+
+A serializer is generated once per dataclass from the same type hints `marshmallow.parse_dataclass`
+uses, and produces exactly what `build_schema(cls).dump(obj)` would, without going through
+marshmallow's per-field machinery.
+"""
+
+import dataclasses
+import datetime
+import enum
+import typing
+from weakref import WeakKeyDictionary
+
+import marshmallow
+import typing_inspect
+from marshmallow import fields as mm_fields
+
+from .marshmallow import parse_type, unwrap_optional
+
+__all__ = ['Serializer', 'get_serializer', 'compile_serializer']
+
+Serializer = typing.Callable[[typing.Any], typing.Any]
+
+SERIALIZER_MAPPING = WeakKeyDictionary()
+
+_TRUTHY = mm_fields.Boolean.truthy
+_FALSY = mm_fields.Boolean.falsy
+
+
+def get_serializer(cls: typing.Type) -> Serializer:
+    serializer = SERIALIZER_MAPPING.get(cls)
+    if serializer is None:
+        serializer = SERIALIZER_MAPPING[cls] = compile_serializer(cls)
+
+    return serializer
+
+
+def _identity(value):
+    return value
+
+
+def _serialize_str(value):
+    # marshmallow.utils.ensure_text_type
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+
+    return str(value)
+
+
+def _serialize_bool(value):
+    if value in _TRUTHY:
+        return True
+    elif value in _FALSY:
+        return False
+
+    return bool(value)
+
+
+def _serialize_isoformat(value):
+    return value.isoformat()
+
+
+def _serialize_enum(value):
+    return value.name
+
+
+SIMPLE_SERIALIZERS = {
+    str: _serialize_str,
+    bytes: _serialize_str,
+    int: int,
+    float: float,
+    bool: _serialize_bool,
+    datetime.datetime: _serialize_isoformat,
+    datetime.date: _serialize_isoformat,
+}
+
+
+def _list_serializer(serialize: Serializer) -> Serializer:
+    def serialize_list(value):
+        return [None if item is None else serialize(item) for item in value]
+
+    return serialize_list
+
+
+def _mapping_serializer(serialize_key: Serializer, serialize_value: Serializer) -> Serializer:
+    def serialize_mapping(value):
+        return {
+            None if key is None else serialize_key(key): None if item is None else serialize_value(item)
+            for key, item in value.items()
+        }
+
+    return serialize_mapping
+
+
+def _field_serializer(mm_field: mm_fields.Field) -> Serializer:
+    def serialize_field(value):
+        return mm_field._serialize(value, None, None)
+
+    return serialize_field
+
+
+def compile_type(cls: typing.Type, metadata: typing.Optional[dict] = None) -> Serializer:
+    """Return a function serializing a non-None value of `cls`, mirroring `marshmallow.parse_type`."""
+    try:
+        # noinspection PyUnresolvedReferences
+        cls = cls.__supertype__
+    except AttributeError:
+        pass
+
+    if metadata is not None and 'marshmallow_field' in metadata:
+        return _field_serializer(metadata['marshmallow_field'])
+    elif typing_inspect.is_generic_type(cls):
+        origin = typing_inspect.get_origin(cls)
+        if origin in (typing.List, list, typing.Set, set):
+            tt, = typing_inspect.get_args(cls)
+            return _list_serializer(compile_type(tt))
+        elif origin in (typing.Dict, dict):
+            tk, tv = typing_inspect.get_args(cls)
+            return _mapping_serializer(compile_type(tk), compile_type(tv))
+        else:
+            raise TypeError(f'invalid type: {cls!r}')
+    elif typing_inspect.is_optional_type(cls):
+        return compile_type(unwrap_optional(cls))
+    elif dataclasses.is_dataclass(cls):
+        return get_serializer(cls)
+    elif type(cls) is enum.EnumMeta:
+        return _serialize_enum
+    elif isinstance(cls, type) and (cls == dict or issubclass(cls, dict)):
+        return _identity
+    elif cls == typing.Any:
+        return _identity
+
+    serializer = SIMPLE_SERIALIZERS.get(cls)
+    if serializer is None:
+        # uncommon field types (ex. UUID, Decimal) keep using marshmallow
+        serializer = _field_serializer(parse_type(cls))
+
+    return serializer
+
+
+def _get_default(dc_field: dataclasses.Field, cls: typing.Type):
+    # same as `marshmallow.update_missing`, Optional fields without a default dump None
+    metadata = dc_field.metadata
+    if 'marshmallow_field' in metadata:
+        return metadata['marshmallow_field'].default
+    elif 'default' in metadata:
+        return metadata['default']
+    elif dc_field.default_factory is not dataclasses.MISSING:
+        return dc_field.default_factory
+    elif dc_field.default is not dataclasses.MISSING:
+        return dc_field.default
+    elif typing_inspect.is_optional_type(getattr(cls, '__supertype__', cls)):
+        return None
+
+    return marshmallow.missing
+
+
+def compile_serializer(cls: typing.Type) -> Serializer:
+    if not dataclasses.is_dataclass(cls):
+        raise TypeError
+
+    hints = typing.get_type_hints(cls)
+    missing = marshmallow.missing
+
+    fields = []
+    # noinspection PyDataclass
+    for dc_field in dataclasses.fields(cls):
+        name = dc_field.name
+        fields.append((
+            name,
+            name.rstrip('_') if name.endswith('_') else name,  # same as parse_dataclass.make_object
+            compile_type(hints[name], dict(dc_field.metadata)),
+            _get_default(dc_field, hints[name]),
+        ))
+
+    def serialize(obj) -> dict:
+        is_mapping = isinstance(obj, dict)
+        result = {}
+
+        for name, key, serialize_value, default in fields:
+            value = obj.get(name, missing) if is_mapping else getattr(obj, name, missing)
+            if value is missing:
+                value = default() if callable(default) else default
+                if value is missing:
+                    continue
+
+            result[key] = None if value is None else serialize_value(value)
+
+        return result
+
+    serialize.__qualname__ = f'serialize_{cls.__name__}'
+    return serialize
@@ -0,0 +1,675 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import struct
+from collections import defaultdict
+from datetime import datetime
+from importlib.util import find_spec
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pytest
+from pymongo import DESCENDING, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+pytest.importorskip('bitcoin')  # python-bitcoinlib, the `binary` extra
+
+from blockexp.blockchain.btc.accessor import BtcDaemonAccessor
+from blockexp.blockchain.btc.decoder import BtcBlockRows, build_block_rows
+from blockexp.blockchain.btc.importer import BtcDaemonImporter
+from blockexp.blockchain.btc.provider import BtcMongoProvider
+from blockexp.blockchain.btc.utils.address import AddressEncoder, script_to_asm
+from blockexp.blockchain.btc.utils.deserialize import decode_block, decode_transaction
+from blockexp.blockchain.utils.sync import SyncPhase
+from blockexp.model import AddressSummary, Block
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+# mainnet blocks as `getblock <hash> 2` reports them, with a few of their transactions:
+# 722010: segwit coinbase, p2sh and p2wsh multisig spends, taproot key spends and outputs, nulldata,
+#         an ALL|ANYONECANPAY signature
+# 330000: bare 1-of-2 multisig outputs with invalid keys (counterparty), nonstandard for bitcoind
+BLOCK_HEIGHTS = [722010, 330000]
+
+# computed over all the transactions of the block, not only the ones kept in the fixture
+FULL_BLOCK_KEYS = {'tx', 'size', 'strippedsize', 'weight', 'nTx'}
+
+MAINNET = AddressEncoder.for_network('mainnet')
+ACCESSOR = BtcDaemonAccessor('BTC', 'mainnet', 'http://localhost:8332')  # never connected
+
+
+def load_block(height: int) -> dict:
+    with open(os.path.join(DATA_DIR, f'btc_block_{height}.json')) as fp:
+        return json.load(fp)
+
+
+def serialize_block(block: dict) -> bytes:
+    header = struct.pack('<i32s32sIII', block['version'], bytes.fromhex(block['previousblockhash'])[::-1],
+                         bytes.fromhex(block['merkleroot'])[::-1], block['time'], int(block['bits'], 16),
+                         block['nonce'])
+    assert hashlib.sha256(hashlib.sha256(header).digest()).digest()[::-1].hex() == block['hash']
+
+    return header + bytes([len(block['tx'])]) + b''.join(bytes.fromhex(tx['hex']) for tx in block['tx'])
+
+
+@pytest.mark.parametrize('height', BLOCK_HEIGHTS)
+def test_decode_block(height: int):
+    block = load_block(height)
+    decoded = decode_block(serialize_block(block), height, MAINNET)
+
+    for key, value in block.items():
+        if key not in FULL_BLOCK_KEYS:
+            assert decoded[key] == value, key
+
+    assert len(decoded['tx']) == len(block['tx'])
+    for decoded_tx, tx in zip(decoded['tx'], block['tx']):
+        for key, value in tx.items():
+            assert decoded_tx[key] == value, (tx['txid'], key)
+
+        assert set(decoded_tx) == set(tx)
+
+
+@pytest.mark.parametrize('height', BLOCK_HEIGHTS)
+def test_decode_transaction(height: int):
+    for tx in load_block(height)['tx']:
+        assert decode_transaction(bytes.fromhex(tx['hex']), MAINNET) == tx
+
+
+def test_classify_multisig():
+    pubkey = bytes.fromhex('02a4c87fece0fad476ab5b230d9d68e1e0b86f51fb9a89a06695172989d82c1b92')
+
+    script = bytes([0x51, len(pubkey)]) + pubkey + bytes([0x51, 0xae])  # 1 <pubkey> 1 OP_CHECKMULTISIG
+    assert MAINNET.classify(script) == ('multisig', 1, ['1Es1BQJvATSKiC1Hx6yXJbZ28BRMJZxn8a'])
+
+    script = bytes([0x52, len(pubkey)]) + pubkey + bytes([0x51, 0xae])  # 2 of 1
+    assert MAINNET.classify(script) == ('nonstandard', None, None)
+
+
+def test_script_to_asm_sighash():
+    block = load_block(722010)
+    script_sig = bytes.fromhex(block['tx'][1]['vin'][0]['scriptSig']['hex'])
+    signature, pubkey = block['tx'][1]['vin'][0]['scriptSig']['asm'].split()
+
+    assert signature.endswith('[ALL|ANYONECANPAY]')
+    assert script_to_asm(script_sig) == f'{signature[:-len("[ALL|ANYONECANPAY]")]}81 {pubkey}'
+
+    # data pushed after OP_RETURN is never decoded as a signature
+    nulldata = b'\x6a' + script_sig
+    assert '[' not in script_to_asm(nulldata, True)
+
+
+class FakeRawCollection:
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+
+    def _find(self, query: dict) -> List[dict]:
+        return [dict(row) for row in self.rows if all(row.get(key) == value for key, value in query.items())]
+
+    async def fetch_one(self, query: dict) -> Optional[dict]:
+        rows = self._find(query)
+        return rows[0] if rows else None
+
+    async def find(self, query: dict):
+        for row in self._find(query):
+            yield row
+
+
+class FakeRawDatabase:
+    def __init__(self, rows: BtcBlockRows):
+        self.raw_block_collection = FakeRawCollection([rows.raw_block_row])
+        self.raw_tx_collection = FakeRawCollection(rows.raw_tx_rows)
+
+
+def store_block(block: dict, raw_storage: str) -> BtcBlockRows:
+    raw_block = ACCESSOR.load_block_data({**copy.deepcopy(block), 'nTx': len(block['tx']), 'confirmations': None,
+                                          'mediantime': None, 'chainwork': None, 'nextblockhash': None})
+    return build_block_rows(ACCESSOR, raw_block, raw_storage)
+
+
+@pytest.mark.parametrize('raw_storage', [
+    'hex',
+    'zlib',
+    pytest.param('zstd', marks=pytest.mark.skipif(find_spec('zstandard') is None, reason='zstd extra')),
+])
+def test_raw_storage_round_trip(raw_storage: str):
+    block = load_block(722010)
+    verbose_rows = store_block(block, 'verbose')
+    rows = store_block(block, raw_storage)
+
+    assert rows.raw_block_row['tx'] == [tx['txid'] for tx in block['tx']]
+    for raw_tx_row in rows.raw_tx_rows:
+        assert raw_tx_row['_encoding'] == raw_storage
+        assert 'vin' not in raw_tx_row
+
+    provider = BtcMongoProvider('BTC', 'mainnet', FakeRawDatabase(rows), ACCESSOR)
+    raw_block = asyncio.run(provider.get_raw_block(block['hash']))
+
+    assert raw_block.pop('tx') == verbose_rows.raw_tx_rows
+    assert raw_block == {key: value for key, value in verbose_rows.raw_block_row.items() if key != 'tx'}
+
+
+def matches(row: dict, query: Optional[dict]) -> bool:
+    """The subset of the query language used by the importer and the provider."""
+    for key, condition in (query or {}).items():
+        if key == '$or':
+            if not any(matches(row, sub_query) for sub_query in condition):
+                return False
+
+            continue
+
+        value = row.get(key)
+        values = value if isinstance(value, list) else [value]
+        if not isinstance(condition, dict):
+            if condition not in values:
+                return False
+
+            continue
+
+        for operator, operand in condition.items():
+            if operator == '$ne':
+                if operand in values:
+                    return False
+            elif not any(value is not None and QUERY_OPERATORS[operator](value, operand) for value in values):
+                return False
+
+    return True
+
+
+QUERY_OPERATORS: Dict[str, Callable] = {
+    '$in': lambda value, operand: value in operand,
+    '$gt': lambda value, operand: value > operand,
+    '$gte': lambda value, operand: value >= operand,
+    '$lt': lambda value, operand: value < operand,
+}
+
+
+def apply_update(row: dict, update: dict):
+    for key, value in update.get('$set', {}).items():
+        row[key] = copy.deepcopy(value)
+
+    for key, value in update.get('$inc', {}).items():
+        row[key] = row.get(key, 0) + value
+
+    for key, value in update.get('$addToSet', {}).items():
+        items = row.setdefault(key, [])
+        items += [item for item in value['$each'] if item not in items]
+
+
+class FakeCollection:
+    def __init__(self, name: str, writes: List[str], converter: Callable = dict):
+        self.name = name
+        self.writes = writes  # names of the bulk written collections, in order
+        self.converter = converter
+        self.rows: List[dict] = []
+        self.fail = False
+
+    def _find(self, query=None, sort=None) -> List[dict]:
+        rows = [row for row in self.rows if matches(row, query)]
+        for key, direction in reversed(sort or []):
+            rows.sort(key=lambda row: row[key], reverse=direction == DESCENDING)
+
+        return rows
+
+    async def find_one(self, filter=None, sort=None):
+        rows = self._find(filter, sort)
+        return copy.deepcopy(rows[0]) if rows else None
+
+    async def fetch_one(self, filter):
+        row = await self.find_one(filter)
+        return self.converter(row) if row is not None else None
+
+    async def find(self, filter=None, projection=None, sort=None, limit=0):
+        rows = self._find(filter, sort)
+        for row in rows[:limit] if limit else rows:
+            yield copy.deepcopy(row)
+
+    async def update_many(self, filter, update):
+        for row in self._find(filter):
+            apply_update(row, update)
+
+    async def delete_many(self, filter):
+        self.rows = [row for row in self.rows if not matches(row, filter)]
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail:
+            raise ConnectionError(self.name)
+
+        self.writes.append(self.name)
+        for request in requests:
+            if isinstance(request, InsertOne):
+                self.rows.append(copy.deepcopy(request._doc))
+                continue
+
+            rows = self._find(request._filter)
+            if isinstance(request, ReplaceOne):
+                if rows:
+                    self.rows.remove(rows[0])
+
+                if rows or request._upsert:
+                    self.rows.append(copy.deepcopy(request._doc))
+            elif rows:
+                for row in rows if isinstance(request, UpdateMany) else rows[:1]:
+                    apply_update(row, request._doc)
+            elif request._upsert:
+                row = {key: value for key, value in request._filter.items() if not isinstance(value, dict)}
+                row.update(copy.deepcopy(request._doc.get('$setOnInsert', {})))
+                apply_update(row, request._doc)
+                self.rows.append(row)
+
+
+def reference_summaries(coins: List[dict]) -> Dict[str, dict]:
+    """Address summaries computed from the coins, without the aggregation pipeline."""
+    summaries = {}
+    txids = defaultdict(set)
+    for coin in coins:
+        address = coin['address']
+        summary = summaries.setdefault(address, {'received': 0, 'sent': 0, 'utxoCount': 0})
+        summary['received'] += coin['value']
+        txids[address].add(coin['mintTxid'])
+        if coin['spentHeight'] >= 0:
+            summary['sent'] += coin['value']
+            txids[address].add(coin['spentTxid'])
+        else:
+            summary['utxoCount'] += 1
+
+    for address, summary in summaries.items():
+        summary['balance'] = summary['received'] - summary['sent']
+        summary['txCount'] = len(txids[address])
+
+    return summaries
+
+
+class FakeCoinCollection(FakeCollection):
+    async def aggregate(self, pipeline: List[dict], **kwargs):
+        # the `$match` stage of `address_summary_pipeline`, then the reference summaries
+        for address, summary in reference_summaries(self._find(pipeline[0]['$match'])).items():
+            yield {'_id': address, **summary}
+
+
+class FakeBtcDatabase:
+    def __init__(self):
+        self.writes: List[str] = []
+        self.coin_collection = FakeCoinCollection('coins', self.writes)
+        self.raw_tx_collection = FakeCollection('raw_transactions', self.writes)
+        self.tx_collection = FakeCollection('transactions', self.writes)
+        self.raw_block_collection = FakeCollection('raw_blocks', self.writes)
+        self.address_collection = FakeCollection('addresses', self.writes, self.convert_raw_address_summary)
+        self.block_collection = FakeCollection('blocks', self.writes)
+        self.wallet_address_collection = FakeCollection('walletaddresses', self.writes)
+        self.sync_state = None
+        self.address_summary_height = None
+
+    async def fetch_sync_state(self):
+        return self.sync_state
+
+    async def store_sync_state(self, state):
+        self.sync_state = state
+
+    async def fetch_address_summary_height(self) -> Optional[int]:
+        return self.address_summary_height
+
+    async def store_address_summary_height(self, height: Optional[int]):
+        self.address_summary_height = height
+
+    @staticmethod
+    def convert_raw_address_summary(raw_summary: dict) -> AddressSummary:
+        raw_summary.pop('_id', None)
+        return AddressSummary(**raw_summary)
+
+    def convert_raw_block(self, raw_block: dict) -> Block:
+        return Block(**raw_block, chain='BTC', network='mainnet')
+
+    def summaries(self) -> Dict[str, dict]:
+        # undone deltas leave rows of addresses without any transaction, same as no row
+        return {row['address']: {key: row[key] for key in ('received', 'sent', 'utxoCount', 'balance', 'txCount')}
+                for row in self.address_collection.rows if row['txCount']}
+
+    def reference_summaries(self) -> Dict[str, dict]:
+        return reference_summaries([coin for coin in self.coin_collection.rows
+                                    if coin['address'] is not None and coin['mintHeight'] >= 0])
+
+
+Output = Tuple[Optional[str], int]  # (address, value)
+CHAIN_TXS: List[List[Tuple[str, Optional[list], List[Output]]]] = [
+    [('c0', None, [('A', 50)])],
+    [('c1', None, [('B', 50)]), ('t1', [('c0', 0)], [('B', 30), ('A', 20)])],
+    [('c2', None, [('C', 60)]), ('t2', [('t1', 0), ('c1', 0)], [('C', 70), (None, 0)])],
+]
+
+
+def block_rows(height: int, block_hash: str, previous_hash: Optional[str],
+               txs: List[Tuple[str, Optional[list], List[Output]]]) -> BtcBlockRows:
+    mint_ops = []
+    for txid, inputs, outputs in txs:
+        for index, (address, value) in enumerate(outputs):
+            mint_ops.append({
+                'mintTxid': txid, 'mintIndex': index, 'mintHeight': height, 'coinbase': inputs is None,
+                'value': value, 'script': '', 'address': address, 'addresses': [address] if address else [],
+                'wallets': [],
+            })
+
+    block_row = dict(confirmations=None, height=height, hash=block_hash, version=1, merkleRoot='',
+                     time=datetime(2019, 1, 1), timeNormalized=datetime(2019, 1, 1), nonce=0,
+                     previousBlockHash=previous_hash, nextBlockHash=None, transactionCount=len(txs), size=100,
+                     bits=0)
+
+    return BtcBlockRows(
+        height, block_hash, 100,
+        raw_block_row={'hash': block_hash, 'height': height, 'previousblockhash': previous_hash,
+                       'tx': [txid for txid, _, _ in txs]},
+        block_row=block_row,
+        raw_tx_rows=[{'txid': txid, 'fee': None, '_blockheight': height} for txid, _, _ in txs],
+        tx_rows=[{'txid': txid, 'blockHeight': height} for txid, _, _ in txs],
+        mint_ops=mint_ops,
+        tx_inputs=[[tuple(key) for key in inputs] if inputs is not None else None for _, inputs, _ in txs],
+        tx_output_values=[sum(value for _, value in outputs) for _, _, outputs in txs],
+    )
+
+
+def chain_block_rows(height: int) -> BtcBlockRows:
+    return block_rows(height, f'block-{height}', f'block-{height - 1}' if height else None, CHAIN_TXS[height])
+
+
+def new_importer(db: FakeBtcDatabase) -> BtcDaemonImporter:
+    importer = BtcDaemonImporter('BTC', 'mainnet', ACCESSOR, None)
+    importer.db = db
+    return importer
+
+
+async def import_chain(importer: BtcDaemonImporter, heights: range):
+    for height in heights:
+        batch = importer.new_batch()
+        await importer.write_block_rows(batch, chain_block_rows(height))
+        await importer.flush_batch(batch)
+
+
+def test_address_deltas():
+    db = FakeBtcDatabase()
+    importer = new_importer(db)
+
+    async def run():
+        await importer.ensure_address_summaries()
+        await import_chain(importer, range(3))
+
+    asyncio.run(run())
+
+    assert db.summaries() == db.reference_summaries()
+    assert db.summaries()['B'] == {'received': 80, 'sent': 80, 'utxoCount': 0, 'balance': 0, 'txCount': 3}
+    assert db.address_summary_height == -1
+    assert {row['height'] for row in db.address_collection.rows} == {2, 1}  # C only in the last block
+
+
+def test_address_deltas_undo():
+    db = FakeBtcDatabase()
+    importer = new_importer(db)
+
+    async def run():
+        await importer.ensure_address_summaries()
+        await import_chain(importer, range(2))
+        imported = db.summaries()
+
+        await import_chain(importer, range(2, 3))
+        await importer.undo_block(2)
+
+        assert db.summaries() == imported == db.reference_summaries()
+
+    asyncio.run(run())
+
+
+def test_address_summaries_after_crash():
+    db = FakeBtcDatabase()
+
+    async def run():
+        importer = new_importer(db)
+        await importer.ensure_address_summaries()
+        await import_chain(importer, range(2))
+        imported = db.summaries()
+
+        db.block_collection.fail = True
+        with pytest.raises(ConnectionError):
+            await import_chain(importer, range(2, 3))
+
+        # the deltas of block 2 were applied, not the tip
+        assert db.sync_state.phase == SyncPhase.importing
+        assert db.summaries() != imported
+
+        db.block_collection.fail = False
+        importer = new_importer(db)
+        await importer.recover_sync_state()
+        await importer.ensure_address_summaries()
+
+        assert db.sync_state.is_committed
+        assert db.summaries() == imported == db.reference_summaries()
+
+        await import_chain(importer, range(2, 3))
+        assert db.summaries() == db.reference_summaries()
+
+    asyncio.run(run())
+
+
+def test_address_summaries_unknown_spent_coin():
+    db = FakeBtcDatabase()
+    importer = new_importer(db)
+    provider = BtcMongoProvider('BTC', 'mainnet', db, ACCESSOR)
+
+    async def run():
+        await importer.ensure_address_summaries()
+        await import_chain(importer, range(2))
+
+        # spent by t2, lost (ex. imported by an older version)
+        db.coin_collection.rows = [coin for coin in db.coin_collection.rows if coin['mintTxid'] != 'c1']
+        importer.utxo_cache.clear()
+        await import_chain(importer, range(2, 3))
+
+        assert db.address_summary_height is None
+        assert not importer.address_summary_ready
+
+        # aggregated from the coins until they are built again
+        summary = await provider.get_address_summary('C')
+        assert (summary.received, summary.sent, summary.txCount) == (130, 0, 2)
+
+        await importer.ensure_address_summaries()
+        assert db.address_summary_height == 2
+        assert db.summaries() == db.reference_summaries()
+
+    asyncio.run(run())
+
+
+def test_address_summary_unconfirmed():
+    db = FakeBtcDatabase()
+    importer = new_importer(db)
+    provider = BtcMongoProvider('BTC', 'mainnet', db, ACCESSOR)
+
+    async def run():
+        await importer.ensure_address_summaries()
+        await import_chain(importer, range(3))
+
+        db.coin_collection.rows += [
+            {'mintTxid': 'm0', 'mintIndex': 0, 'mintHeight': -1, 'spentHeight': -2, 'value': 5, 'address': 'A'},
+            {'mintTxid': 'm1', 'mintIndex': 0, 'mintHeight': -3, 'spentHeight': -2, 'value': 7, 'address': 'A'},  # conflicting
+        ]
+
+        summaries = [await provider.get_address_summary('A')]
+        await db.store_address_summary_height(None)
+        summaries.append(await provider.get_address_summary('A'))
+
+        for summary in summaries:
+            assert (summary.balance, summary.unconfirmed, summary.txCount) == (20, 5, 2)
+
+        balance = await provider.get_balance_for_address('A')
+        assert (balance.confirmed, balance.unconfirmed, balance.balance) == (20, 5, 25)
+
+    asyncio.run(run())
+
+
+class FakeBtcNode:
+    """
+    Blocks `a-<height>`, `b-<height>` above `fork_height` once `reorg` was called. Each one has a coinbase
+    (to A, or B on the b branch) and spends the coinbase of its parent to C.
+    """
+
+    def __init__(self, tip_height: int):
+        self.tip_height = tip_height
+        self.fork_height: Optional[int] = None
+
+    def reorg(self, fork_height: int, tip_height: int):
+        self.fork_height = fork_height
+        self.tip_height = tip_height
+
+    def get_hash(self, height: int) -> Optional[str]:
+        if height < 0 or height > self.tip_height:
+            return None
+
+        return f'b-{height}' if self.fork_height is not None and height > self.fork_height else f'a-{height}'
+
+    def get_rows(self, height: int) -> BtcBlockRows:
+        block_hash, previous_hash = self.get_hash(height), self.get_hash(height - 1)
+        txs = [(f'{block_hash}-cb', None, [(block_hash[0].upper(), 50)])]
+        if previous_hash is not None:
+            txs.append((f'{block_hash}-tx', [(f'{previous_hash}-cb', 0)], [('C', 50)]))
+
+        return block_rows(height, block_hash, previous_hash, txs)
+
+    async def get_local_tip(self) -> Block:
+        return Block(**self.get_rows(self.tip_height).block_row, chain='BTC', network='mainnet')
+
+    async def get_block_hashes(self, heights: List[int]) -> List[Optional[str]]:
+        return [self.get_hash(height) for height in heights]
+
+    async def get_block_hash(self, height: int) -> Optional[str]:
+        return self.get_hash(height)
+
+
+class FakeBtcImporter(BtcDaemonImporter):
+    def __init__(self, node: FakeBtcNode, db: FakeBtcDatabase, **kwargs):
+        super().__init__('BTC', 'mainnet', node, None, **kwargs)
+        self.db = db
+
+    async def fetch_block(self, block_hash: str, height: int) -> BtcBlockRows:
+        rows = self.accessor.get_rows(height)
+        assert rows.hash == block_hash
+        return rows
+
+
+# the headers kept in memory cover 16..39 after the full sync, locator heights 39..30, 28, 24, 16
+@pytest.mark.parametrize('fork_height', [
+    36,  # in the window
+    28,  # at a locator height
+    27,  # first block of the branch at a locator height
+    10,  # below the window, found by walking the database
+    -1,  # genesis replaced
+])
+def test_progress_sync_reorg(fork_height: int):
+    node = FakeBtcNode(39)
+    db = FakeBtcDatabase()
+    importer = FakeBtcImporter(node, db, header_cache=16, prefetch=4, write_batch={'max_blocks': 5})
+
+    async def sync():
+        await importer.recover_sync_state()
+        await importer.ensure_address_summaries()
+        await importer.headers.load(db.block_collection)
+        await importer.task_full_sync()
+        assert (importer.headers.start_height, importer.headers.tip_height) == (16, 39)
+
+        node.reorg(fork_height, 42)
+        await importer.task_progress_sync()
+
+    asyncio.run(sync())
+
+    blocks = sorted(db.block_collection.rows, key=lambda row: row['height'])
+    assert [row['hash'] for row in blocks] == [node.get_hash(height) for height in range(43)]
+    assert all(row['nextBlockHash'] == next_row['hash'] for row, next_row in zip(blocks, blocks[1:]))
+    assert sorted(row['txid'] for row in db.tx_collection.rows) == sorted(
+        tx_row['txid'] for height in range(43) for tx_row in node.get_rows(height).tx_rows)
+    assert (db.sync_state.height, db.sync_state.hash, db.sync_state.is_committed) == (42, 'b-42', True)
+    assert importer.headers.tip_hash == 'b-42'
+    assert importer.headers.get(fork_height + 1) in (None, f'b-{fork_height + 1}')
+    assert db.summaries() == db.reference_summaries()
+
+
+def rows_by_txid(collection: FakeCollection) -> Dict[str, dict]:
+    return {row['txid']: row for row in collection.rows}
+
+
+def coin(db: FakeBtcDatabase, txid: str, index: int) -> dict:
+    coin, = [row for row in db.coin_collection.rows if (row['mintTxid'], row['mintIndex']) == (txid, index)]
+    return coin
+
+
+def test_import_batch_same_batch_spends():
+    db = FakeBtcDatabase()
+    importer = new_importer(db)
+
+    async def run():
+        await importer.ensure_address_summaries()
+        batch = importer.new_batch()
+        for height in range(3):
+            await importer.write_block_rows(batch, chain_block_rows(height))
+
+        assert not db.writes
+        await importer.flush_batch(batch)
+
+    asyncio.run(run())
+
+    # one bulk write per collection, the tip last
+    assert db.writes == ['coins', 'raw_transactions', 'transactions', 'raw_blocks', 'addresses', 'blocks']
+    assert (coin(db, 'c0', 0)['spentTxid'], coin(db, 'c0', 0)['spentHeight']) == ('t1', 1)
+    assert (coin(db, 't1', 0)['spentTxid'], coin(db, 't1', 0)['spentHeight']) == ('t2', 2)
+    assert coin(db, 't1', 1)['spentHeight'] == -2
+    assert len(db.coin_collection.rows) == 7
+
+    txs, raw_txs = rows_by_txid(db.tx_collection), rows_by_txid(db.raw_tx_collection)
+    assert (txs['c2']['fee'], raw_txs['c2']['fee']) == (0, 0)
+    assert (txs['t1']['fee'], txs['t2']['fee']) == (0, 10)
+    assert raw_txs['t2']['fee'] == 10 / 1e8
+
+    blocks = {row['height']: row for row in db.block_collection.rows}
+    assert [blocks[height]['nextBlockHash'] for height in range(3)] == ['block-1', 'block-2', None]
+    assert db.summaries() == db.reference_summaries()
+
+
+@pytest.mark.parametrize('utxo_cache', [256, 0])
+def test_import_batch_spends_from_database(utxo_cache: float):
+    db = FakeBtcDatabase()
+    importer = BtcDaemonImporter('BTC', 'mainnet', ACCESSOR, None, utxo_cache=utxo_cache)
+    importer.db = db
+
+    async def run():
+        await importer.ensure_address_summaries()
+        await import_chain(importer, range(3))  # one batch per block, every spend is of a previous batch
+
+    asyncio.run(run())
+
+    assert importer.utxo_cache.misses == (3 if not utxo_cache else 0)  # c0:0, then t1:0 and c1:0
+    assert (coin(db, 't1', 0)['spentTxid'], coin(db, 't1', 0)['spentHeight']) == ('t2', 2)
+    assert (coin(db, 'c1', 0)['spentTxid'], coin(db, 'c1', 0)['spentHeight']) == ('t2', 2)
+    assert rows_by_txid(db.tx_collection)['t2']['fee'] == 10
+    assert db.summaries() == db.reference_summaries()
+
+
+@pytest.mark.parametrize('node_fee', [None, 1e-7])
+def test_import_batch_unknown_input_value(node_fee: Optional[float]):
+    db = FakeBtcDatabase()
+    importer = new_importer(db)
+
+    async def run():
+        await importer.ensure_address_summaries()
+        await import_chain(importer, range(2))
+
+        db.coin_collection.rows = [row for row in db.coin_collection.rows if row['mintTxid'] != 'c1']
+        importer.utxo_cache.clear()
+
+        rows = chain_block_rows(2)
+        rows.raw_tx_rows[1]['fee'] = node_fee
+        batch = importer.new_batch()
+        await importer.write_block_rows(batch, rows)
+        await importer.flush_batch(batch)
+
+    asyncio.run(run())
+
+    # t1:0 is known, c1:0 is not: the fee of the node (if any) is kept
+    txs, raw_txs = rows_by_txid(db.tx_collection), rows_by_txid(db.raw_tx_collection)
+    assert raw_txs['t2']['fee'] == node_fee
+    assert txs['t2']['fee'] == (-1 if node_fee is None else 10)
+    assert (txs['c2']['fee'], txs['t1']['fee']) == (0, 0)
+    assert coin(db, 't1', 0)['spentHeight'] == 2
@@ -0,0 +1,217 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+import pytest
+from pymongo import DESCENDING
+
+from blockexp.blockchain.eth.decoder import EthBlockRows
+from blockexp.blockchain.eth.importer import EthDaemonImporter
+from blockexp.blockchain.utils.sync import SyncPhase
+from blockexp.model import Block
+from blockexp.utils.jsonrpc import JSONRPCConnectionError
+
+
+def block_row(height: int, block_hash: str, previous_hash: Optional[str]) -> dict:
+    return dict(confirmations=None, height=height, hash=block_hash, version=-1, merkleRoot=None,
+                time=datetime(2019, 1, 1), timeNormalized=datetime(2019, 1, 1), nonce=0,
+                previousBlockHash=previous_hash, nextBlockHash=None, transactionCount=0, size=0, bits=0)
+
+
+def matches(row: dict, query: Optional[dict]) -> bool:
+    for key, value in (query or {}).items():
+        if isinstance(value, dict):
+            if row.get(key) is None or row[key] < value['$gte']:
+                return False
+        elif row.get(key) != value:
+            return False
+
+    return True
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows: List[dict] = []
+
+    def _find(self, query=None, sort=None, limit=0) -> List[dict]:
+        rows = [row for row in self.rows if matches(row, query)]
+        for key, direction in reversed(sort or []):
+            rows.sort(key=lambda row: row[key], reverse=direction == DESCENDING)
+
+        return rows[:limit] if limit else rows
+
+    async def find_one(self, query=None, sort=None):
+        rows = self._find(query, sort)
+        return dict(rows[0]) if rows else None
+
+    async def find(self, query=None, projection=None, sort=None, limit=0):
+        for row in self._find(query, sort, limit):
+            yield dict(row)
+
+    async def update_one(self, filter, update, upsert=False):
+        rows = self._find(filter)
+        if rows:
+            rows[0].update(update['$set'])
+        elif upsert:
+            self.rows.append({**filter, **update['$set']})
+
+    async def delete_many(self, query):
+        self.rows = [row for row in self.rows if not matches(row, query)]
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            await self.update_one(request._filter, request._doc, request._upsert)
+
+
+class FakeEthDatabase:
+    def __init__(self):
+        self.block_collection = FakeCollection()
+        self.tx_collection = FakeCollection()
+        self.raw_block_collection = FakeCollection()
+        self.raw_tx_collection = FakeCollection()
+        self.token_transfer_collection = FakeCollection()
+        self.sync_state = None
+
+    async def fetch_sync_state(self):
+        return self.sync_state
+
+    async def store_sync_state(self, state):
+        self.sync_state = state
+
+    def convert_raw_block(self, raw_block: dict) -> Block:
+        return Block(**raw_block, chain='ETH', network='test')
+
+    def hashes(self) -> List[str]:
+        return [row['hash'] for row in sorted(self.block_collection.rows, key=lambda row: row['height'])]
+
+
+class FakeNode:
+    """Chain of `a-<height>` blocks, `b-<height>` from `fork_height` once `reorg` was called."""
+
+    def __init__(self, tip_height: int):
+        self.tip_height = tip_height
+        self.fork_height: Optional[int] = None
+        self.fail_heights = set()
+        self.reorg_after: Optional[int] = None  # reorg once this height was served
+
+    def reorg(self, fork_height: int, tip_height: int):
+        self.fork_height = fork_height
+        self.tip_height = tip_height
+
+    def get_hash(self, height: int) -> Optional[str]:
+        if height < 0 or height > self.tip_height:
+            return None
+
+        return f'b-{height}' if self.fork_height is not None and height >= self.fork_height else f'a-{height}'
+
+    async def get_local_tip(self) -> Block:
+        height = self.tip_height
+        return Block(**block_row(height, self.get_hash(height), self.get_hash(height - 1)), chain='ETH', network='test')
+
+    async def get_block_hashes(self, heights: List[int]) -> List[Optional[str]]:
+        return [self.get_hash(height) for height in heights]
+
+    async def get_rows(self, heights: List[int]) -> List[EthBlockRows]:
+        await asyncio.sleep(0.001 * (heights[0] % 3))  # chunks complete out of order
+        if self.fail_heights.intersection(heights):
+            raise JSONRPCConnectionError
+
+        rows_list = []
+        for height in heights:
+            block_hash, previous_hash = self.get_hash(height), self.get_hash(height - 1)
+            rows_list.append(EthBlockRows(height, block_hash, previous_hash, {}, block_row(height, block_hash, previous_hash),
+                                          [], []))
+
+        if self.reorg_after is not None and self.reorg_after in heights:
+            self.reorg(self.reorg_after - 1, self.tip_height + 10)
+            self.reorg_after = None
+
+        return rows_list
+
+
+class FakeEthImporter(EthDaemonImporter):
+    def __init__(self, node: FakeNode, db: FakeEthDatabase, **kwargs):
+        super().__init__('ETH', 'test', node, None, **kwargs)
+        self.db = db
+
+    async def fetch_blocks(self, heights: range) -> List[EthBlockRows]:
+        return await self.accessor.get_rows(list(heights))
+
+    async def write_blocks(self, rows_list: List[EthBlockRows]):
+        # chunks are written above the watermark, their blocks are not
+        tip = await self.db.block_collection.find_one(sort=[('height', DESCENDING)])
+        assert tip is None or tip['height'] == self.db.sync_state.height
+
+
+async def start(importer: FakeEthImporter):
+    await importer.recover_sync_state()
+    await importer.headers.load(importer.db.block_collection)
+    await importer.task_full_sync()
+
+
+def test_import_blocks():
+    node = FakeNode(99)
+    db = FakeEthDatabase()
+    importer = FakeEthImporter(node, db, start_height=40, import_workers=3, fetch_batch=4)
+
+    asyncio.run(start(importer))
+
+    assert db.hashes() == [f'a-{height}' for height in range(40, 100)]
+    assert db.sync_state.is_committed
+    assert (db.sync_state.height, db.sync_state.hash) == (99, 'a-99')
+    assert importer.headers.tip_hash == 'a-99'
+
+
+def test_interrupted_first_chunk():
+    node = FakeNode(99)
+    node.fail_heights.add(41)
+    db = FakeEthDatabase()
+
+    with pytest.raises(JSONRPCConnectionError):
+        asyncio.run(start(FakeEthImporter(node, db, start_height=40, import_workers=3, fetch_batch=4)))
+
+    assert db.sync_state.phase == SyncPhase.importing
+    assert db.sync_state.height == 39
+
+    # restarted importer: the partial import is undone and the full sync runs again
+    node.fail_heights.clear()
+    importer = FakeEthImporter(node, db, start_height=40, import_workers=3, fetch_batch=4)
+
+    async def restart():
+        await start(importer)
+        await importer.task_progress_sync()
+
+    asyncio.run(restart())
+
+    assert db.hashes() == [f'a-{height}' for height in range(40, 100)]
+    assert (db.sync_state.height, db.sync_state.hash, db.sync_state.is_committed) == (99, 'a-99', True)
+
+
+def test_parent_mismatch():
+    node = FakeNode(99)
+    node.reorg_after = 51  # blocks from 50 change once the chunk of 51 was fetched
+    db = FakeEthDatabase()
+    importer = FakeEthImporter(node, db, start_height=0, import_workers=1, fetch_batch=4)
+
+    async def sync():
+        await start(importer)
+        assert db.sync_state.is_committed
+        assert db.sync_state.height == 49
+        assert db.hashes() == [f'a-{height}' for height in range(50)]
+
+        await importer.task_progress_sync()
+
+    asyncio.run(sync())
+
+    assert db.hashes() == [node.get_hash(height) for height in range(node.tip_height + 1)]
+    assert db.hashes()[50] == 'b-50'
+    assert (db.sync_state.height, db.sync_state.hash) == (109, 'b-109')
+
+
+def test_next_block_hash():
+    node = FakeNode(99)
+    db = FakeEthDatabase()
+    asyncio.run(start(FakeEthImporter(node, db, start_height=40, import_workers=3, fetch_batch=4)))
+
+    rows = sorted(db.block_collection.rows, key=lambda row: row['height'])
+    assert [row['nextBlockHash'] for row in rows] == [row['hash'] for row in rows[1:]] + [None]
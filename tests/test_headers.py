@@ -0,0 +1,148 @@
+import asyncio
+from typing import List, Optional
+
+import pytest
+from pymongo import DESCENDING
+
+from blockexp.blockchain.utils.headers import HeaderChain, locator_heights
+
+
+def test_locator_heights():
+    assert locator_heights(0) == [0]
+    assert locator_heights(9) == list(range(9, -1, -1))
+    assert locator_heights(100)[:11] == list(range(100, 90, -1)) + [89]
+    assert locator_heights(100)[10:] == [89, 85, 77, 61, 29, 0]
+
+    heights = locator_heights(100000, start_height=1000)
+    assert heights[-1] == 1000
+    assert all(a > b for a, b in zip(heights, heights[1:]))
+    assert len(heights) < 30
+
+    assert locator_heights(5, start_height=5) == [5]
+
+
+class FakeNode:
+    """`a-<height>` hashes, `b-<height>` above `fork_height` (the highest block in common)."""
+
+    def __init__(self, tip_height: int, fork_height: Optional[int] = None):
+        self.tip_height = tip_height
+        self.fork_height = fork_height
+        self.calls: List[List[int]] = []
+
+    def get_hash(self, height: int) -> Optional[str]:
+        if height < 0 or height > self.tip_height:
+            return None
+
+        return f'b-{height}' if self.fork_height is not None and height > self.fork_height else f'a-{height}'
+
+    async def get_block_hashes(self, heights: List[int]) -> List[Optional[str]]:
+        self.calls.append(heights)
+        return [self.get_hash(height) for height in heights]
+
+
+def new_chain(start_height: int, tip_height: int, size: int = 2016) -> HeaderChain:
+    headers = HeaderChain(size)
+    for height in range(start_height, tip_height + 1):
+        headers.append(height, f'a-{height}')
+
+    return headers
+
+
+@pytest.mark.parametrize('fork_height', range(-1, 101))
+def test_find_fork_height(fork_height: int):
+    headers = new_chain(20, 100)
+    node = FakeNode(110, fork_height)
+
+    found = asyncio.run(headers.find_fork_height(node.get_block_hashes, node.tip_height))
+
+    # below the window, the importer walks the database
+    assert found == (fork_height if fork_height >= 20 else None)
+    # one locator call, then the bisection between two locator heights
+    assert len(node.calls) <= 1 + 6
+
+
+def test_find_fork_height_no_fork():
+    headers = new_chain(20, 100)
+    node = FakeNode(100)
+
+    assert asyncio.run(headers.find_fork_height(node.get_block_hashes, node.tip_height)) == 100
+    assert len(node.calls) == 1
+
+
+def test_find_fork_height_node_behind():
+    headers = new_chain(20, 100)
+    node = FakeNode(90)
+
+    assert asyncio.run(headers.find_fork_height(node.get_block_hashes, node.tip_height)) == 90
+    assert all(height <= 90 for heights in node.calls for height in heights)
+
+
+def test_find_fork_height_empty():
+    node = FakeNode(100)
+
+    assert asyncio.run(HeaderChain().find_fork_height(node.get_block_hashes, node.tip_height)) is None
+    assert not node.calls
+
+
+def test_truncate_append():
+    headers = new_chain(20, 100)
+
+    # undo from 95, then the new branch is imported
+    headers.truncate(95)
+    assert (headers.tip_height, headers.tip_hash) == (94, 'a-94')
+    for height in range(95, 103):
+        headers.append(height, f'b-{height}')
+
+    assert (headers.start_height, headers.tip_height) == (20, 102)
+    assert headers.get(94) == 'a-94' and headers.get(95) == 'b-95'
+
+    node = FakeNode(102, 94)
+    assert asyncio.run(headers.find_fork_height(node.get_block_hashes, node.tip_height)) == 102
+
+    # undo below the window
+    headers.truncate(10)
+    assert len(headers) == 0 and headers.tip_height is None
+    headers.append(10, 'b-10')
+    assert (headers.start_height, headers.tip_height, headers.tip_hash) == (10, 10, 'b-10')
+
+
+def test_append_not_contiguous():
+    headers = new_chain(20, 30)
+    headers.append(40, 'a-40')
+
+    assert (headers.start_height, headers.tip_height, len(headers)) == (40, 40, 1)
+    assert headers.get(30) is None
+
+
+def test_append_trim():
+    headers = new_chain(0, 99, size=10)
+
+    assert 10 <= len(headers) < 20
+    assert headers.tip_height == 99
+    assert all(headers.get(height) == f'a-{height}' for height in range(headers.start_height, 100))
+    assert headers.get(headers.start_height - 1) is None
+
+
+class FakeBlockCollection:
+    def __init__(self, heights: List[int]):
+        self.rows = [{'height': height, 'hash': f'a-{height}'} for height in heights]
+
+    async def find(self, query, projection=None, sort=None, limit=0):
+        (key, direction), = sort
+        rows = sorted(self.rows, key=lambda row: row[key], reverse=direction == DESCENDING)
+        for row in rows[:limit] if limit else rows:
+            yield dict(row)
+
+
+def test_load():
+    headers = HeaderChain(8)
+
+    asyncio.run(headers.load(FakeBlockCollection(list(range(100)))))
+    assert (headers.start_height, headers.tip_height, headers.tip_hash) == (92, 99, 'a-99')
+
+    # only the contiguous run below the tip
+    asyncio.run(headers.load(FakeBlockCollection([1, 2, 3, 5, 6])))
+    assert (headers.start_height, headers.tip_height) == (5, 6)
+
+    asyncio.run(headers.load(FakeBlockCollection([])))
+    assert len(headers) == 0
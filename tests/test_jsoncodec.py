@@ -0,0 +1,39 @@
+from importlib.util import find_spec
+
+import pytest
+
+from blockexp.utils.jsoncodec import JSON_CODECS, OrJsonCodec, get_json_codec
+
+CODECS = [
+    pytest.param(name, marks=pytest.mark.skipif(name != 'json' and find_spec(name) is None, reason=f'{name} missing'))
+    for name in JSON_CODECS
+]
+
+DOCUMENTS = [
+    {'result': {'height': 722010, 'difficulty': 27550332084343.84, 'fee': 0.0001}},
+    {'result': [2 ** 64, -2 ** 63 - 1, 10 ** 30, 2 ** 64 - 1, -2 ** 63]},
+    {'result': {'value': 2 ** 200, 'hash': '0000000000000000000' + '1' * 45}},
+    {'result': '12345678901234567890123, 12345678901234567890123'},
+]
+
+
+@pytest.mark.parametrize('name', CODECS)
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_round_trip(name: str, document: dict):
+    codec = get_json_codec(name)
+    data = codec.dumps(document)
+
+    assert codec.loads(data) == document
+    assert codec.loads(data.decode()) == document
+
+
+@pytest.mark.skipif(find_spec('orjson') is None, reason='orjson missing')
+def test_orjson_big_int():
+    codec = OrJsonCodec()
+
+    for data in [b'18446744073709551616', b'{"a":[1, -9223372036854775809]}', b'{"a": 123456789012345678901234567890}']:
+        assert codec.big_int_bytes.search(data)
+
+    # up to 19 digits (18 if negative) and digits inside strings keep the fast path
+    for data in [b'[9223372036854775807]', b'{"a":-922337203685477580}', b'["0000000000000000000000"]']:
+        assert not codec.big_int_bytes.search(data)
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from blockexp.model import Block, Coin, CoinListing, Transaction, Wallet, TokenTransfer, DailyTransactions, get_schema
+from starlette_typed.serializer import compile_serializer
+
+COIN = Coin(chain='BTC', network='mainnet', mintTxid='ab' * 32, mintIndex=1, mintHeight=722010, value=5000,
+            script='0014' + '00' * 20, address='bc1qqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqq',
+            addresses=['bc1qqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqqq'], spentTxid='cd' * 32, spentHeight=722011,
+            confirmations=None, wallets=['5c1b7e4d2f0a3b0012345678'], _id='5c1b7e4d2f0a3b0087654321')
+
+OBJECTS = [
+    Block(chain='BTC', network='mainnet', confirmations=3, height=722010, hash='00' * 32, version=0x20000000,
+          merkleRoot='11' * 32, time=datetime(2022, 2, 1, 12, 30), timeNormalized=datetime(2022, 2, 1, 12, 30, 5),
+          nonce=123, previousBlockHash='22' * 32, nextBlockHash=None, transactionCount=1000, size=1234567,
+          bits=0x170a8bb4, reward=625000000, processed=True),
+    COIN,
+    Coin(chain='BTC', network='mainnet', mintTxid='ab' * 32, mintIndex=0),  # defaults
+    Transaction(txid='ab' * 32, chain='BTC', network='mainnet', blockHeight=-1, blockHash=None,
+                blockTime='2022-02-01T12:30:00.000Z', blockTimeNormalized='2022-02-01T12:30:00.000Z', coinbase=False,
+                fee=-1, size=250, locktime=0, inputCount=1, outputCount=2, value=4900),
+    Wallet(chain='BTC', network='mainnet', name='main', pubKey='xpub', _id=ObjectId('5c1b7e4d2f0a3b0012345678')),
+    TokenTransfer(chain='ETH', network='mainnet', txid='0x' + 'ab' * 32, logIndex=3, blockHeight=14000000,
+                  blockHash='0x' + '00' * 32, blockTime='2022-01-13T22:00:00.000Z', token='0x' + '11' * 20,
+                  fromAddress='0x' + '22' * 20, toAddress='0x' + '33' * 20,
+                  addresses=['0x' + '22' * 20, '0x' + '33' * 20], value=str(2 ** 200)),
+    CoinListing(inputs=[COIN], outputs=[COIN, Coin(chain='BTC', network='mainnet', mintTxid='ab' * 32, mintIndex=2)]),
+    DailyTransactions(chain='BTC', network='mainnet', results=[{'date': '2022-02-01', 'transactionCount': 3}]),
+]
+
+
+@pytest.mark.parametrize('obj', OBJECTS, ids=lambda obj: type(obj).__name__)
+def test_compiled_serializer(obj):
+    cls = type(obj)
+    assert compile_serializer(cls)(obj) == get_schema(cls, many=False).dump(obj)
+
+
+RAW_ROWS = [
+    (Block, {'chain': 'BTC', 'network': 'mainnet', 'height': 1, 'hash': '00' * 32, 'time': datetime(2009, 1, 9),
+             'timeNormalized': datetime(2009, 1, 9), 'nextBlockHash': None}),
+    (Coin, {'chain': 'BTC', 'network': 'mainnet', 'mintTxid': 'ab' * 32, 'mintIndex': 0, 'value': 5000,
+            'spentTxid': None, '_id': ObjectId('5c1b7e4d2f0a3b0012345678')}),
+    (Transaction, {'txid': 'ab' * 32, 'chain': 'BTC', 'network': 'mainnet', 'fee': 0.0001, 'addresses': []}),
+    (Wallet, {'chain': 'BTC', 'network': 'mainnet', 'name': 'main', 'pubKey': 'xpub', 'singleAddress': 1}),
+    (TokenTransfer, {'chain': 'ETH', 'network': 'mainnet', 'txid': '0x' + 'ab' * 32, 'logIndex': '3',
+                     'tokenId': None}),
+    (CoinListing, {'inputs': [COIN, {'chain': 'BTC', 'network': 'mainnet', 'mintTxid': 'ab' * 32, 'mintIndex': 0}],
+                   'outputs': []}),
+]
+
+
+@pytest.mark.parametrize('cls, row', RAW_ROWS, ids=lambda value: value.__name__ if isinstance(value, type) else '')
+def test_compiled_serializer_raw_dict(cls, row: dict):
+    assert compile_serializer(cls)(row) == get_schema(cls, many=False).dump(row)
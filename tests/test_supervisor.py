@@ -0,0 +1,137 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from blockexp.blockchain import supervisor
+from blockexp.blockchain.supervisor import ImporterMode, ImporterState, ImporterSupervisor
+
+
+class FakeApplication:
+    config = {}
+
+
+class FakeImporter:
+    def __init__(self, errors: List[Exception]):
+        self.errors = errors
+
+    async def run(self):
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+class FakeBlockchain:
+    chain = 'BTC'
+    network = 'mainnet'
+    has_importer = True
+
+    def __init__(self, errors: List[Exception] = ()):
+        self.importer = FakeImporter(list(errors))
+
+    def get_importer(self):
+        return self.importer
+
+
+class FakeProcess:
+    def __init__(self, exit_codes: List[int]):
+        self.exit_codes = exit_codes
+        self.exitcode = None
+        self.pid = None
+        self.terminated = False
+
+    def start(self):
+        self.pid = 1234
+
+    def is_alive(self) -> bool:
+        if self.exit_codes and self.exit_codes[0] is not None:
+            self.exitcode = self.exit_codes[0]
+
+        return self.exitcode is None and not self.terminated
+
+    def join(self, timeout=None):
+        if self.terminated:
+            self.exitcode = -15
+
+    def terminate(self):
+        self.terminated = True
+
+    def kill(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, exit_codes: List[int]):
+        self.exit_codes = exit_codes
+        self.processes: List[FakeProcess] = []
+
+    def Process(self, **kwargs) -> FakeProcess:
+        process = FakeProcess(self.exit_codes[len(self.processes):len(self.processes) + 1])
+        self.processes.append(process)
+        return process
+
+
+def run_supervisor(importer_supervisor: ImporterSupervisor, blockchain: FakeBlockchain):
+    async def run():
+        importer_supervisor.start([blockchain])
+        await asyncio.wait_for(importer_supervisor.wait(), 5)
+
+    asyncio.run(run())
+    status, = importer_supervisor.status()
+    return status
+
+
+def test_inline_restart_then_stop():
+    importer_supervisor = ImporterSupervisor(FakeApplication(), ImporterMode.inline, restart_delay=0)
+    status = run_supervisor(importer_supervisor, FakeBlockchain([ValueError('boom')]))
+
+    # the importer returned after one restart: a normal stop
+    assert (status.state, status.restarts) == (ImporterState.stopped, 1)
+    assert status.lastError == 'ValueError: boom'
+
+
+@pytest.fixture
+def fake_context(monkeypatch):
+    def install(exit_codes: List[int]) -> FakeContext:
+        context = FakeContext(exit_codes)
+        monkeypatch.setattr(supervisor.multiprocessing, 'get_context', lambda method: context)
+        return context
+
+    return install
+
+
+def test_process_exit_codes(fake_context):
+    context = fake_context([1, -9, 0])
+    importer_supervisor = ImporterSupervisor(FakeApplication(), ImporterMode.process, restart_delay=0)
+    status = run_supervisor(importer_supervisor, FakeBlockchain())
+
+    assert len(context.processes) == 3
+    assert (status.state, status.restarts, status.pid) == (ImporterState.stopped, 2, None)
+    assert status.lastError == 'exit code -9'
+
+
+def test_process_stop(fake_context):
+    context = fake_context([None])
+    importer_supervisor = ImporterSupervisor(FakeApplication(), ImporterMode.process, restart_delay=0)
+
+    async def run():
+        importer_supervisor.start([FakeBlockchain()])
+        await asyncio.sleep(0.1)
+        await importer_supervisor.stop()
+
+    asyncio.run(run())
+
+    status, = importer_supervisor.status()
+    process, = context.processes
+    assert process.terminated
+    assert (status.state, status.restarts, status.lastError) == (ImporterState.stopped, 0, None)
+
+
+def test_process_exit_while_stopping(fake_context):
+    # Ctrl-C reaches the child too, it exits on its own before being terminated
+    context = fake_context([-2])
+    importer_supervisor = ImporterSupervisor(FakeApplication(), ImporterMode.process, restart_delay=0)
+    importer_supervisor.stopping = True
+    status = run_supervisor(importer_supervisor, FakeBlockchain())
+
+    assert len(context.processes) == 1
+    assert (status.state, status.restarts, status.lastError) == (ImporterState.stopped, 0, None)